@@ -0,0 +1,385 @@
+"""
+Asyncio counterpart of OllamaClient.
+
+A streaming generation only holds a socket and a coroutine while it waits
+for tokens, so one event loop can keep hundreds of conversations in flight.
+"""
+
+import asyncio
+import json
+import random
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+
+import aiohttp
+
+from FossilChatBot.config import (
+    OLLAMA_API_URLS,
+    MODEL_NAME,
+    DEFAULT_PARAMS,
+    ASYNC_HTTP_POOL_SIZE,
+    CONNECT_TIMEOUT,
+    READ_TIMEOUT,
+    MAX_RETRIES,
+    RETRY_BACKOFF,
+    RETRY_BACKOFF_MAX,
+    HEALTH_CHECK_INTERVAL,
+    HEALTH_CHECK_TIMEOUT,
+    SESSION_MAX,
+)
+from FossilChatBot.backend_pool import BackendPool, OllamaNode
+from FossilChatBot.connection_pool import RETRY_STATUSES
+from FossilChatBot.generations import (
+    AsyncGenerationStream,
+    Generation,
+    GenerationCancelled,
+    GenerationRegistry,
+)
+from FossilChatBot.ollama_client import build_payload
+
+# aiohttp >= 3.10 tells connect timeouts apart from read timeouts.
+_CONNECT_ERRORS = (aiohttp.ClientConnectorError,) + (
+    (aiohttp.ConnectionTimeoutError,) if hasattr(aiohttp, "ConnectionTimeoutError") else ()
+)
+
+
+class AsyncOllamaClient:
+    """
+    Async client for the Ollama API with the same surface as OllamaClient.
+
+    The aiohttp session is created on first use, inside the running event
+    loop, and must be released with ``close()`` (or ``async with``).
+    """
+
+    def __init__(
+        self,
+        api_url: Union[str, List[str]] = OLLAMA_API_URLS,
+        model_name: str = MODEL_NAME,
+        default_params: Optional[Dict[str, Any]] = None,
+        pool_size: int = ASYNC_HTTP_POOL_SIZE,
+    ):
+        """
+        Initialize the async Ollama client.
+
+        Args:
+            api_url (str or list): The URL of the Ollama API, or the URLs of
+                several Ollama hosts to spread generations over.
+            model_name (str): The name of the model to use.
+            default_params (dict, optional): Default parameters for the model.
+            pool_size (int): Maximum simultaneous connections to Ollama.
+        """
+        self.backends = BackendPool(
+            [api_url] if isinstance(api_url, str) else api_url,
+            model_name,
+            probe_interval=HEALTH_CHECK_INTERVAL,
+            probe_timeout=HEALTH_CHECK_TIMEOUT,
+            max_sticky=SESSION_MAX,
+        )
+        self.model_name = model_name
+        self.default_params = default_params or DEFAULT_PARAMS
+        self.conversation_history: List[int] = []
+        self.request_timeout = READ_TIMEOUT
+        self.pool_size = pool_size
+        self.max_retries = MAX_RETRIES
+        self.retries = 0
+        self.generations = GenerationRegistry()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._models: Optional[List[str]] = None
+
+    @property
+    def api_url(self) -> str:
+        """
+        URL of a healthy Ollama host, for requests other than generations.
+        """
+        return self.backends.api_url
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=aiohttp.ClientTimeout(
+                    total=None, sock_connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT
+                ),
+            )
+        return self._session
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        read_timeout: Optional[float] = None,
+        api_url: Optional[str] = None,
+        max_retries: Optional[int] = None,
+        **kwargs: Any,
+    ) -> aiohttp.ClientResponse:
+        """
+        Send a request, retrying only failures that never reached Ollama.
+
+        Args:
+            method (str): HTTP method.
+            path (str): Path below the API URL.
+            read_timeout (float, optional): Override for the read timeout.
+            api_url (str, optional): Host to send to instead of ``api_url``.
+            max_retries (int, optional): Override for the retry count.
+            **kwargs: Passed on to ``aiohttp.ClientSession.request``.
+
+        Returns:
+            aiohttp.ClientResponse: The response; the caller must release it.
+        """
+        if read_timeout:
+            kwargs["timeout"] = aiohttp.ClientTimeout(
+                total=None, sock_connect=CONNECT_TIMEOUT, sock_read=read_timeout
+            )
+        api_url = api_url or self.api_url
+        if max_retries is None:
+            max_retries = self.max_retries
+        for attempt in range(max_retries + 1):
+            last = attempt == max_retries
+            try:
+                response = await self.session.request(
+                    method, f"{api_url}/{path}", **kwargs
+                )
+            except _CONNECT_ERRORS:
+                if last:
+                    raise
+            else:
+                if last or response.status not in RETRY_STATUSES:
+                    return response
+                response.release()
+            self.retries += 1
+            delay = min(RETRY_BACKOFF_MAX, RETRY_BACKOFF * 2 ** attempt)
+            await asyncio.sleep(random.uniform(0, delay))
+
+    async def generate(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        params: Optional[Dict[str, Any]] = None,
+        stream: bool = False,
+        timeout: Optional[int] = None,
+        context: Optional[List[int]] = None,
+        request_id: Optional[str] = None,
+    ) -> Union[str, AsyncIterator[Dict[str, Any]]]:
+        """
+        Generate a response from the model.
+
+        Args:
+            prompt (str): The user prompt.
+            system_prompt (str, optional): The system prompt.
+            params (dict, optional): Parameters for the model.
+            stream (bool): Whether to stream the response.
+            timeout (int, optional): Read timeout in seconds.
+            context (list, optional): Context tokens to continue from instead
+                of ``conversation_history``, which is then left untouched.
+            request_id (str, optional): Id under which a streaming generation
+                can be stopped with ``cancel``. Generations with the same id
+                also go to the same Ollama host while it stays healthy.
+
+        Returns:
+            Union[str, AsyncIterator[Dict[str, Any]]]: The model's response,
+            or when streaming an async generator of token events in the same
+            format as ``OllamaClient``.
+        """
+        payload = build_payload(
+            self.model_name,
+            prompt,
+            system_prompt,
+            params or self.default_params,
+            stream,
+            self.conversation_history if context is None else context,
+        )
+        started = time.perf_counter()
+        tried: List[OllamaNode] = []
+        while True:
+            node = self.backends.acquire(request_id, exclude=tried)
+            tried.append(node)
+            failover = self.backends.has_alternative(tried)
+            try:
+                response = await self._request(
+                    "POST",
+                    "generate",
+                    json=payload,
+                    read_timeout=timeout or self.request_timeout,
+                    api_url=node.api_url,
+                    max_retries=0 if failover else None,
+                )
+            except aiohttp.ClientError as e:
+                self.backends.release(node, failed=True)
+                if failover and isinstance(e, _CONNECT_ERRORS):
+                    self.backends.mark_down(node, e)
+                    continue
+                raise Exception(f"Request error: {str(e)}")
+
+            if response.status in RETRY_STATUSES and failover:
+                response.release()
+                self.backends.release(node, failed=True)
+                continue
+            if response.status != 200:
+                text = await response.text()
+                response.release()
+                self.backends.release(node, failed=True)
+                raise Exception(f"Error: {response.status} - {text}")
+            break
+
+        track_history = context is None
+        if stream:
+            return self._handle_stream_response(
+                response, track_history, request_id, node, started
+            )
+        generation = self.generations.start(None, response.close, started)
+        try:
+            async with response:
+                data = await response.json(content_type=None)
+            generation.done = True
+            generation.final = data
+        except BaseException:
+            generation.failed = True
+            raise
+        finally:
+            self.generations.finish(generation)
+            self.backends.release(node, failed=generation.failed)
+        if track_history and "context" in data:
+            self.conversation_history = data["context"]
+        return data.get("response", "")
+
+    def _handle_stream_response(
+        self,
+        response: aiohttp.ClientResponse,
+        track_history: bool = True,
+        request_id: Optional[str] = None,
+        node: Optional[OllamaNode] = None,
+        started: Optional[float] = None,
+    ) -> AsyncGenerationStream:
+        """
+        Stream token events as they arrive; see OllamaClient._handle_stream_response.
+
+        The generation is registered before this returns. Closing the
+        stream (``aclose()``) or ``cancel(request_id)`` closes the
+        connection, even if no event was read yet.
+
+        Args:
+            response (aiohttp.ClientResponse): The API response.
+            track_history (bool): Whether to store the final context.
+            request_id (str, optional): Id to register the generation under.
+            node (OllamaNode, optional): Host serving the stream, released
+                from the backend pool when the stream ends.
+            started (float, optional): ``time.perf_counter()`` when the
+                request was sent, for the time to first token.
+
+        Returns:
+            AsyncGenerationStream: An async iterator of one event per streamed chunk.
+        """
+        generation = self.generations.start(request_id, response.close, started)
+
+        def release() -> None:
+            response.close()
+            self.generations.finish(generation)
+            if node is not None:
+                self.backends.release(node, failed=generation.failed)
+
+        return AsyncGenerationStream(
+            self._read_stream(response, generation, track_history), release
+        )
+
+    async def _read_stream(
+        self, response: aiohttp.ClientResponse, generation: Generation, track_history: bool
+    ) -> AsyncIterator[Dict[str, Any]]:
+        try:
+            async for line in response.content:
+                if generation.cancelled:
+                    raise GenerationCancelled("Generation cancelled")
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    data = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if "error" in data:
+                    raise Exception(f"Error: {data['error']}")
+                if generation.first_token is None and data.get("response"):
+                    generation.first_token = time.perf_counter()
+                if data.get("done"):
+                    generation.done = True
+                    generation.final = data
+                    if track_history and "context" in data:
+                        self.conversation_history = data["context"]
+                yield data
+            if generation.cancelled:
+                raise GenerationCancelled("Generation cancelled")
+            generation.failed = not generation.done
+        except GenerationCancelled:
+            raise
+        except Exception as e:
+            if generation.cancelled:
+                raise GenerationCancelled("Generation cancelled") from e
+            generation.failed = True
+            if isinstance(e, (aiohttp.ClientError, asyncio.TimeoutError)):
+                raise Exception(f"Request error: {str(e)}")
+            raise
+
+    def cancel(self, request_id: str) -> bool:
+        """
+        Stop a streaming generation started with ``request_id``.
+
+        Must be called from the client's event loop.
+
+        Args:
+            request_id (str): The id passed to ``generate``.
+
+        Returns:
+            bool: Whether a generation was running under that id.
+        """
+        return self.generations.cancel(request_id)
+
+    def reset_conversation(self) -> None:
+        """
+        Reset the conversation history.
+        """
+        self.conversation_history = []
+
+    async def list_models(self) -> List[str]:
+        """
+        List available models.
+
+        Returns:
+            List[str]: A list of available model names.
+        """
+        if self._models is None:
+            async with await self._request("GET", "tags") as response:
+                if response.status != 200:
+                    raise Exception(f"Error: {response.status} - {await response.text()}")
+                data = await response.json(content_type=None)
+            self._models = [model["name"] for model in data.get("models", [])]
+        return self._models
+
+    async def get_model_info(self, model_name: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get information about a model.
+
+        Args:
+            model_name (str, optional): The name of the model.
+
+        Returns:
+            Dict[str, Any]: Information about the model.
+        """
+        model_name = model_name or self.model_name
+        async with await self._request("POST", "show", json={"name": model_name}) as response:
+            if response.status != 200:
+                raise Exception(f"Error: {response.status} - {await response.text()}")
+            return await response.json(content_type=None)
+
+    async def close(self) -> None:
+        """
+        Close the underlying connections.
+        """
+        self.backends.close()
+        if self._session is not None:
+            await self._session.close()
+
+    async def __aenter__(self) -> "AsyncOllamaClient":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
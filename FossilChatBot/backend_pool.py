@@ -0,0 +1,223 @@
+"""
+Routing of generations across several Ollama hosts.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+from FossilChatBot.connection_pool import ConnectionPool
+from FossilChatBot.probes import check_model_available, check_ollama_running
+
+
+class OllamaNode:
+    """
+    One Ollama host and its load.
+    """
+
+    def __init__(self, api_url: str):
+        self.api_url = api_url
+        self.healthy = True
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.last_probe: Optional[float] = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "api_url": self.api_url,
+            "healthy": self.healthy,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "last_probe_age": time.time() - self.last_probe if self.last_probe else None,
+        }
+
+
+class BackendPool:
+    """
+    Spreads generations over Ollama hosts by least outstanding requests.
+
+    Each generation goes to the healthy host with the fewest generations
+    in flight. Generations with a key (the chat session id) stick to the
+    host they first went to, so the session's ``context`` keeps hitting
+    that host's warm KV cache. If the host goes down, they move to another
+    one. A background thread probes every host with the ``/version`` and
+    ``/tags`` checks from probes. A host that fails a probe or a
+    request is skipped until it passes a probe again. If no host is
+    healthy, all of them are tried anyway.
+    """
+
+    def __init__(
+        self,
+        api_urls: Iterable[str],
+        model_name: str,
+        probe_interval: float = 10,
+        probe_timeout: float = 2,
+        max_sticky: int = 10000,
+    ):
+        """
+        Initialize the backend pool.
+
+        Args:
+            api_urls (iterable): API URLs of the Ollama hosts.
+            model_name (str): Model a host must have to count as healthy.
+            probe_interval (float): Seconds between health probes (0 disables).
+            probe_timeout (float): Read timeout for a probe.
+            max_sticky (int): Session-to-host assignments remembered.
+        """
+        self.nodes = [OllamaNode(api_url) for api_url in api_urls]
+        if not self.nodes:
+            raise ValueError("At least one Ollama API URL is required")
+        self.model_name = model_name
+        self.probe_interval = probe_interval
+        self.max_sticky = max_sticky
+        self.failovers = 0
+        self._sticky: "OrderedDict[str, OllamaNode]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._http = ConnectionPool(
+            pool_size=1,
+            connect_timeout=probe_timeout,
+            read_timeout=probe_timeout,
+            max_retries=0,
+            hosts=len(self.nodes),
+        )
+        if len(self.nodes) > 1 and probe_interval > 0:
+            threading.Thread(target=self._probe_loop, name="ollama-probe", daemon=True).start()
+
+    @property
+    def api_url(self) -> str:
+        """
+        URL of a healthy host, for requests that are not generations.
+        """
+        with self._lock:
+            return next((node for node in self.nodes if node.healthy), self.nodes[0]).api_url
+
+    def acquire(self, key: Optional[str] = None, exclude: Iterable[OllamaNode] = ()) -> OllamaNode:
+        """
+        Choose the host for a generation and count it as in flight.
+
+        Args:
+            key (str, optional): Session the generation belongs to.
+            exclude (iterable): Hosts that already failed this request.
+
+        Returns:
+            OllamaNode: The host; pass it to ``release`` when done.
+
+        Raises:
+            Exception: Every host was excluded.
+        """
+        with self._lock:
+            candidates = [node for node in self.nodes if node not in exclude]
+            if not candidates:
+                raise Exception("Error: no Ollama host is reachable")
+            candidates = [node for node in candidates if node.healthy] or candidates
+            node = self._sticky.get(key) if key else None
+            if node in candidates:
+                self._sticky.move_to_end(key)
+            else:
+                if node is not None:
+                    self.failovers += 1
+                node = min(candidates, key=lambda n: (n.in_flight, n.requests))
+                if key:
+                    self._sticky[key] = node
+                    while len(self._sticky) > self.max_sticky:
+                        self._sticky.popitem(last=False)
+            node.in_flight += 1
+            node.requests += 1
+            return node
+
+    def release(self, node: OllamaNode, failed: bool = False) -> None:
+        """
+        Count a generation on a host as finished.
+
+        Args:
+            node (OllamaNode): The host from ``acquire``.
+            failed (bool): Whether the generation failed.
+        """
+        with self._lock:
+            node.in_flight -= 1
+            if failed:
+                node.failures += 1
+
+    def mark_down(self, node: OllamaNode, error: Any) -> None:
+        """
+        Skip a host that could not be reached until a probe passes again.
+
+        Args:
+            node (OllamaNode): The host.
+            error: What went wrong.
+        """
+        with self._lock:
+            node.healthy = False
+            node.last_error = str(error)
+
+    def has_alternative(self, exclude: Iterable[OllamaNode]) -> bool:
+        """
+        Tell whether a host outside ``exclude`` is left to fail over to.
+        """
+        return any(node not in exclude for node in self.nodes)
+
+    def probe(self, node: OllamaNode) -> bool:
+        """
+        Check that a host is up and has the model.
+
+        Args:
+            node (OllamaNode): The host.
+
+        Returns:
+            bool: Whether the host is healthy.
+        """
+        healthy = check_ollama_running(node.api_url, self._http) and check_model_available(
+            node.api_url, self.model_name, self._http
+        )
+        with self._lock:
+            node.healthy = healthy
+            node.last_probe = time.time()
+            if not healthy:
+                node.last_error = "health probe failed"
+        return healthy
+
+    def probe_all(self) -> List[bool]:
+        """
+        Probe every host now.
+
+        Returns:
+            List[bool]: Health of each host, in order.
+        """
+        return [self.probe(node) for node in self.nodes]
+
+    def _probe_loop(self) -> None:
+        while not self._stop.is_set():
+            self.probe_all()
+            self._stop.wait(self.probe_interval)
+
+    def close(self) -> None:
+        """
+        Stop probing and close the probe connections.
+        """
+        self._stop.set()
+        self._http.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report per-host load and health.
+
+        Returns:
+            Dict[str, Any]: One entry per host plus pool-wide counters.
+        """
+        with self._lock:
+            sticky: Dict[str, int] = {}
+            for node in self._sticky.values():
+                sticky[node.api_url] = sticky.get(node.api_url, 0) + 1
+            return {
+                "nodes": [
+                    dict(node.stats(), sessions=sticky.get(node.api_url, 0))
+                    for node in self.nodes
+                ],
+                "failovers": self.failovers,
+            }
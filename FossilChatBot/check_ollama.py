@@ -3,62 +3,16 @@
 Script to check if Ollama is running and the model is available.
 """
 
+import os
 import sys
-import requests
 from rich.console import Console
 
-from config import OLLAMA_API_URL, MODEL_NAME
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-
-def check_ollama_running():
-    """
-    Check if Ollama is running.
-    
-    Returns:
-        bool: True if Ollama is running, False otherwise.
-    """
-    try:
-        response = requests.get(f"{OLLAMA_API_URL}/version")
-        return response.status_code == 200
-    except requests.exceptions.ConnectionError:
-        return False
-
-
-def check_model_available():
-    """
-    Check if the model is available.
-    
-    Returns:
-        bool: True if the model is available, False otherwise.
-    """
-    try:
-        response = requests.get(f"{OLLAMA_API_URL}/tags")
-        if response.status_code != 200:
-            return False
-            
-        data = response.json()
-        models = [model["name"] for model in data.get("models", [])]
-        return MODEL_NAME in models
-    except requests.exceptions.ConnectionError:
-        return False
-
-
-def list_available_models():
-    """
-    List all available models.
-    
-    Returns:
-        list: A list of available model names.
-    """
-    try:
-        response = requests.get(f"{OLLAMA_API_URL}/tags")
-        if response.status_code != 200:
-            return []
-            
-        data = response.json()
-        return [model["name"] for model in data.get("models", [])]
-    except requests.exceptions.ConnectionError:
-        return []
+from FossilChatBot.config import (
+    OLLAMA_API_URL, MODEL_NAME, CONNECT_TIMEOUT, MAX_RETRIES, RETRY_BACKOFF)
+from FossilChatBot.connection_pool import ConnectionPool
+from FossilChatBot.probes import check_model_available, check_ollama_running, list_models
 
 
 def main():
@@ -66,10 +20,17 @@ def main():
     Main entry point.
     """
     console = Console()
+    pool = ConnectionPool(
+        pool_size=1,
+        connect_timeout=CONNECT_TIMEOUT,
+        read_timeout=10,
+        max_retries=MAX_RETRIES,
+        backoff=RETRY_BACKOFF,
+    )
     
     # Check if Ollama is running
     console.print("Controleren of Ollama draait...")
-    if not check_ollama_running():
+    if not check_ollama_running(OLLAMA_API_URL, pool):
         console.print("[red]Fout: Ollama draait niet.[/red]")
         console.print("Start Ollama en probeer het opnieuw.")
         sys.exit(1)
@@ -77,11 +38,11 @@ def main():
     
     # Check if the model is available
     console.print(f"Controleren of model '{MODEL_NAME}' beschikbaar is...")
-    if not check_model_available():
+    if not check_model_available(OLLAMA_API_URL, MODEL_NAME, pool):
         console.print(f"[red]Fout: Model '{MODEL_NAME}' is niet beschikbaar.[/red]")
         
         # List available models to help the user
-        available_models = list_available_models()
+        available_models = list_models(OLLAMA_API_URL, pool)
         if available_models:
             console.print("\nBeschikbare modellen:")
             for model in available_models:
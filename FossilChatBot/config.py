@@ -4,8 +4,33 @@ Configuration settings for the Ollama DeepSeek-v3 project.
 
 # Ollama API settings
 OLLAMA_API_URL = "http://localhost:11434/api"
+OLLAMA_API_URLS = [OLLAMA_API_URL]  # Hosts chat generations are spread over
 MODEL_NAME = "nezahatkorkmaz/deepseek-v3:latest"
 
+# Connection settings
+HTTP_POOL_SIZE = 10         # Keep-alive connections per Ollama host
+ASYNC_HTTP_POOL_SIZE = 256  # Simultaneous connections for the asyncio client
+CONNECT_TIMEOUT = 3.05      # Seconds to establish a connection
+READ_TIMEOUT = 60           # Seconds to wait between streamed bytes
+MAX_RETRIES = 3             # Retries for requests that never reached Ollama
+RETRY_BACKOFF = 0.25        # Base delay for jittered exponential backoff
+RETRY_BACKOFF_MAX = 4.0     # Longest single backoff delay
+HEALTH_CHECK_INTERVAL = 10  # Seconds between health probes of each Ollama host
+HEALTH_CHECK_TIMEOUT = 2    # Seconds a health probe may take
+
+# Generation scheduler
+MAX_IN_FLIGHT = 2    # Generations sent to Ollama at once (match OLLAMA_NUM_PARALLEL)
+MAX_BACKGROUND = 1   # Of those, slots cache warm-up work may hold
+MAX_QUEUED = 64      # Requests allowed to wait for a slot before being turned away
+QUEUE_TIMEOUT = 30   # Seconds a request may wait for a slot
+RETRY_AFTER = 2      # Seconds clients are told to wait after being turned away
+
+# Web chat sessions
+SESSION_MAX = 10000                   # Sessions kept in memory
+SESSION_MAX_BYTES = 64 * 1024 * 1024  # Memory budget for all sessions together
+SESSION_TTL = 30 * 60                 # Seconds a session may stay idle
+SESSION_DB_PATH = None                # SQLite file to persist sessions across restarts
+
 # Model parameters
 DEFAULT_PARAMS = {
     "temperature": 0.7,  # Higher temperature for more creative responses
@@ -14,10 +39,20 @@ DEFAULT_PARAMS = {
     "num_ctx": 2048,    # Balanced context window
     "repeat_penalty": 1.1,
     "seed": 42,
-    "num_thread": 4,    # Balanced thread count
-    "num_gpu": 1,       # Use GPU if available
-    "num_batch": 8,     # Balanced batch size
+    # num_thread, num_gpu (layers offloaded, not GPUs) and num_batch are
+    # left to Ollama, which sizes them for the host and model
 }
 
 # Application settings
-MAX_HISTORY = 5  # Balanced history size 
\ No newline at end of file
+MAX_HISTORY = 5  # Balanced history size
+RESPONSE_TOKEN_RESERVE = 512  # Context tokens kept free for the answer
+
+# System-prompt prefix cache
+PREFIX_CACHE_SIZE = 256           # Pre-evaluated system prompts kept (0 disables)
+PREFIX_PROMPT = "Reply with OK."  # Primer sent after the system prompt when evaluating a prefix (cut from the cached context)
+PREFIX_NUM_PREDICT = 1            # Tokens the model may answer the primer with
+
+# Response cache for the first turn of a conversation (needs a fixed "seed")
+RESPONSE_CACHE_SIZE = 1024        # Answers kept in memory (0 disables)
+RESPONSE_CACHE_PATH = None        # SQLite file so answers survive restarts
+RESPONSE_CACHE_DISK_SIZE = 10000  # Answers kept on disk
@@ -0,0 +1,156 @@
+"""
+Keep-alive HTTP connection pool for talking to Ollama.
+"""
+
+import random
+import threading
+import time
+from typing import Any, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+
+# Status codes Ollama answers before doing any work, so a retry is safe.
+RETRY_STATUSES = (503,)
+
+
+def is_safe_to_retry(error: requests.exceptions.RequestException) -> bool:
+    """
+    Tell whether a failed request never reached Ollama.
+
+    Only failures while opening the connection qualify: the request was
+    never sent, so retrying cannot start a second generation. Errors after
+    the request went out (resets, read timeouts) are not retried.
+
+    Args:
+        error (RequestException): The exception raised by requests.
+
+    Returns:
+        bool: True if the request can be retried.
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if not isinstance(error, requests.exceptions.ConnectionError):
+        return False
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, (NewConnectionError, ConnectTimeoutError))
+
+
+class ConnectionPool:
+    """
+    Pooled keep-alive connections with separate connect and read timeouts.
+
+    One pool is meant to be shared by all threads of a process. Each
+    thread gets its own ``requests.Session``; the sessions share a single
+    ``HTTPAdapter``, whose urllib3 connection pools are thread-safe, so
+    connections are reused across threads without sharing session state.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 10,
+        connect_timeout: float = 3.05,
+        read_timeout: float = 60,
+        max_retries: int = 3,
+        backoff: float = 0.25,
+        backoff_max: float = 4.0,
+        hosts: int = 1,
+    ):
+        """
+        Initialize the connection pool.
+
+        Args:
+            pool_size (int): Connections kept alive per host.
+            connect_timeout (float): Seconds to wait for a connection.
+            read_timeout (float): Seconds to wait between bytes received.
+            max_retries (int): Retries for requests that never reached the server.
+            backoff (float): Base delay in seconds for exponential backoff.
+            backoff_max (float): Upper bound for a single backoff delay.
+            hosts (int): Hosts the pool talks to; a connection pool is
+                kept for each, so none is evicted and reconnected.
+        """
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.adapter = HTTPAdapter(pool_connections=max(1, hosts), pool_maxsize=pool_size)
+        self._local = threading.local()
+        self.retries = 0
+
+    @property
+    def session(self) -> requests.Session:
+        """
+        The calling thread's session, created on first use.
+        """
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("http://", self.adapter)
+            session.mount("https://", self.adapter)
+            self._local.session = session
+        return session
+
+    def backoff_delay(self, attempt: int) -> float:
+        """
+        Full-jitter exponential backoff for the given retry attempt.
+
+        Args:
+            attempt (int): Zero-based retry number.
+
+        Returns:
+            float: Seconds to sleep before the retry.
+        """
+        return random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt))
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        read_timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        **kwargs: Any,
+    ) -> requests.Response:
+        """
+        Send a request, retrying only failures that are safe to repeat.
+
+        Args:
+            method (str): HTTP method.
+            url (str): Full request URL.
+            read_timeout (float, optional): Override for the read timeout.
+            max_retries (int, optional): Override for the retry count, e.g.
+                0 when another host can take the request instead.
+            **kwargs: Passed on to ``requests.Session.request``.
+
+        Returns:
+            requests.Response: The response; the last one if 503 persisted.
+        """
+        timeout = (self.connect_timeout, read_timeout or self.read_timeout)
+        if max_retries is None:
+            max_retries = self.max_retries
+        for attempt in range(max_retries + 1):
+            last = attempt == max_retries
+            try:
+                response = self.session.request(method, url, timeout=timeout, **kwargs)
+            except requests.exceptions.RequestException as e:
+                if last or not is_safe_to_retry(e):
+                    raise
+            else:
+                if last or response.status_code not in RETRY_STATUSES:
+                    return response
+                response.close()
+            self.retries += 1
+            time.sleep(self.backoff_delay(attempt))
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def close(self) -> None:
+        """
+        Close every pooled connection.
+        """
+        self.adapter.close()
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Stand-in for the Ollama API, for load tests without a model.
+
+Implements /api/generate (streaming or not), /api/tags, /api/show and
+/api/version closely enough for OllamaClient, AsyncOllamaClient and
+check_ollama.py. Generations wait the configured time to first token,
+then emit filler tokens at the configured rate and end with a final
+event carrying a ``context`` and the usual eval stats. A fraction of
+requests can be made to fail, either with an HTTP 500 or with an error
+line in the middle of the stream.
+
+Usage: python -m FossilChatBot.fake_ollama [--port 11434] [--ttft 0.5]
+       [--tokens-per-second 20] [--tokens 120] [--error-rate 0.0]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from FossilChatBot.config import DEFAULT_PARAMS, MODEL_NAME
+
+FILLER = (
+    "Fossils form when remains are buried quickly in sediment and minerals "
+    "slowly replace the original material over millions of years."
+).split()
+
+
+def tokenize(text: str) -> List[int]:
+    """
+    Stand-in tokenizer: one token per four characters, the same for the same text.
+    """
+    return [zlib.crc32(text[i:i + 4].encode()) % 32000 for i in range(0, len(text), 4)]
+
+
+class FakeOllama:
+    """
+    Configurable fake Ollama server.
+    """
+
+    def __init__(
+        self,
+        model_name: str = MODEL_NAME,
+        ttft: float = 0.5,
+        prompt_tokens_per_second: float = 0,
+        tokens_per_second: float = 20,
+        tokens: int = 120,
+        error_rate: float = 0.0,
+        error_mode: str = "status",
+        context_size: int = DEFAULT_PARAMS["num_ctx"],
+        parallel: int = 0,
+        seed: Optional[int] = None,
+    ):
+        """
+        Initialize the fake server.
+
+        Args:
+            model_name (str): The only model the server has.
+            ttft (float): Seconds before the first token of every generation.
+            prompt_tokens_per_second (float): If set, prompt evaluation adds
+                prompt tokens / this rate to the time to first token.
+            tokens_per_second (float): Rate at which tokens are generated.
+            tokens (int): Tokens per answer (capped by ``num_predict``).
+            error_rate (float): Fraction of generations that fail.
+            error_mode (str): ``"status"`` to fail with HTTP 500 up front,
+                ``"stream"`` to fail halfway through the stream.
+            context_size (int): Most context tokens returned (the window).
+            parallel (int): Generations run at once; more wait (0 = no limit).
+            seed (int, optional): Seed for which requests fail.
+        """
+        self.model_name = model_name
+        self.ttft = ttft
+        self.prompt_tokens_per_second = prompt_tokens_per_second
+        self.tokens_per_second = tokens_per_second
+        self.tokens = tokens
+        self.error_rate = error_rate
+        self.error_mode = error_mode
+        self.context_size = context_size
+        self.parallel = parallel
+        self.random = random.Random(seed)
+        self.digest = hashlib.sha256(model_name.encode()).hexdigest()
+        self.generations = 0
+        self.failures = 0
+        self.disconnects = 0
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def app(self) -> web.Application:
+        """
+        Build the aiohttp application.
+
+        Returns:
+            web.Application: The app, serving the API under /api.
+        """
+        app = web.Application()
+        app.router.add_post("/api/generate", self.generate)
+        app.router.add_get("/api/tags", self.tags)
+        app.router.add_post("/api/show", self.show)
+        app.router.add_get("/api/version", self.version)
+        return app
+
+    def start(self, host: str = "127.0.0.1", port: int = 11434) -> str:
+        """
+        Serve in a background thread, e.g. from a load test.
+
+        Args:
+            host (str): Interface to listen on.
+            port (int): Port to listen on.
+
+        Returns:
+            str: The API URL to point a client at.
+        """
+        ready = threading.Event()
+
+        def serve() -> None:
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            runner = web.AppRunner(self.app(), access_log=None)
+            loop.run_until_complete(runner.setup())
+            site = web.TCPSite(runner, host, port, backlog=1024)
+            loop.run_until_complete(site.start())
+            ready.set()
+            loop.run_forever()
+
+        threading.Thread(target=serve, name="fake-ollama", daemon=True).start()
+        ready.wait()
+        return f"http://{host}:{port}/api"
+
+    async def generate(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        if body.get("model") != self.model_name:
+            return web.json_response(
+                {"error": f"model '{body.get('model')}' not found"}, status=404
+            )
+        self.generations += 1
+        fail = self.random.random() < self.error_rate
+        if fail and self.error_mode == "status":
+            self.failures += 1
+            return web.json_response({"error": "simulated failure"}, status=500)
+
+        if self._slots is None and self.parallel:
+            self._slots = asyncio.Semaphore(self.parallel)
+        if self._slots:
+            async with self._slots:
+                return await self._generate(request, body, fail)
+        return await self._generate(request, body, fail)
+
+    async def _generate(
+        self, request: web.Request, body: Dict[str, Any], fail: bool
+    ) -> web.StreamResponse:
+        start = time.perf_counter()
+        tokens = tokenize(body.get("system") or "") + tokenize(body.get("prompt", ""))
+        prompt_tokens = max(1, len(tokens))
+        num_predict = body.get("options", {}).get("num_predict")
+        count = self.tokens
+        if num_predict is not None and num_predict >= 0:
+            count = min(num_predict, self.tokens)
+        delay = self.ttft
+        if self.prompt_tokens_per_second:
+            delay += prompt_tokens / self.prompt_tokens_per_second
+        await asyncio.sleep(delay)
+        prompt_done = time.perf_counter()
+
+        words = [FILLER[i % len(FILLER)] + " " for i in range(count)]
+        context = list(body.get("context") or []) + tokens + [
+            self.random.randrange(32000) for _ in range(count)
+        ]
+        final = {
+            "model": self.model_name,
+            "response": "",
+            "done": True,
+            "done_reason": "stop",
+            "context": context[-self.context_size:],
+            "load_duration": 0,
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int((prompt_done - start) * 1e9),
+            "eval_count": count,
+        }
+
+        if not body.get("stream", True):
+            await asyncio.sleep(count / self.tokens_per_second)
+            if fail:
+                self.failures += 1
+                return web.json_response({"error": "simulated failure"}, status=500)
+            end = time.perf_counter()
+            final.update(
+                response="".join(words),
+                eval_duration=int((end - prompt_done) * 1e9),
+                total_duration=int((end - start) * 1e9),
+            )
+            return web.json_response(final)
+
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        try:
+            for i, word in enumerate(words):
+                if fail and i == count // 2:
+                    self.failures += 1
+                    await response.write(b'{"error": "simulated failure"}\n')
+                    return response
+                event = {"model": self.model_name, "response": word, "done": False}
+                await response.write(json.dumps(event).encode() + b"\n")
+                await asyncio.sleep(1 / self.tokens_per_second)
+            end = time.perf_counter()
+            final.update(
+                eval_duration=int((end - prompt_done) * 1e9),
+                total_duration=int((end - start) * 1e9),
+            )
+            await response.write(json.dumps(final).encode() + b"\n")
+            await response.write_eof()
+        except ConnectionResetError:
+            # The client hung up, which is how Ollama is told to stop.
+            self.disconnects += 1
+        except asyncio.CancelledError:
+            self.disconnects += 1
+            raise
+        return response
+
+    def _details(self) -> Dict[str, Any]:
+        return {"format": "gguf", "family": "fake", "parameter_size": "0B"}
+
+    async def tags(self, request: web.Request) -> web.Response:
+        return web.json_response({"models": [{
+            "name": self.model_name,
+            "model": self.model_name,
+            "digest": self.digest,
+            "size": 0,
+            "details": self._details(),
+        }]})
+
+    async def show(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        if (body.get("name") or body.get("model")) != self.model_name:
+            return web.json_response({"error": "model not found"}, status=404)
+        return web.json_response({
+            "modelfile": f"FROM {self.model_name}",
+            "parameters": f"num_ctx {self.context_size}",
+            "template": "{{ .System }}\n{{ .Prompt }}",
+            "details": self._details(),
+        })
+
+    async def version(self, request: web.Request) -> web.Response:
+        return web.json_response({"version": "0.0.0-fake"})
+
+
+def main() -> None:
+    """
+    Main entry point.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--ttft", type=float, default=0.5,
+                        help="seconds before the first token")
+    parser.add_argument("--prompt-tokens-per-second", type=float, default=0,
+                        help="prompt evaluation rate added to the TTFT (0 = ignore prompt length)")
+    parser.add_argument("--tokens-per-second", type=float, default=20)
+    parser.add_argument("--tokens", type=int, default=120, help="tokens per answer")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-mode", choices=["status", "stream"], default="status")
+    parser.add_argument("--context-size", type=int, default=DEFAULT_PARAMS["num_ctx"],
+                        help="most context tokens returned")
+    parser.add_argument("--parallel", type=int, default=0,
+                        help="generations run at once (0 = no limit)")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    fake = FakeOllama(
+        model_name=args.model,
+        ttft=args.ttft,
+        prompt_tokens_per_second=args.prompt_tokens_per_second,
+        tokens_per_second=args.tokens_per_second,
+        tokens=args.tokens,
+        error_rate=args.error_rate,
+        error_mode=args.error_mode,
+        context_size=args.context_size,
+        parallel=args.parallel,
+        seed=args.seed,
+    )
+    web.run_app(fake.app(), host=args.host, port=args.port, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Bookkeeping for generations, so streaming ones can be cancelled and all can be measured.
+"""
+
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+
+class GenerationCancelled(Exception):
+    """
+    The generation was cancelled before it finished.
+    """
+
+
+class Generation:
+    """
+    One streaming generation in progress.
+
+    ``cancel()`` may be called from any thread: it sets a flag the reader
+    checks before every event and interrupts a read that is blocked
+    waiting for the next one. The reader also notes when the first token
+    arrived and keeps the final event, with its eval stats, for listeners.
+    """
+
+    def __init__(
+        self,
+        request_id: Optional[str],
+        interrupt: Callable[[], None],
+        started: Optional[float] = None,
+    ):
+        self.request_id = request_id
+        self.interrupt = interrupt
+        self.started = time.perf_counter() if started is None else started
+        self.first_token: Optional[float] = None
+        self.final: Optional[Dict[str, Any]] = None
+        self.cancelled = False
+        self.done = False
+        self.failed = False
+
+    def cancel(self) -> None:
+        self.cancelled = True
+        try:
+            self.interrupt()
+        except Exception:
+            # The reader still stops at the next event.
+            pass
+
+
+class GenerationStream:
+    """
+    The events of a streaming generation, released however the stream ends.
+
+    The generation is registered, and its response and host held, before
+    the first event is read, so it can be cancelled right away. ``close()``
+    releases them even if the stream was never iterated, when the
+    ``finally`` of a generator would never run.
+    """
+
+    def __init__(self, events: Iterator[Dict[str, Any]], release: Callable[[], None]):
+        self._events = events
+        self._release = release
+        self._released = False
+
+    def __iter__(self) -> "GenerationStream":
+        return self
+
+    def __next__(self) -> Dict[str, Any]:
+        try:
+            return next(self._events)
+        except BaseException:
+            self.close()
+            raise
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._release()
+
+    def close(self) -> None:
+        try:
+            self._events.close()
+        finally:
+            self.release()
+
+    def __del__(self) -> None:
+        self.release()
+
+
+class AsyncGenerationStream:
+    """
+    Async counterpart of ``GenerationStream``, closed with ``aclose()``.
+    """
+
+    def __init__(self, events: AsyncIterator[Dict[str, Any]], release: Callable[[], None]):
+        self._events = events
+        self._release = release
+        self._released = False
+
+    def __aiter__(self) -> "AsyncGenerationStream":
+        return self
+
+    async def __anext__(self) -> Dict[str, Any]:
+        try:
+            return await self._events.__anext__()
+        except BaseException:
+            await self.aclose()
+            raise
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._release()
+
+    async def aclose(self) -> None:
+        try:
+            await self._events.aclose()
+        finally:
+            self.release()
+
+    def __del__(self) -> None:
+        # The event generator is finalized by the event loop.
+        self.release()
+
+
+class GenerationRegistry:
+    """
+    Streaming generations by request id, with counts of how they ended.
+
+    A generation ends ``completed`` (its final event was read), ``cancelled``
+    (by ``cancel()``), ``failed`` (an error or a truncated stream) or
+    ``abandoned`` (the consumer stopped reading, e.g. because the web client
+    disconnected). Abandoned and cancelled generations had their connection
+    to Ollama closed, which stops the generation there.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active: Dict[str, Generation] = {}
+        self._outcomes = {"completed": 0, "cancelled": 0, "failed": 0, "abandoned": 0}
+        self._listeners: List[Callable[[Generation, str], None]] = []
+
+    def add_listener(self, listener: Callable[[Generation, str], None]) -> None:
+        """
+        Register ``listener(generation, outcome)`` to see every finished generation.
+
+        Args:
+            listener (callable): Called on the reader's thread, so it must be cheap.
+        """
+        self._listeners.append(listener)
+
+    def start(
+        self,
+        request_id: Optional[str],
+        interrupt: Callable[[], None],
+        started: Optional[float] = None,
+    ) -> Generation:
+        """
+        Register a generation.
+
+        Args:
+            request_id (str, optional): Id to cancel it by; a newer generation
+                with the same id replaces it in the registry.
+            interrupt (callable): Unblocks a pending read of the stream.
+            started (float, optional): ``time.perf_counter()`` when the
+                request was sent; defaults to now.
+
+        Returns:
+            Generation: The generation's handle.
+        """
+        generation = Generation(request_id, interrupt, started)
+        if request_id is not None:
+            with self._lock:
+                self._active[request_id] = generation
+        return generation
+
+    def finish(self, generation: Generation) -> None:
+        """
+        Unregister a generation and count its outcome.
+
+        Args:
+            generation (Generation): The generation's handle.
+        """
+        if generation.cancelled:
+            outcome = "cancelled"
+        elif generation.done:
+            outcome = "completed"
+        elif generation.failed:
+            outcome = "failed"
+        else:
+            outcome = "abandoned"
+        with self._lock:
+            if self._active.get(generation.request_id) is generation:
+                del self._active[generation.request_id]
+            self._outcomes[outcome] += 1
+        for listener in self._listeners:
+            listener(generation, outcome)
+
+    def cancel(self, request_id: str) -> bool:
+        """
+        Cancel the generation registered under an id.
+
+        Args:
+            request_id (str): The id passed to ``generate``.
+
+        Returns:
+            bool: Whether a generation was running under that id.
+        """
+        with self._lock:
+            generation = self._active.pop(request_id, None)
+        if generation is None:
+            return False
+        generation.cancel()
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report running generations and how finished ones ended.
+
+        Returns:
+            Dict[str, Any]: The active count and a count per outcome.
+        """
+        with self._lock:
+            return {"active": len(self._active), **self._outcomes}
@@ -0,0 +1,148 @@
+"""
+Context-window budgeting for chat sessions.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class HistoryManager:
+    """
+    Keeps a session's turns as messages and fits each request to a token budget.
+
+    A session normally continues from the Ollama ``context`` of its previous
+    turn, so only the new prompt is evaluated. When the context plus the new
+    prompt would exceed the budget, or the system prompt changes, the
+    context is dropped and rebuilt from the system prompt and the most
+    recent turns that fit in half the budget (at most ``max_turns``),
+    starting from the pre-evaluated system prompt when one is cached. The
+    window therefore never overflows ``num_ctx`` and prompt evaluation per
+    turn stays bounded instead of growing with the conversation.
+
+    The state lives in the session store as a plain dict:
+    ``context`` (token ids), ``system`` (the system prompt the context was
+    built with) and ``turns`` (``{"user", "assistant", "tokens"}`` dicts).
+    """
+
+    def __init__(
+        self,
+        token_budget: int,
+        max_turns: int = 5,
+        chars_per_token: float = 4.0,
+        prefixes: Optional[Any] = None,
+    ):
+        """
+        Initialize the history manager.
+
+        Args:
+            token_budget (int): Tokens the prompt side may use; num_ctx minus
+                room for the answer.
+            max_turns (int): Most recent turns carried into a rebuilt window.
+            chars_per_token (float): Characters per token for estimates.
+            prefixes (PrefixCache, optional): Pre-evaluated system prompts to
+                start rebuilt windows from.
+        """
+        self.token_budget = token_budget
+        self.max_turns = max_turns
+        self.chars_per_token = chars_per_token
+        self.prefixes = prefixes
+
+    def estimate_tokens(self, text: str) -> int:
+        """
+        Estimate the token count of a text.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            int: Estimated tokens (at least 1).
+        """
+        return max(1, int(len(text) / self.chars_per_token))
+
+    def prepare(
+        self, state: Dict[str, Any], prompt: str, system_prompt: Optional[str]
+    ) -> Tuple[str, Optional[str], List[int]]:
+        """
+        Build the next request for a session.
+
+        Args:
+            state (dict): The session state; updated if the window is rebuilt.
+            prompt (str): The new user prompt.
+            system_prompt (str, optional): The system prompt for this turn.
+
+        Returns:
+            Tuple[str, Optional[str], List[int]]: The prompt, system prompt
+            and context to send.
+        """
+        context = state.get("context") or []
+        prompt_tokens = self.estimate_tokens(prompt)
+        if (
+            context
+            and state.get("system") == system_prompt
+            and len(context) + prompt_tokens <= self.token_budget
+        ):
+            # The system prompt is already at the start of the context.
+            return prompt, None, context
+
+        state["context"] = []
+        state["system"] = system_prompt
+        state["rebuilds"] = state.get("rebuilds", 0) + 1
+        room = self.token_budget // 2 - prompt_tokens
+        if system_prompt:
+            room -= self.estimate_tokens(system_prompt)
+        turns = state.get("turns", [])
+        kept: List[Dict[str, Any]] = []
+        for turn in reversed(turns[max(0, len(turns) - self.max_turns):]):
+            room -= turn["tokens"]
+            if room < 0:
+                break
+            kept.insert(0, turn)
+
+        prefix = self.prefixes.get(system_prompt) if self.prefixes and system_prompt else None
+        state["prefix"] = prefix is not None
+        if prefix:
+            return self.render(kept, prompt), None, prefix
+        return self.render(kept, prompt), system_prompt, []
+
+    def render(self, turns: List[Dict[str, Any]], prompt: str) -> str:
+        """
+        Write earlier turns into the prompt of a rebuilt window.
+
+        Args:
+            turns (list): The turns to carry over, oldest first.
+            prompt (str): The new user prompt.
+
+        Returns:
+            str: The prompt text.
+        """
+        if not turns:
+            return prompt
+        lines = ["Conversation so far:"]
+        for turn in turns:
+            lines.append(f"User: {turn['user']}")
+            lines.append(f"FossilFinder: {turn['assistant']}")
+        lines.append("")
+        lines.append(f"User: {prompt}")
+        return "\n".join(lines)
+
+    def record(
+        self, state: Dict[str, Any], prompt: str, response: str, event: Dict[str, Any]
+    ) -> None:
+        """
+        Add a finished turn to the session state.
+
+        Args:
+            state (dict): The session state.
+            prompt (str): The user prompt as typed (not the rendered one).
+            response (str): The model's full answer.
+            event (dict): The final stream event, with context and eval stats.
+        """
+        if "context" in event:
+            state["context"] = event["context"]
+        tokens = self.estimate_tokens(prompt) + event.get(
+            "eval_count", self.estimate_tokens(response)
+        )
+        turns = state.setdefault("turns", [])
+        if self.prefixes and not turns:
+            self.prefixes.observe_first_turn(state.get("prefix", False), event)
+        turns.append({"user": prompt, "assistant": response, "tokens": tokens})
+        del turns[:max(0, len(turns) - self.max_turns)]
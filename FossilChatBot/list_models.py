@@ -5,7 +5,16 @@ Script to list all available models in the Ollama installation.
 
 import sys
 import requests
-from config import OLLAMA_API_URL
+from config import OLLAMA_API_URL, CONNECT_TIMEOUT, MAX_RETRIES, RETRY_BACKOFF
+from connection_pool import ConnectionPool
+
+pool = ConnectionPool(
+    pool_size=1,
+    connect_timeout=CONNECT_TIMEOUT,
+    read_timeout=10,
+    max_retries=MAX_RETRIES,
+    backoff=RETRY_BACKOFF,
+)
 
 
 def check_ollama_running():
@@ -16,9 +25,9 @@ def check_ollama_running():
         bool: True if Ollama is running, False otherwise.
     """
     try:
-        response = requests.get(f"{OLLAMA_API_URL}/version")
+        response = pool.get(f"{OLLAMA_API_URL}/version")
         return response.status_code == 200
-    except requests.exceptions.ConnectionError:
+    except requests.exceptions.RequestException:
         return False
 
 
@@ -30,13 +39,13 @@ def list_available_models():
         list: A list of available model names.
     """
     try:
-        response = requests.get(f"{OLLAMA_API_URL}/tags")
+        response = pool.get(f"{OLLAMA_API_URL}/tags")
         if response.status_code != 200:
             return []
             
         data = response.json()
         return [model["name"] for model in data.get("models", [])]
-    except requests.exceptions.ConnectionError:
+    except requests.exceptions.RequestException:
         return []
 
 
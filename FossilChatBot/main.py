@@ -122,18 +122,14 @@ class FossilBot:
 
             full_response = ""
 
-            print("[debug] Starting to read stream...")
-
             for chunk in response_stream:
-                if not isinstance(chunk, dict):
-                    continue
-
-                if chunk.get("done"):
-                    break
-
                 text = chunk.get("response", "")
                 if text:
                     print(text, end="", flush=True)
+                    full_response += text
+
+                if chunk.get("done"):
+                    break
 
             print()
             self.console.print(Panel(Markdown(full_response), title="Advice", border_style="green"))
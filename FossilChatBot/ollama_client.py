@@ -1,11 +1,92 @@
 import json
 import requests
 import time
-from FossilChatBot.config import OLLAMA_API_URL, MODEL_NAME, DEFAULT_PARAMS
+from FossilChatBot.config import (
+    OLLAMA_API_URLS,
+    MODEL_NAME,
+    DEFAULT_PARAMS,
+    HTTP_POOL_SIZE,
+    CONNECT_TIMEOUT,
+    READ_TIMEOUT,
+    MAX_RETRIES,
+    RETRY_BACKOFF,
+    RETRY_BACKOFF_MAX,
+    PREFIX_PROMPT,
+    PREFIX_NUM_PREDICT,
+    HEALTH_CHECK_INTERVAL,
+    HEALTH_CHECK_TIMEOUT,
+    SESSION_MAX,
+)
+from FossilChatBot.backend_pool import BackendPool, OllamaNode
+from FossilChatBot.connection_pool import RETRY_STATUSES, ConnectionPool, is_safe_to_retry
+from FossilChatBot.generations import (
+    Generation,
+    GenerationCancelled,
+    GenerationRegistry,
+    GenerationStream,
+)
 
-from typing import Dict, List, Optional, Union, Any, Callable
+from typing import Dict, Iterator, List, Optional, Union, Any, Callable
 from functools import lru_cache
 
+# Timing fields Ollama adds to the final chunk of a generation (nanoseconds
+# for the durations, token counts for the rest).
+EVAL_STATS = (
+    "total_duration",
+    "load_duration",
+    "prompt_eval_count",
+    "prompt_eval_duration",
+    "eval_count",
+    "eval_duration",
+)
+
+# /generate fields that belong at the top level of the request, not in options.
+REQUEST_FIELDS = ("format", "raw", "keep_alive", "template", "suffix", "images")
+
+
+def build_payload(
+    model_name: str,
+    prompt: str,
+    system_prompt: Optional[str],
+    params: Dict[str, Any],
+    stream: bool,
+    context: Optional[List[int]] = None,
+) -> Dict[str, Any]:
+    """
+    Build the /generate request body.
+
+    Args:
+        model_name (str): The name of the model to use.
+        prompt (str): The user prompt.
+        system_prompt (str, optional): The system prompt.
+        params (dict): Parameters for the model.
+        stream (bool): Whether to stream the response.
+        context (list, optional): Context tokens from the previous turn.
+
+    Returns:
+        Dict[str, Any]: The JSON payload.
+    """
+    payload = {
+        "model": model_name,
+        "prompt": prompt,
+        "stream": stream,
+    }
+    if system_prompt:
+        payload["system"] = system_prompt
+    # Model parameters (num_ctx, seed, ...) only take effect under "options";
+    # Ollama ignores them at the top level.
+    options = {}
+    for key, value in params.items():
+        if key in REQUEST_FIELDS:
+            payload[key] = value
+        else:
+            options[key] = value
+    if options:
+        payload["options"] = options
+    if context:
+        payload["context"] = context
+    return payload
+
 
 class OllamaClient:
     """
@@ -14,25 +95,50 @@ class OllamaClient:
 
     def __init__(
         self,
-        api_url: str = OLLAMA_API_URL,
+        api_url: Union[str, List[str]] = OLLAMA_API_URLS,
         model_name: str = MODEL_NAME,
         default_params: Optional[Dict[str, Any]] = None,
+        pool: Optional[ConnectionPool] = None,
     ):
         """
         Initialize the Ollama client.
         
         Args:
-            api_url (str): The URL of the Ollama API.
+            api_url (str or list): The URL of the Ollama API, or the URLs of
+                several Ollama hosts to spread generations over.
             model_name (str): The name of the model to use.
             default_params (dict, optional): Default parameters for the model.
+            pool (ConnectionPool, optional): Connection pool to share with
+                other clients; one is created from the config if omitted.
         """
-        self.api_url = api_url
+        self.backends = BackendPool(
+            [api_url] if isinstance(api_url, str) else api_url,
+            model_name,
+            probe_interval=HEALTH_CHECK_INTERVAL,
+            probe_timeout=HEALTH_CHECK_TIMEOUT,
+            max_sticky=SESSION_MAX,
+        )
         self.model_name = model_name
         self.default_params = default_params or DEFAULT_PARAMS
         self.conversation_history: List[Dict[str, str]] = []
-        self.last_request_time = 0
-        self.min_request_interval = 0.1  # Minimum time between requests in seconds
-        self.request_timeout = 60  # Default timeout in seconds
+        self.request_timeout = READ_TIMEOUT  # Default read timeout in seconds
+        self.generations = GenerationRegistry()
+        self.pool = pool or ConnectionPool(
+            pool_size=HTTP_POOL_SIZE,
+            connect_timeout=CONNECT_TIMEOUT,
+            read_timeout=READ_TIMEOUT,
+            max_retries=MAX_RETRIES,
+            backoff=RETRY_BACKOFF,
+            backoff_max=RETRY_BACKOFF_MAX,
+            hosts=len(self.backends.nodes),
+        )
+
+    @property
+    def api_url(self) -> str:
+        """
+        URL of a healthy Ollama host, for requests other than generations.
+        """
+        return self.backends.api_url
 
     def generate(
         self,
@@ -42,7 +148,9 @@ class OllamaClient:
         stream: bool = False,
         timeout: Optional[int] = None,
         fallback_callback: Optional[Callable[[], str]] = None,
-    ) -> Union[str, Dict[str, Any]]:
+        context: Optional[List[int]] = None,
+        request_id: Optional[str] = None,
+    ) -> Union[str, Iterator[Dict[str, Any]]]:
         """
         Generate a response from the model.
         
@@ -51,110 +159,245 @@ class OllamaClient:
             system_prompt (str, optional): The system prompt.
             params (dict, optional): Parameters for the model.
             stream (bool): Whether to stream the response.
-            timeout (int, optional): Timeout in seconds.
+            timeout (int, optional): Read timeout in seconds.
             fallback_callback (callable, optional): Callback to use if the request times out.
+            context (list, optional): Context tokens to continue from instead
+                of ``conversation_history``, which is then left untouched.
+                The new context is in the response's final event.
+            request_id (str, optional): Id under which a streaming generation
+                can be stopped with ``cancel``. Generations with the same id
+                also go to the same Ollama host while it stays healthy.
             
         Returns:
-            Union[str, Dict[str, Any]]: The model's response.
+            Union[str, Iterator[Dict[str, Any]]]: The model's response, or
+            when streaming a generator of token events as described in
+            ``_handle_stream_response``.
         """
-        # Rate limiting to prevent overwhelming the API
-        current_time = time.time()
-        time_since_last_request = current_time - self.last_request_time
-        if time_since_last_request < self.min_request_interval:
-            time.sleep(self.min_request_interval - time_since_last_request)
-        
         # Prepare the request payload
-        payload = {
-            "model": self.model_name,
-            "prompt": prompt,
-            "stream": stream,
-        }
-        
-        # Add system prompt if provided
-        if system_prompt:
-            payload["system"] = system_prompt
-            
-        # Add model parameters
-        if params:
-            payload.update(params)
-        else:
-            payload.update(self.default_params)
-            
-        # Add conversation history if available
-        if self.conversation_history:
-            payload["context"] = self.conversation_history
+        payload = build_payload(
+            self.model_name,
+            prompt,
+            system_prompt,
+            params or self.default_params,
+            stream,
+            self.conversation_history if context is None else context,
+        )
         
         # Set timeout
         request_timeout = timeout or self.request_timeout
         
         # Make the API request with timeout handling
-        try:
-            # Start a timer for the request
-            start_time = time.time()
-            
-            # Make the request
-            response = requests.post(
-                f"{self.api_url}/generate",
-                json=payload,
-                stream=stream,
-                timeout=request_timeout,
-            )
-            
-            self.last_request_time = time.time()
-            
+        started = time.perf_counter()
+        tried = []
+        while True:
+            node = self.backends.acquire(request_id, exclude=tried)
+            tried.append(node)
+            failover = self.backends.has_alternative(tried)
+            try:
+                # Make the request; with another host to fail over to, a
+                # host that can't be reached isn't retried
+                response = self.pool.post(
+                    f"{node.api_url}/generate",
+                    json=payload,
+                    stream=stream,
+                    read_timeout=request_timeout,
+                    max_retries=0 if failover else None,
+                )
+            except requests.exceptions.RequestException as e:
+                self.backends.release(node, failed=True)
+                if failover and is_safe_to_retry(e):
+                    self.backends.mark_down(node, e)
+                    continue
+                raise Exception(f"Request error: {str(e)}")
+
+            if response.status_code in RETRY_STATUSES and failover:
+                response.close()
+                self.backends.release(node, failed=True)
+                continue
             if response.status_code != 200:
+                self.backends.release(node, failed=True)
                 raise Exception(f"Error: {response.status_code} - {response.text}")
-                
+
+            track_history = context is None
             if stream:
-                return self._handle_stream_response(response)
-            else:
-                return self._handle_response(response)
-                
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"Request error: {str(e)}")
+                return self._handle_stream_response(
+                    response, track_history, request_id, node, started
+                )
+            # Registered only for the stats: a non-streaming request can't be cancelled.
+            generation = self.generations.start(None, response.close, started)
+            try:
+                text = self._handle_response(response, track_history, generation)
+            except Exception as e:
+                generation.failed = True
+                if isinstance(e, requests.exceptions.RequestException):
+                    raise Exception(f"Request error: {str(e)}")
+                raise
+            finally:
+                self.generations.finish(generation)
+                self.backends.release(node, failed=generation.failed)
+            return text
     
-    def _handle_response(self, response: requests.Response) -> str:
+    def _handle_response(
+        self,
+        response: requests.Response,
+        track_history: bool = True,
+        generation: Optional[Generation] = None,
+    ) -> str:
         """
         Handle a non-streaming response.
         
         Args:
             response (requests.Response): The API response.
+            track_history (bool): Whether to store the returned context.
+            generation (Generation, optional): Handle that keeps the
+                response, with its ``EVAL_STATS``, for the registry's listeners.
             
         Returns:
             str: The model's response.
         """
         data = response.json()
+        if generation is not None:
+            generation.done = True
+            generation.final = data
         
         # Update conversation history
-        if "context" in data:
+        if track_history and "context" in data:
             self.conversation_history = data["context"]
             
         return data.get("response", "")
     
-    def _handle_stream_response(self, response: requests.Response) -> str:
+    def _handle_stream_response(
+        self,
+        response: requests.Response,
+        track_history: bool = True,
+        request_id: Optional[str] = None,
+        node: Optional[OllamaNode] = None,
+        started: Optional[float] = None,
+    ) -> GenerationStream:
         """
-        Handle a streaming response from the model.
-        
+        Stream token events from a response as they arrive.
+
+        Each event is the chunk Ollama sent: ``response`` holds the new
+        text and ``done`` is False until the final event, which also
+        carries the ``EVAL_STATS`` fields. The conversation context is
+        updated before the final event is yielded, so callers may stop
+        iterating as soon as they see ``done``. The generation is registered
+        before this returns. Closing the stream closes the connection,
+        which makes Ollama stop generating, even if no event was read yet;
+        so does ``cancel(request_id)``, after which ``GenerationCancelled``
+        is raised.
+
         Args:
             response (requests.Response): The API response.
-            
+            track_history (bool): Whether to store the final context.
+            request_id (str, optional): Id to register the generation under.
+            node (OllamaNode, optional): Host serving the stream, released
+                from the backend pool when the stream ends.
+            started (float, optional): ``time.perf_counter()`` when the
+                request was sent, for the time to first token.
+
         Returns:
-            str: The model's response printed in real-time.
+            GenerationStream: An iterator of one event per streamed chunk.
         """
-        full_response = ""
-        for line in response.iter_lines(decode_unicode=True):
-            if line:
+        # shutdown() unblocks a read waiting in another thread (urllib3 >= 2.3).
+        generation = self.generations.start(
+            request_id, getattr(response.raw, "shutdown", response.close), started
+        )
+
+        def release() -> None:
+            response.close()
+            self.generations.finish(generation)
+            if node is not None:
+                self.backends.release(node, failed=generation.failed)
+
+        return GenerationStream(self._read_stream(response, generation, track_history), release)
+
+    def _read_stream(
+        self, response: requests.Response, generation: Generation, track_history: bool
+    ) -> Iterator[Dict[str, Any]]:
+        try:
+            for line in response.iter_lines(decode_unicode=True):
+                if generation.cancelled:
+                    raise GenerationCancelled("Generation cancelled")
+                if not line:
+                    continue
                 try:
                     data = json.loads(line)
-                    token = data.get("response", "")
-                    print(token, end="", flush=True)  # Output tokens directly
-                    full_response += token
                 except json.JSONDecodeError:
                     continue
-        
-        print()  # Print final newline after streaming is complete
-        return full_response
+                if "error" in data:
+                    raise Exception(f"Error: {data['error']}")
+                if generation.first_token is None and data.get("response"):
+                    generation.first_token = time.perf_counter()
+                if data.get("done"):
+                    generation.done = True
+                    generation.final = data
+                    if track_history and "context" in data:
+                        self.conversation_history = data["context"]
+                yield data
+            if generation.cancelled:
+                raise GenerationCancelled("Generation cancelled")
+            generation.failed = not generation.done
+        except GenerationCancelled:
+            raise
+        except Exception as e:
+            if generation.cancelled:
+                raise GenerationCancelled("Generation cancelled") from e
+            generation.failed = True
+            if isinstance(e, requests.exceptions.RequestException):
+                raise Exception(f"Request error: {str(e)}")
+            raise
+
+    def cancel(self, request_id: str) -> bool:
+        """
+        Stop a streaming generation started with ``request_id``.
+
+        The connection to Ollama is closed, so the model stops generating,
+        and the reader of the stream gets ``GenerationCancelled``.
+
+        Args:
+            request_id (str): The id passed to ``generate``.
+
+        Returns:
+            bool: Whether a generation was running under that id.
+        """
+        return self.generations.cancel(request_id)
     
+    def evaluate_prefix(self, system_prompt: str) -> List[int]:
+        """
+        Evaluate a system prompt once and return its context tokens.
+
+        Ollama only returns a context for a non-empty prompt, so the system
+        prompt is evaluated with a short primer (``PREFIX_PROMPT``). The
+        primer is then sent once more on its own, continuing from that
+        context, which shows the tokens of the primer turn; the context is
+        cut where they begin. Continuing from the returned context skips
+        re-evaluating the system prompt without replaying the primer.
+
+        Args:
+            system_prompt (str): The system prompt.
+
+        Returns:
+            List[int]: The context tokens.
+        """
+        params = dict(self.default_params, num_predict=PREFIX_NUM_PREDICT)
+
+        def evaluate(**kwargs: Any) -> Dict[str, Any]:
+            final: Dict[str, Any] = {}
+            for event in self.generate(PREFIX_PROMPT, params=params, stream=True, **kwargs):
+                final = event
+            if "context" not in final:
+                raise Exception("Error: Ollama returned no context for the prefix")
+            return final
+
+        primed = evaluate(system_prompt=system_prompt, context=[])["context"]
+        again = evaluate(context=primed)
+        turn = again["context"][len(primed):len(again["context"]) - again.get("eval_count", 0)]
+        for start in range(len(primed) - len(turn), -1, -1):
+            if turn and primed[start:start + len(turn)] == turn:
+                return primed[:start]
+        raise Exception("Error: could not find the primer in the prefix context")
+
     def reset_conversation(self) -> None:
         """
         Reset the conversation history.
@@ -169,7 +412,7 @@ class OllamaClient:
         Returns:
             List[str]: A list of available model names.
         """
-        response = requests.get(f"{self.api_url}/tags")
+        response = self.pool.get(f"{self.api_url}/tags")
         
         if response.status_code != 200:
             raise Exception(f"Error: {response.status_code} - {response.text}")
@@ -188,7 +431,7 @@ class OllamaClient:
             Dict[str, Any]: Information about the model.
         """
         model_name = model_name or self.model_name
-        response = requests.post(
+        response = self.pool.post(
             f"{self.api_url}/show",
             json={"name": model_name},
         )
@@ -197,3 +440,24 @@ class OllamaClient:
             raise Exception(f"Error: {response.status_code} - {response.text}")
             
         return response.json()
+
+    def get_model_digest(self, model_name: Optional[str] = None) -> Optional[str]:
+        """
+        Get the digest of an installed model, which changes when it is re-pulled.
+
+        Args:
+            model_name (str, optional): The name of the model.
+
+        Returns:
+            Optional[str]: The digest, or None if the model is not installed.
+        """
+        model_name = model_name or self.model_name
+        response = self.pool.get(f"{self.api_url}/tags")
+
+        if response.status_code != 200:
+            raise Exception(f"Error: {response.status_code} - {response.text}")
+
+        for model in response.json().get("models", []):
+            if model["name"] == model_name:
+                return model.get("digest")
+        return None
@@ -0,0 +1,258 @@
+"""
+Pre-evaluated system-prompt prefixes.
+"""
+
+import hashlib
+import json
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from FossilChatBot.scheduler import BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+
+class PrefixCache:
+    """
+    Ollama ``context`` tokens for system prompts that were evaluated once.
+
+    A conversation that starts from a cached prefix sends only the user's
+    prompt, so its first turn skips evaluating the ~400-token system prompt.
+    Entries are keyed by model name, model digest, model parameters and the
+    system prompt text, so editing a template or re-pulling the model makes
+    the old entries unreachable; a digest change also clears them.
+
+    Lookups never block: a miss returns None and queues the prefix to be
+    built in the background, so the next conversation with that prompt
+    gets it.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        max_entries: int = 256,
+        digest_ttl: float = 60,
+        scheduler: Optional[Any] = None,
+    ):
+        """
+        Initialize the prefix cache.
+
+        Args:
+            client (OllamaClient): Client used to evaluate prefixes.
+            max_entries (int): Prefixes kept (least recently used go first).
+            digest_ttl (float): Seconds between checks for a changed model.
+            scheduler (GenerationScheduler, optional): Admission control the
+                builds share with chat generations.
+        """
+        self.client = client
+        self.max_entries = max_entries
+        self.digest_ttl = digest_ttl
+        self.scheduler = scheduler
+        self.digest: Optional[str] = None
+        self._digest_checked = 0.0
+        self._entries: "OrderedDict[str, List[int]]" = OrderedDict()
+        self._pending: set = set()
+        self._lock = threading.Lock()
+        # Builds run on one daemon thread, so a slow Ollama never holds up
+        # interpreter exit the way a ThreadPoolExecutor's workers would.
+        self._jobs: "queue.Queue" = queue.Queue()
+        self._builder: Optional[threading.Thread] = None
+        self.hits = 0
+        self.misses = 0
+        self.builds = 0
+        self.build_failures = 0
+        self.invalidations = 0
+        self._first_turns = {True: [0, 0], False: [0, 0]}  # used prefix -> [count, total ns]
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def key(self, system_prompt: str) -> str:
+        """
+        Cache key for a system prompt under the current model and params.
+
+        Args:
+            system_prompt (str): The system prompt.
+
+        Returns:
+            str: Hex digest identifying the prefix.
+        """
+        digest = hashlib.sha256()
+        for part in (
+            self.client.model_name,
+            self.digest or "",
+            json.dumps(self.client.default_params, sort_keys=True),
+            system_prompt,
+        ):
+            digest.update(part.encode())
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get(self, system_prompt: str) -> Optional[List[int]]:
+        """
+        Look up a prefix, queueing a background build on a miss.
+
+        Args:
+            system_prompt (str): The system prompt.
+
+        Returns:
+            Optional[List[int]]: The context tokens, or None if not cached yet.
+        """
+        if not self.enabled:
+            return None
+        self._maybe_check_digest()
+        key = self.key(system_prompt)
+        with self._lock:
+            context = self._entries.get(key)
+            if context is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return context
+            self.misses += 1
+        self.schedule(system_prompt)
+        return None
+
+    def schedule(self, system_prompt: str) -> None:
+        """
+        Build a prefix in the background unless it is cached or queued.
+
+        Args:
+            system_prompt (str): The system prompt.
+        """
+        key = self.key(system_prompt)
+        with self._lock:
+            if key in self._entries or system_prompt in self._pending:
+                return
+            self._pending.add(system_prompt)
+        self._submit(self._build, system_prompt)
+
+    def warm(self, system_prompts: Iterable[str]) -> None:
+        """
+        Queue prefixes to build ahead of the first conversation.
+
+        Args:
+            system_prompts (iterable): System prompts to pre-evaluate.
+        """
+        if not self.enabled:
+            return
+        self._submit(self.refresh_digest)
+        for system_prompt in system_prompts:
+            self.schedule(system_prompt)
+
+    def _build(self, system_prompt: str) -> None:
+        try:
+            if self.scheduler:
+                with self.scheduler.slot(BACKGROUND):
+                    context = self.client.evaluate_prefix(system_prompt)
+            else:
+                context = self.client.evaluate_prefix(system_prompt)
+        except Exception as e:
+            logger.warning("Could not build prompt prefix: %s", e)
+            with self._lock:
+                self.build_failures += 1
+            return
+        finally:
+            with self._lock:
+                self._pending.discard(system_prompt)
+        # Keyed now rather than when queued: the digest may have been
+        # fetched in the meantime.
+        key = self.key(system_prompt)
+        with self._lock:
+            self.builds += 1
+            self._entries[key] = context
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _maybe_check_digest(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if now - self._digest_checked < self.digest_ttl:
+                return
+            self._digest_checked = now
+        self._submit(self.refresh_digest)
+
+    def _submit(self, job: Callable[..., None], *args: Any) -> None:
+        with self._lock:
+            if self._builder is None:
+                self._builder = threading.Thread(
+                    target=self._run_jobs, name="prefix-cache", daemon=True
+                )
+                self._builder.start()
+        self._jobs.put((job, args))
+
+    def _run_jobs(self) -> None:
+        while True:
+            job, args = self._jobs.get()
+            try:
+                job(*args)
+            except Exception:
+                logger.exception("Prefix cache job failed")
+
+    def refresh_digest(self) -> None:
+        """
+        Drop every prefix if the model was replaced since the last check.
+        """
+        try:
+            digest = self.client.get_model_digest()
+        except Exception:
+            return
+        with self._lock:
+            self._digest_checked = time.monotonic()
+            if digest == self.digest:
+                return
+            if self.digest is not None:
+                self.invalidations += 1
+            self.digest = digest
+            self._entries.clear()
+
+    def observe_first_turn(self, used_prefix: bool, event: Dict[str, Any]) -> None:
+        """
+        Record a first turn's prompt evaluation time for the stats.
+
+        Args:
+            used_prefix (bool): Whether the turn started from a cached prefix.
+            event (dict): The final stream event with the eval stats.
+        """
+        if "prompt_eval_duration" not in event:
+            return
+        with self._lock:
+            totals = self._first_turns[used_prefix]
+            totals[0] += 1
+            totals[1] += event["prompt_eval_duration"]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report hit rates and first-turn prompt evaluation times.
+
+        Returns:
+            Dict[str, Any]: Cache counters and average first-turn
+            ``prompt_eval_duration`` in ms with and without a prefix.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            first_turn = {
+                ("with_prefix" if used else "without_prefix"): {
+                    "turns": count,
+                    "avg_prompt_eval_ms": total / count / 1e6 if count else None,
+                }
+                for used, (count, total) in self._first_turns.items()
+            }
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "builds": self.builds,
+                "build_failures": self.build_failures,
+                "pending": len(self._pending),
+                "invalidations": self.invalidations,
+                "model_digest": (self.digest or "")[:12],
+                "first_turn": first_turn,
+            }
@@ -0,0 +1,62 @@
+"""
+Health probes for an Ollama host, shared by check_ollama.py and the backend pool.
+"""
+
+from typing import List
+
+import requests
+
+from FossilChatBot.connection_pool import ConnectionPool
+
+
+def check_ollama_running(api_url: str, http: ConnectionPool) -> bool:
+    """
+    Check if Ollama is running.
+
+    Args:
+        api_url (str): The URL of the Ollama API to check.
+        http (ConnectionPool): Pool to send the request with.
+
+    Returns:
+        bool: True if Ollama is running, False otherwise.
+    """
+    try:
+        response = http.get(f"{api_url}/version")
+        return response.status_code == 200
+    except requests.exceptions.RequestException:
+        return False
+
+
+def list_models(api_url: str, http: ConnectionPool) -> List[str]:
+    """
+    List the models installed on a host.
+
+    Args:
+        api_url (str): The URL of the Ollama API to ask.
+        http (ConnectionPool): Pool to send the request with.
+
+    Returns:
+        List[str]: The model names, empty if the host could not be asked.
+    """
+    try:
+        response = http.get(f"{api_url}/tags")
+        if response.status_code != 200:
+            return []
+        return [model["name"] for model in response.json().get("models", [])]
+    except (requests.exceptions.RequestException, ValueError):
+        return []
+
+
+def check_model_available(api_url: str, model_name: str, http: ConnectionPool) -> bool:
+    """
+    Check if the model is available.
+
+    Args:
+        api_url (str): The URL of the Ollama API to check.
+        model_name (str): The model that must be installed.
+        http (ConnectionPool): Pool to send the request with.
+
+    Returns:
+        bool: True if the model is available, False otherwise.
+    """
+    return model_name in list_models(api_url, http)
@@ -0,0 +1,260 @@
+"""
+Cache of complete chat answers for deterministic first turns.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+# Confidence bands from FOSSILFINDER_SYSTEM_PROMPT, with the value used when
+# pre-generating an answer for each band.
+CONFIDENCE_BANDS = (
+    (0, 60, 43),
+    (60, 70, 66),
+    (70, 80, 76),
+    (80, 95, 89),
+    (95, 101, 97),
+)
+
+PERCENTAGE = re.compile(r"(\d+(?:\.\d+)?)\s*%")
+ANSWER_PERCENTAGE = re.compile(r"(?<![\d.])\d+(?:\.\d+)?(?=\s*%)")
+CONFIDENCE_MARKER = "\x00confidence\x00"
+
+
+def confidence_band(value: float) -> str:
+    """
+    Name the band a confidence percentage falls in.
+
+    Args:
+        value (float): Confidence in percent.
+
+    Returns:
+        str: The band, e.g. ``"80-95"``.
+    """
+    for low, high, _ in CONFIDENCE_BANDS:
+        if low <= value < high:
+            return f"{low}-{min(high, 100)}"
+    return "100-100"
+
+
+def normalize(text: str) -> str:
+    """
+    Canonical form of a prompt: case, spacing and percentages folded.
+
+    Args:
+        text (str): The prompt text.
+
+    Returns:
+        str: Lowercase text with collapsed whitespace and every percentage
+        replaced by its confidence band.
+    """
+    text = PERCENTAGE.sub(lambda m: f"<{confidence_band(float(m.group(1)))}>", text)
+    return " ".join(text.lower().split())
+
+
+class ResponseDiskTier:
+    """
+    SQLite tier so pre-generated answers survive restarts.
+    """
+
+    def __init__(self, path: str, max_entries: int):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: str, response: str) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?)",
+                (key, response, time.time()),
+            )
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._db.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    "SELECT key FROM responses ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+            self._db.commit()
+
+
+class ResponseCache:
+    """
+    Answers to first turns, which are fully determined by their inputs.
+
+    With a fixed ``seed`` in the model parameters, a turn without prior
+    context always produces the same answer. Entries are keyed by model
+    identity, parameters, the normalized system prompt and prompt, and the
+    confidence band, so "Accuracy: 87%" and "Accuracy: 91%" share the
+    80-95 answer. The confidence quoted in a stored answer is replaced by
+    the caller's own value when it is served.
+    """
+
+    def __init__(
+        self,
+        model_identity: Callable[[], str],
+        params: Dict[str, Any],
+        max_entries: int = 1024,
+        disk_path: Optional[str] = None,
+        disk_max_entries: int = 10000,
+    ):
+        """
+        Initialize the response cache.
+
+        Args:
+            model_identity (callable): Returns the current model name and digest.
+            params (dict): Model parameters the answers are generated with.
+            max_entries (int): Answers kept in memory (0 disables the cache).
+            disk_path (str, optional): SQLite file for the persistent tier.
+            disk_max_entries (int): Answers kept on disk.
+        """
+        self.model_identity = model_identity
+        self.params = params
+        self.max_entries = max_entries
+        self.disk = ResponseDiskTier(disk_path, disk_max_entries) if disk_path else None
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Whether answers are cacheable: the cache is on and sampling is seeded.
+        """
+        return self.max_entries > 0 and "seed" in self.params
+
+    def key(self, system_prompt: Optional[str], prompt: str) -> str:
+        """
+        Cache key for a first turn.
+
+        Args:
+            system_prompt (str, optional): The system prompt.
+            prompt (str): The user prompt.
+
+        Returns:
+            str: Hex digest of the normalized inputs.
+        """
+        digest = hashlib.sha256()
+        for part in (
+            self.model_identity(),
+            json.dumps(self.params, sort_keys=True),
+            normalize(system_prompt or ""),
+            normalize(prompt),
+        ):
+            digest.update(part.encode())
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get(self, system_prompt: Optional[str], prompt: str) -> Optional[str]:
+        """
+        Look up the answer to a first turn.
+
+        Args:
+            system_prompt (str, optional): The system prompt.
+            prompt (str): The user prompt.
+
+        Returns:
+            Optional[str]: The answer, quoting this prompt's confidence,
+            or None on a miss.
+        """
+        if not self.enabled:
+            return None
+        key = self.key(system_prompt, prompt)
+        with self._lock:
+            response = self._entries.get(key)
+            if response is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if response is None and self.disk:
+            response = self.disk.get(key)
+            if response is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                    self._remember(key, response)
+        if response is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        return response.replace(CONFIDENCE_MARKER, self._quoted_confidence(system_prompt, prompt))
+
+    def put(self, system_prompt: Optional[str], prompt: str, response: str) -> None:
+        """
+        Store the answer to a first turn.
+
+        Args:
+            system_prompt (str, optional): The system prompt.
+            prompt (str): The user prompt.
+            response (str): The complete answer.
+        """
+        if not self.enabled or not response:
+            return
+        quoted = self._quoted_confidence(system_prompt, prompt)
+        if quoted:
+            # Any figure within a point of the confidence (87, 87.2, 87.23...)
+            # is this caller's confidence, not part of the generic answer.
+            confidence = float(quoted)
+            response = ANSWER_PERCENTAGE.sub(
+                lambda m: CONFIDENCE_MARKER
+                if abs(float(m.group(0)) - confidence) < 1 else m.group(0),
+                response,
+            )
+        key = self.key(system_prompt, prompt)
+        with self._lock:
+            self._remember(key, response)
+        if self.disk:
+            self.disk.put(key, response)
+
+    def _remember(self, key: str, response: str) -> None:
+        self._entries[key] = response
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _quoted_confidence(self, system_prompt: Optional[str], prompt: str) -> str:
+        # The user prompt carries the rounded figure the browser displays.
+        found = PERCENTAGE.findall(prompt) or PERCENTAGE.findall(system_prompt or "")
+        return found[0] if found else ""
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report hit rates.
+
+        Returns:
+            Dict[str, Any]: Entry count and hit/miss counters.
+        """
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,271 @@
+"""
+Admission control for generations sent to Ollama.
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+BACKGROUND = "__background__"  # Session id for cache warm-up work
+
+
+class SchedulerBusy(Exception):
+    """
+    The wait queue is full; the caller should retry after ``retry_after`` seconds.
+    """
+
+    def __init__(self, retry_after: float, message: str = "Chat is busy, please try again shortly"):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class SchedulerTimeout(SchedulerBusy):
+    """
+    The request waited longer than the queue deadline without being admitted.
+    """
+
+    def __init__(self, retry_after: float):
+        super().__init__(retry_after, "Timed out waiting for a free chat slot")
+
+
+class Ticket:
+    """
+    A granted generation slot. ``release()`` is idempotent.
+    """
+
+    def __init__(self, scheduler: "GenerationScheduler", background: bool = False):
+        self._scheduler = scheduler
+        self._background = background
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._scheduler._release(self._background)
+
+    def __enter__(self) -> "Ticket":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.release()
+
+
+class _Waiter:
+    def __init__(self, session_id: str, wake: Callable[[], None]):
+        self.session_id = session_id
+        self.wake = wake
+        self.granted = False
+        self.enqueued = time.monotonic()
+
+
+class GenerationScheduler:
+    """
+    Bounds concurrent generations and shares the slots fairly between sessions.
+
+    At most ``max_in_flight`` generations run at once. Further requests wait
+    in per-session queues, served round-robin, so a session with many
+    queued requests cannot starve the others. Past ``max_queue`` waiters,
+    or after waiting ``queue_timeout`` seconds, a request fails fast with
+    ``SchedulerBusy`` / ``SchedulerTimeout`` instead of piling up.
+    Warm-up work under the ``BACKGROUND`` session holds at most
+    ``max_background`` of the slots, so it never takes them all.
+
+    Both threads (``acquire``) and coroutines (``acquire_async``) can wait
+    on the same scheduler.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 2,
+        max_queue: int = 64,
+        queue_timeout: float = 30,
+        retry_after: float = 2,
+        max_background: int = 1,
+    ):
+        """
+        Initialize the scheduler.
+
+        Args:
+            max_in_flight (int): Generations allowed to run at once.
+            max_queue (int): Requests allowed to wait for a slot.
+            queue_timeout (float): Seconds a request may wait before failing.
+            retry_after (float): Retry hint in seconds for rejected requests.
+            max_background (int): Slots ``BACKGROUND`` work may hold at once.
+        """
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.max_background = max_background
+        self._lock = threading.Lock()
+        self._queues: "OrderedDict[str, Deque[_Waiter]]" = OrderedDict()
+        self._queued = 0
+        self._in_flight = 0
+        self._background = 0
+        self._waits: Deque[float] = deque(maxlen=1000)
+        self._listeners: List[Callable[[float], None]] = []
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def add_listener(self, listener: Callable[[float], None]) -> None:
+        """
+        Register ``listener(seconds)`` to receive the queue wait of every admission.
+
+        Args:
+            listener (callable): Called outside the scheduler lock.
+        """
+        self._listeners.append(listener)
+
+    def _next_session(self) -> Optional[str]:
+        # The first session in round-robin order whose waiter may be served.
+        for session_id in self._queues:
+            if session_id != BACKGROUND or self._background < self.max_background:
+                return session_id
+        return None
+
+    def _try_admit(self, session_id: str, wake: Callable[[], None]) -> Optional[_Waiter]:
+        # Returns None when admitted immediately, else the queued waiter.
+        background = session_id == BACKGROUND
+        with self._lock:
+            if (
+                self._in_flight >= self.max_in_flight
+                or self._next_session() is not None
+                or (background and self._background >= self.max_background)
+            ):
+                if self._queued >= self.max_queue:
+                    self.rejected += 1
+                    raise SchedulerBusy(self.retry_after)
+                waiter = _Waiter(session_id, wake)
+                self._queues.setdefault(session_id, deque()).append(waiter)
+                self._queued += 1
+                return waiter
+            self._in_flight += 1
+            self._background += background
+            self.admitted += 1
+            self._waits.append(0.0)
+        for listener in self._listeners:
+            listener(0.0)
+        return None
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        # Withdraw a waiter that gave up; False if it was granted meanwhile.
+        with self._lock:
+            if waiter.granted:
+                return False
+            queue = self._queues.get(waiter.session_id)
+            if queue is not None:
+                queue.remove(waiter)
+                if not queue:
+                    del self._queues[waiter.session_id]
+            self._queued -= 1
+            return True
+
+    def _release(self, background: bool = False) -> None:
+        with self._lock:
+            self._background -= background
+            session_id = self._next_session()
+            if session_id is None:
+                self._in_flight -= 1
+                return
+            # Round-robin: serve the session at the front, then move it to the back.
+            queue = self._queues.pop(session_id)
+            waiter = queue.popleft()
+            if queue:
+                self._queues[session_id] = queue
+            self._queued -= 1
+            self._background += session_id == BACKGROUND
+            waiter.granted = True
+            self.admitted += 1
+            wait = time.monotonic() - waiter.enqueued
+            self._waits.append(wait)
+        waiter.wake()
+        for listener in self._listeners:
+            listener(wait)
+
+    def acquire(self, session_id: str = "", timeout: Optional[float] = None) -> Ticket:
+        """
+        Wait for a generation slot.
+
+        Args:
+            session_id (str): The session the request belongs to.
+            timeout (float, optional): Override for the queue deadline.
+
+        Returns:
+            Ticket: The slot; release it when the generation ends.
+
+        Raises:
+            SchedulerBusy: The wait queue is full.
+            SchedulerTimeout: No slot became free before the deadline.
+        """
+        event = threading.Event()
+        waiter = self._try_admit(session_id, event.set)
+        if waiter is not None and not event.wait(timeout or self.queue_timeout):
+            if self._abandon(waiter):
+                with self._lock:
+                    self.timed_out += 1
+                raise SchedulerTimeout(self.retry_after)
+        return Ticket(self, session_id == BACKGROUND)
+
+    async def acquire_async(self, session_id: str = "", timeout: Optional[float] = None) -> Ticket:
+        """
+        Coroutine version of ``acquire``.
+        """
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def wake() -> None:
+            loop.call_soon_threadsafe(lambda: granted.done() or granted.set_result(None))
+
+        background = session_id == BACKGROUND
+        waiter = self._try_admit(session_id, wake)
+        if waiter is None:
+            return Ticket(self, background)
+        try:
+            await asyncio.wait_for(asyncio.shield(granted), timeout or self.queue_timeout)
+        except asyncio.TimeoutError:
+            if self._abandon(waiter):
+                with self._lock:
+                    self.timed_out += 1
+                raise SchedulerTimeout(self.retry_after)
+        except BaseException:
+            # Cancelled while waiting: give the slot back if it was granted.
+            if not self._abandon(waiter):
+                self._release(background)
+            raise
+        return Ticket(self, background)
+
+    @contextmanager
+    def slot(self, session_id: str = "", timeout: Optional[float] = None) -> Iterator[Ticket]:
+        """
+        Hold a generation slot for the duration of a ``with`` block.
+        """
+        with self.acquire(session_id, timeout) as ticket:
+            yield ticket
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report load and queue wait times.
+
+        Returns:
+            Dict[str, Any]: In-flight and queued counts, admission counters
+            and wait times over the last 1000 admissions.
+        """
+        with self._lock:
+            waits = sorted(self._waits)
+            return {
+                "in_flight": self._in_flight,
+                "max_in_flight": self.max_in_flight,
+                "background_in_flight": self._background,
+                "queued": self._queued,
+                "max_queue": self.max_queue,
+                "sessions_waiting": len(self._queues),
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "avg_wait_ms": sum(waits) / len(waits) * 1000 if waits else 0.0,
+                "p95_wait_ms": waits[int(len(waits) * 0.95)] * 1000 if waits else 0.0,
+            }
@@ -0,0 +1,263 @@
+"""
+Per-session conversation store for the web chat.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+def encode_state(state: Dict[str, Any]) -> bytes:
+    """
+    Serialize a session's state compactly.
+
+    A context of 2048 token ids takes ~12 KB as compact JSON against
+    ~70 KB as a Python list of ints, and the byte length doubles as an
+    exact memory figure for the budget.
+    """
+    return json.dumps(state, separators=(",", ":")).encode()
+
+
+class SessionDiskTier:
+    """
+    SQLite backend so sessions survive restarts without staying in RAM.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "id TEXT PRIMARY KEY, state BLOB NOT NULL, updated REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def get(self, session_id: str, oldest: float) -> Optional[bytes]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT state FROM sessions WHERE id = ? AND updated >= ?",
+                (session_id, oldest),
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, session_id: str, state: bytes, updated: float) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)",
+                (session_id, state, updated),
+            )
+            self._db.commit()
+
+    def touch(self, session_id: str, updated: float) -> None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE sessions SET updated = ? WHERE id = ?", (updated, session_id)
+            )
+            self._db.commit()
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            self._db.commit()
+
+    def expire(self, oldest: float) -> int:
+        with self._lock:
+            removed = self._db.execute(
+                "DELETE FROM sessions WHERE updated < ?", (oldest,)
+            ).rowcount
+            self._db.commit()
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            count, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(state)), 0) FROM sessions"
+            ).fetchone()
+        return {"sessions": count, "bytes": size}
+
+
+class SessionStore:
+    """
+    Session-keyed conversation state with a global memory budget.
+
+    Each session's state (the Ollama ``context`` and anything else the chat
+    keeps per user) is held serialized. Idle sessions expire after ``ttl``
+    seconds; beyond ``max_sessions`` or ``max_bytes`` the least recently
+    used sessions are evicted from memory. With a ``path`` every write also
+    goes to SQLite, so evicted sessions are reloaded on their next turn and
+    survive worker restarts; the in-memory tier is then a per-process cache.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 10000,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl: float = 1800,
+        path: Optional[str] = None,
+    ):
+        """
+        Initialize the session store.
+
+        Args:
+            max_sessions (int): Sessions kept in memory.
+            max_bytes (int): Memory budget for all sessions together.
+            ttl (float): Seconds a session may stay idle before it expires.
+            path (str, optional): SQLite file for the persistent backend.
+        """
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.disk = SessionDiskTier(path) if path else None
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, session_id: str) -> Dict[str, Any]:
+        """
+        Load a session's state.
+
+        Args:
+            session_id (str): The session key.
+
+        Returns:
+            Dict[str, Any]: The stored state, or an empty dict for a new
+            or expired session.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                last_used, state = entry
+                if last_used >= now - self.ttl:
+                    self._sessions[session_id] = (now, state)
+                    self._sessions.move_to_end(session_id)
+                    self.hits += 1
+                    return json.loads(state)
+                self._forget(session_id)
+                self.expirations += 1
+
+        state = self.disk.get(session_id, now - self.ttl) if self.disk else None
+        with self._lock:
+            if state is None:
+                self.misses += 1
+                return {}
+            self.disk_hits += 1
+            self._remember(session_id, state, now)
+        self.disk.touch(session_id, now)
+        return json.loads(state)
+
+    def put(self, session_id: str, state: Dict[str, Any]) -> None:
+        """
+        Store a session's state, replacing what was there.
+
+        Args:
+            session_id (str): The session key.
+            state (dict): JSON-serializable session state.
+        """
+        encoded = encode_state(state)
+        now = time.time()
+        with self._lock:
+            self._remember(session_id, encoded, now)
+            self._expire(now)
+            self._writes += 1
+            sweep_disk = self.disk is not None and self._writes % 100 == 0
+        if self.disk:
+            self.disk.put(session_id, encoded, now)
+            if sweep_disk:
+                self.disk.expire(now - self.ttl)
+
+    def delete(self, session_id: str) -> None:
+        """
+        Forget a session, e.g. when the user starts a new conversation.
+
+        Args:
+            session_id (str): The session key.
+        """
+        with self._lock:
+            self._forget(session_id)
+        if self.disk:
+            self.disk.delete(session_id)
+
+    def session_bytes(self, session_id: str) -> int:
+        """
+        Memory held by one session.
+
+        Args:
+            session_id (str): The session key.
+
+        Returns:
+            int: Bytes of serialized state in memory (0 if not resident).
+        """
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            return len(entry[1]) if entry else 0
+
+    def _remember(self, session_id: str, state: bytes, now: float) -> None:
+        self._forget(session_id)
+        if len(state) > self.max_bytes or self.max_sessions <= 0:
+            return
+        self._sessions[session_id] = (now, state)
+        self._bytes += len(state)
+        while len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes:
+            evicted, (_, evicted_state) = self._sessions.popitem(last=False)
+            self._bytes -= len(evicted_state)
+            self.evictions += 1
+
+    def _forget(self, session_id: str) -> None:
+        entry = self._sessions.pop(session_id, None)
+        if entry is not None:
+            self._bytes -= len(entry[1])
+
+    def _expire(self, now: float) -> None:
+        # Sessions are in last-used order, so the idle ones are at the front.
+        oldest = now - self.ttl
+        while self._sessions:
+            session_id, (last_used, _) = next(iter(self._sessions.items()))
+            if last_used >= oldest:
+                break
+            self._forget(session_id)
+            self.expirations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report sizes and hit rates.
+
+        Returns:
+            Dict[str, Any]: Session counts, memory use and cache counters.
+        """
+        with self._lock:
+            sessions = len(self._sessions)
+            lookups = self.hits + self.disk_hits + self.misses
+            stats = {
+                "sessions": sessions,
+                "max_sessions": self.max_sessions,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "avg_session_bytes": self._bytes // sessions if sessions else 0,
+                "largest_session_bytes": max(
+                    (len(state) for _, state in self._sessions.values()), default=0
+                ),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+        if self.disk:
+            stats["disk"] = self.disk.stats()
+        return stats
@@ -1,84 +1,229 @@
+import logging
 import os
 import sys
-import json
+import time
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from ollama_client import OllamaClient
 from template_manager import TemplateManager
+from FossilChatBot.config import (
+    DEFAULT_PARAMS, MAX_HISTORY, RESPONSE_TOKEN_RESERVE,
+    SESSION_MAX, SESSION_MAX_BYTES, SESSION_TTL, SESSION_DB_PATH, PREFIX_CACHE_SIZE,
+    RESPONSE_CACHE_SIZE, RESPONSE_CACHE_PATH, RESPONSE_CACHE_DISK_SIZE,
+    MAX_IN_FLIGHT, MAX_BACKGROUND, MAX_QUEUED, QUEUE_TIMEOUT, RETRY_AFTER,
+)
+from FossilChatBot.history import HistoryManager
+from FossilChatBot.prefix_cache import PrefixCache
+from FossilChatBot.response_cache import ResponseCache
+from FossilChatBot.scheduler import BACKGROUND, GenerationScheduler, SchedulerBusy
+from FossilChatBot.session_store import SessionStore
+
+logger = logging.getLogger(__name__)
 
 client = OllamaClient()
+scheduler = GenerationScheduler(
+    max_in_flight=MAX_IN_FLIGHT,
+    max_queue=MAX_QUEUED,
+    queue_timeout=QUEUE_TIMEOUT,
+    retry_after=RETRY_AFTER,
+    max_background=MAX_BACKGROUND,
+)
 template_manager = TemplateManager()
+session_store = SessionStore(
+    max_sessions=SESSION_MAX,
+    max_bytes=SESSION_MAX_BYTES,
+    ttl=SESSION_TTL,
+    path=SESSION_DB_PATH,
+)
+prefix_cache = PrefixCache(client, max_entries=PREFIX_CACHE_SIZE, scheduler=scheduler)
+history = HistoryManager(
+    token_budget=DEFAULT_PARAMS["num_ctx"] - RESPONSE_TOKEN_RESERVE,
+    max_turns=MAX_HISTORY,
+    prefixes=prefix_cache,
+)
+response_cache = ResponseCache(
+    lambda: f"{client.model_name}@{prefix_cache.digest or ''}",
+    client.default_params,
+    max_entries=RESPONSE_CACHE_SIZE,
+    disk_path=RESPONSE_CACHE_PATH,
+    disk_max_entries=RESPONSE_CACHE_DISK_SIZE,
+)
 
-def get_chat_response(user_input: str, system_prompt: str = None) -> str:
+def start_prefix_warmup():
     """
-    Generate a response from the model for web use.
-    Handles both JSON and plain text streaming responses.
+    Pre-evaluate every template's system prompt in the background.
+    Servers call this at startup; importing the module sends nothing to Ollama.
+    """
+    template_manager.warm_prefixes(prefix_cache)
+
+def prepare_prompts(user_input: str, system_prompt: str = None):
+    if system_prompt:
+        return user_input, system_prompt
+    formatted = template_manager.format_prompt(user_input)
+    return formatted["user"], formatted["system"]
+
+class ChatTurn:
+    """
+    One turn of a web chat session, shared by the sync and async servers.
+    Loads the session, answers fresh conversations from response_cache when
+    it can, fits the request to the context window, and saves the turn.
+    A turn that has to generate must be admitted by the scheduler first;
+    its slot is released when the final event is observed or on release().
+    """
+
+    def __init__(self, session_id: str, prompt: str, system_prompt: str):
+        self.session_id = session_id
+        self.state = session_store.get(session_id)
+        self.user_prompt, self.user_system_prompt = prompt, system_prompt
+        self.first = not self.state.get("turns")
+        self.cached = response_cache.get(system_prompt, prompt) if self.first else None
+        self.prompt, self.system_prompt, self.context = history.prepare(
+            self.state, prompt, system_prompt
+        )
+        self.response = []
+        self.ticket = None
+
+    def admit(self) -> None:
+        """
+        Wait for a generation slot; raises SchedulerBusy if none is free.
+        A new message replaces the session's unfinished answer, so that
+        generation is cancelled first.
+        """
+        client.cancel(self.session_id)
+        if self.cached is None and self.ticket is None:
+            self.ticket = scheduler.acquire(self.session_id)
+
+    async def admit_async(self, ollama) -> None:
+        """admit() for the async server; ollama is its AsyncOllamaClient."""
+        ollama.cancel(self.session_id)
+        if self.cached is None and self.ticket is None:
+            self.ticket = await scheduler.acquire_async(self.session_id)
+
+    def release(self) -> None:
+        if self.ticket is not None:
+            self.ticket.release()
+
+    def cached_events(self):
+        events = [
+            {"response": self.cached, "done": False},
+            {"response": "", "done": True, "cached": True},
+        ]
+        for event in events:
+            self.observe(event)
+        return events
+
+    def observe(self, event: dict) -> None:
+        self.response.append(event.get("response", ""))
+        if not event.get("done"):
+            return
+        self.release()
+        response = "".join(self.response)
+        history.record(self.state, self.user_prompt, response, event)
+        session_store.put(self.session_id, self.state)
+        if self.first and self.cached is None:
+            response_cache.put(self.user_system_prompt, self.user_prompt, response)
+
+def stream_chat_response(user_input: str, system_prompt: str = None, session_id: str = None,
+                         turn: ChatTurn = None):
     """
-    print(f"\n[DEBUG] Starting chat response for: {user_input[:50]}...")
-    
+    Stream a response from the model for web use.
+    Yields Ollama token events ({"response": ..., "done": ...}); the final
+    event carries the eval stats. Errors, including SchedulerBusy when no
+    generation slot is free, are raised to the caller.
+    With a session_id the conversation continues from, and is saved to,
+    that session in session_store instead of the shared client history,
+    trimmed to the context window by history. A caller that already built
+    and admitted the ChatTurn can pass it as turn instead.
+    """
+    if turn is None and session_id:
+        turn = ChatTurn(session_id, *prepare_prompts(user_input, system_prompt))
+    if turn:
+        if turn.cached is not None:
+            yield from turn.cached_events()
+            return
+        turn.admit()
+        prompt, system_prompt, context, ticket = turn.prompt, turn.system_prompt, turn.context, turn
+    else:
+        prompt, system_prompt = prepare_prompts(user_input, system_prompt)
+        context, ticket = None, scheduler.acquire()
     try:
-        # Prepare prompts
-        if system_prompt:
-            prompt = user_input
-        else:
-            formatted = template_manager.format_prompt(user_input)
-            prompt = formatted["user"]
-            system_prompt = formatted["system"]
-
-        # Get the response stream
-        response_stream = client.generate(
+        events = client.generate(
             prompt=prompt,
             system_prompt=system_prompt,
-            stream=True
+            stream=True,
+            context=context,
+            request_id=turn.session_id if turn else None
         )
-
-        full_response = []
-        plain_text_mode = False
-        
-        for raw_chunk in response_stream:
-            # Convert bytes to string if needed
-            if isinstance(raw_chunk, bytes):
-                try:
-                    chunk = raw_chunk.decode('utf-8')
-                except UnicodeDecodeError:
-                    print("[DEBUG] Skipping non-UTF-8 chunk")
-                    continue
-            else:
-                chunk = str(raw_chunk)
-
-            # Try JSON parsing first
-            json_data = None
-            if chunk.strip().startswith('{'):
-                try:
-                    json_data = json.loads(chunk)
-                except json.JSONDecodeError:
-                    pass
-
-            if json_data:
-                # Handle JSON response
-                if 'response' in json_data:
-                    full_response.append(json_data['response'])
-                if json_data.get('done', False):
+        try:
+            for event in events:
+                if turn:
+                    turn.observe(event)
+                yield event
+                if event.get("done"):
                     break
-            else:
-                # Handle plain text response
-                plain_text_mode = True
-                full_response.append(chunk)
+        finally:
+            events.close()
+    finally:
+        ticket.release()
 
+def warm_responses(openers):
+    """
+    Pre-generate answers to fresh conversations, e.g. the opening message
+    for every fossil class and confidence band, skipping cached ones.
+    openers is an iterable of (prompt, system_prompt) pairs.
+    """
+    for prompt, system_prompt in openers:
+        if not response_cache.enabled:
+            return
+        if response_cache.get(system_prompt, prompt) is not None:
+            continue
+        try:
+            prefix = prefix_cache.get(system_prompt) if system_prompt else None
+            with scheduler.slot(BACKGROUND):
+                response = client.generate(
+                    prompt=prompt,
+                    system_prompt=None if prefix else system_prompt,
+                    context=prefix or [],
+                )
+        except Exception as e:
+            logger.warning("Could not pre-generate response: %s", e)
+            continue
+        response_cache.put(system_prompt, prompt, response.strip())
+
+def get_chat_response(user_input: str, system_prompt: str = None, session_id: str = None,
+                      disconnected=None) -> str:
+    """
+    Generate a response from the model for web use.
+    Collects the streamed tokens into a single string.
+    SchedulerBusy is raised so the caller can ask the client to retry.
+    disconnected is an optional callable checked after every token; when it
+    returns True the generation is abandoned and an empty string returned.
+    """
+    logger.debug("Starting chat response for: %.50s", user_input)
+    started = time.perf_counter()
+    try:
+        full_response = []
+        events = stream_chat_response(user_input, system_prompt, session_id)
+        try:
+            for event in events:
+                if disconnected and disconnected():
+                    return ""
+                full_response.append(event.get("response", ""))
+        finally:
+            events.close()
         combined = "".join(full_response).strip()
-        
-        if plain_text_mode:
-            print("[DEBUG] Processed as plain text stream")
-        else:
-            print("[DEBUG] Processed as JSON stream")
 
         if not combined:
-            print("[WARNING] Empty response received")
+            logger.warning("Empty response received")
             return "I couldn't generate a response. Please try again."
             
-        print(f"[SUCCESS] Response length: {len(combined)} characters")
+        logger.debug("Chat response ready", extra={
+            "chars": len(combined),
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+        })
         return combined
 
+    except SchedulerBusy:
+        raise
     except Exception as e:
-        error_msg = f"Error processing your request: {str(e)}"
-        print(f"[ERROR] {error_msg}")
-        return error_msg
\ No newline at end of file
+        logger.exception("Chat response failed")
+        return f"Error processing your request: {str(e)}"
@@ -4,7 +4,7 @@ Template manager for the Ollama DeepSeek-v3 project.
 
 from typing import Dict, List, Optional, Any
 
-from templates import get_template
+from templates import get_template, list_templates
 
 
 class TemplateManager:
@@ -39,4 +39,22 @@ class TemplateManager:
             **self.custom_variables
         )
         
-        return formatted_template 
\ No newline at end of file
+        return formatted_template
+
+    def system_prompts(self) -> Dict[str, str]:
+        """
+        Get the system prompt of every template.
+
+        Returns:
+            Dict[str, str]: System prompts keyed by template name.
+        """
+        return {name: get_template(name)["system"] for name in list_templates()}
+
+    def warm_prefixes(self, prefix_cache: Any) -> None:
+        """
+        Pre-evaluate every template's system prompt in the background.
+
+        Args:
+            prefix_cache (PrefixCache): The cache to fill.
+        """
+        prefix_cache.warm(self.system_prompts().values())
@@ -1,12 +1,19 @@
 from flask import Flask
+from app import profiling
+from app.log import init_app, setup_logging
 from config.config import Config
 
-def create_app():
+def create_app(warm_up=True):
+    setup_logging()
     app = Flask(__name__)
     app.config.from_object(Config)
+    init_app(app)
+    profiling.init_app(app)
     
     # Register blueprints
-    from app.routes.main import main_bp
+    from app.routes.main import main_bp, start_warmup
     app.register_blueprint(main_bp)
+    if warm_up:
+        start_warmup()
     
     return app
\ No newline at end of file
@@ -0,0 +1,200 @@
+"""Asyncio chat server.
+
+Serves the same /chat and /chat/stream API as the Flask chat blueprint, but
+a waiting generation costs a coroutine instead of a worker thread, so one
+process can hold hundreds of streaming conversations. Run it next to the
+Flask app with ``python -m app.async_chat`` and route /chat* to it from the
+reverse proxy.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+from aiohttp import web
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from FossilChatBot.async_ollama_client import AsyncOllamaClient
+from FossilChatBot.scheduler import SchedulerBusy
+from FossilChatBot.simple_chat import ChatTurn, prepare_prompts, start_prefix_warmup
+from app import metrics
+from app.log import log_request, setup_logging, start_request
+from app.routes.chat import (
+    build_system_prompt, busy_reply, chat_stats_data, done_event, set_session_cookie, sse,
+    start_session, watch_chat_metrics)
+from config.config import Config
+
+ollama_client = web.AppKey('ollama_client', AsyncOllamaClient)
+logger = logging.getLogger(__name__)
+
+
+@web.middleware
+async def request_context(request, handler):
+    """The aiohttp counterpart of app.log.init_app: request ids and access logging."""
+    started = time.perf_counter()
+    request['request_id'] = start_request(request.headers.get('X-Request-ID'))
+    status = 500
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        log_request(request['request_id'], request.method, request.path, status, started)
+
+
+async def add_request_id(request, response):
+    if 'request_id' in request:
+        response.headers['X-Request-ID'] = request['request_id']
+
+
+async def blocking(func, *args):
+    """Run func on the default executor; the session store and response cache may hit SQLite."""
+    return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+
+async def read_chat_request(request):
+    data = await request.json()
+    user_message = data.get('message', '').strip()
+    if not user_message and not data.get('image'):
+        raise web.HTTPBadRequest(
+            text='{"error": "No message or image provided"}', content_type='application/json')
+    prompt, system_prompt = prepare_prompts(
+        user_message if user_message else "Tell me about this fossil",
+        build_system_prompt(data.get('analysis')))
+    session_id = await blocking(
+        start_session, data, request.cookies.get(Config.CHAT_SESSION_COOKIE))
+    return data, prompt, system_prompt, session_id
+
+
+async def admit(client, prompt, system_prompt, session_id):
+    """The session's next turn, once the scheduler has a slot for it."""
+    turn = await blocking(ChatTurn, session_id, prompt, system_prompt)
+    try:
+        await turn.admit_async(client)
+    except SchedulerBusy as e:
+        status, body, headers = busy_reply(e)
+        error = web.HTTPServiceUnavailable if status == 503 else web.HTTPTooManyRequests
+        raise error(text=json.dumps(body), content_type='application/json', headers=headers) from e
+    return turn
+
+
+async def generate(client, turn):
+    """Stream token events, continuing and then saving the session's history."""
+    if turn.cached is not None:
+        for event in await blocking(turn.cached_events):
+            yield event
+        return
+    events = await client.generate(turn.prompt, system_prompt=turn.system_prompt,
+                                   stream=True, context=turn.context, request_id=turn.session_id)
+    try:
+        async for event in events:
+            if event.get('done'):
+                await blocking(turn.observe, event)  # saves the session
+            else:
+                turn.observe(event)
+            yield event
+    finally:
+        await events.aclose()
+
+
+async def chat(request):
+    data, prompt, system_prompt, session_id = await read_chat_request(request)
+    client = request.app[ollama_client]
+    turn = await admit(client, prompt, system_prompt, session_id)
+    try:
+        events = generate(client, turn)
+        parts = []
+        try:
+            async for event in events:
+                if request.transport is None or request.transport.is_closing():
+                    break  # client left; closing the stream stops the generation
+                parts.append(event.get('response', ''))
+        finally:
+            await events.aclose()
+        response = ''.join(parts).strip()
+        if not response:
+            response = "I couldn't generate a response. Please try again."
+    except Exception as e:
+        logger.exception('Chat response failed')
+        response = f"Error processing your request: {str(e)}"
+    finally:
+        turn.release()
+    return set_session_cookie(
+        web.json_response({'response': response, 'analysis': data.get('analysis')}), session_id)
+
+
+async def chat_stream(request):
+    _, prompt, system_prompt, session_id = await read_chat_request(request)
+    client = request.app[ollama_client]
+    turn = await admit(client, prompt, system_prompt, session_id)
+    try:
+        response = web.StreamResponse(headers={
+            'Content-Type': 'text/event-stream',
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no',
+        })
+        set_session_cookie(response, session_id)
+        await response.prepare(request)
+
+        events = generate(client, turn)
+        try:
+            async for event in events:
+                if event.get('response'):
+                    await response.write(sse('token', {'text': event['response']}).encode())
+                if event.get('done'):
+                    await response.write(done_event(event).encode())
+        except Exception as e:
+            logger.warning('Chat stream failed: %s', e)
+            await response.write(sse('error', {'error': str(e)}).encode())
+        finally:
+            await events.aclose()
+    finally:
+        turn.release()
+    await response.write_eof()
+    return response
+
+
+async def chat_stats(request):
+    return web.json_response(await blocking(
+        chat_stats_data, request.cookies.get(Config.CHAT_SESSION_COOKIE),
+        request.app[ollama_client]))
+
+
+async def metrics_text(request):
+    return web.Response(body=metrics.render(), headers={'Content-Type': metrics.CONTENT_TYPE})
+
+
+async def ollama_session(app):
+    app[ollama_client] = AsyncOllamaClient()
+    start_prefix_warmup()
+    if Config.METRICS_ENABLED:
+        watch_chat_metrics(app[ollama_client])
+    yield
+    await app[ollama_client].close()
+
+
+def create_async_app():
+    setup_logging()
+    app = web.Application(client_max_size=Config.MAX_CONTENT_LENGTH,
+                          middlewares=[request_context])
+    app.on_response_prepare.append(add_request_id)
+    app.cleanup_ctx.append(ollama_session)
+    app.router.add_post('/chat', chat)
+    app.router.add_post('/chat/stream', chat_stream)
+    app.router.add_get('/chat/stats', chat_stats)
+    if Config.METRICS_ENABLED:
+        app.router.add_get('/metrics', metrics_text)
+    return app
+
+
+if __name__ == '__main__':
+    # request_context logs every request, so aiohttp's own access log is off
+    web.run_app(create_async_app(), host=Config.ASYNC_CHAT_HOST, port=Config.ASYNC_CHAT_PORT,
+                access_log=None)
@@ -0,0 +1,172 @@
+"""Structured logging that never blocks a request on a write.
+
+``setup_logging()`` puts a queue handler on the root logger. A request
+thread only copies the record into a bounded queue. A background listener
+thread writes it as one JSON line with the request id and any ``extra``
+fields (timings, sizes). When the queue is full, records are dropped and
+counted instead of waiting.
+
+DEBUG records are sampled per request. With LOG_DEBUG_SAMPLE_RATE = 0.01,
+one request in a hundred keeps all of its debug lines and the rest keep
+none. Code in app/ and FossilChatBot/ just uses
+``logging.getLogger(__name__)``.
+"""
+
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import queue
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from config.config import Config
+
+REQUEST_ID = re.compile(r'[0-9A-Za-z._-]{1,64}')
+
+request_id = contextvars.ContextVar('request_id', default=None)
+
+# LogRecord attributes that are not ``extra`` fields
+_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {
+    'message', 'asctime', 'request_id'}
+
+access_log = logging.getLogger('app.access')
+
+_lock = threading.Lock()
+_listener = None
+_handler = None
+
+
+def start_request(incoming=None):
+    """Set the request id for records logged from this context and return it.
+
+    An incoming X-Request-ID is kept if it looks sane, so ids can be traced
+    through a proxy; otherwise a fresh one is made.
+    """
+    rid = incoming if incoming and REQUEST_ID.fullmatch(incoming) else uuid.uuid4().hex
+    request_id.set(rid)
+    return rid
+
+
+class RequestContext(logging.Filter):
+    """Stamps records with the request id and samples DEBUG records per request."""
+
+    def __init__(self, debug_sample_rate):
+        super().__init__()
+        self.threshold = int(debug_sample_rate * 0xFFFFFFFF)
+
+    def filter(self, record):
+        rid = record.request_id = getattr(record, 'request_id', None) or request_id.get()
+        if record.levelno > logging.DEBUG or self.threshold >= 0xFFFFFFFF:
+            return True
+        if rid is None:
+            return random.random() * 0xFFFFFFFF < self.threshold
+        return zlib.crc32(rid.encode()) < self.threshold
+
+
+class DroppingQueueHandler(QueueHandler):
+    """A QueueHandler that drops records when the queue is full instead of blocking."""
+
+    def __init__(self, queue):
+        super().__init__(queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Resolve the message and traceback now, while the arguments are
+        # still valid, but leave the JSON encoding to the writer thread.
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        if getattr(record, 'request_id', None):
+            entry['request_id'] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+def setup_logging(level=None, debug_sample_rate=None, queue_size=None, stream=None):
+    """Route all logging through the queue to a JSON writer thread. Idempotent."""
+    global _listener, _handler
+    with _lock:
+        if _listener is not None:
+            return _handler
+        records = queue.Queue(queue_size or Config.LOG_QUEUE_SIZE)
+        writer = logging.StreamHandler(stream or sys.stderr)
+        writer.setFormatter(JsonFormatter())
+        _handler = DroppingQueueHandler(records)
+        _handler.addFilter(RequestContext(
+            Config.LOG_DEBUG_SAMPLE_RATE if debug_sample_rate is None else debug_sample_rate))
+        root = logging.getLogger()
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        root.addHandler(_handler)
+        root.setLevel(level or Config.LOG_LEVEL)
+        _listener = QueueListener(records, writer, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+        return _handler
+
+
+def log_request(rid, method, path, status, started):
+    access_log.info('%s %s %s', method, path, status, extra={
+        'request_id': rid, 'method': method, 'path': path, 'status': status,
+        'duration_ms': round((time.perf_counter() - started) * 1000, 2)})
+
+
+def init_app(app):
+    """Give every Flask request an id, echoed as X-Request-ID, and log it once it is sent.
+
+    Streamed responses are logged when the stream closes, so the duration
+    covers the whole body.
+    """
+    from flask import g, request
+
+    @app.before_request
+    def begin_request():
+        g.request_started = time.perf_counter()
+        g.request_id = start_request(request.headers.get('X-Request-ID'))
+
+    @app.after_request
+    def end_request(response):
+        response.headers['X-Request-ID'] = g.request_id
+        args = (g.request_id, request.method, request.path, response.status_code,
+                g.request_started)
+        response.call_on_close(lambda: log_request(*args))
+        return response
+
+
+def dropped():
+    """Records dropped because the queue was full."""
+    return _handler.dropped if _handler else 0
@@ -0,0 +1,209 @@
+"""Prometheus metrics for the web app, served as text on /metrics.
+
+Histograms and counters are fed as work happens: stage timings come from
+app.timing listeners, chat queue waits from the generation scheduler and
+per-generation timings and Ollama eval stats from the clients'
+GenerationRegistry. Cache and scheduler figures that are already counted
+elsewhere are read from their stats() when scraped, so they cost nothing
+between scrapes. An observation is a bisect and a short critical section.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+
+from app import timing
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+GENERATION_BUCKETS = (.1, .25, .5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+TOKEN_RATE_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 200, 500, 1000, 5000)
+
+_families = []
+_collectors = []
+_caches = {}
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join('%s="%s"' % (name, str(value).replace('\\', r'\\')
+                                  .replace('"', r'\"').replace('\n', r'\n'))
+                     for name, value in zip(names, values))
+    return '{%s}' % pairs
+
+
+def _value(value):
+    return repr(float(value)) if value != float('inf') else '+Inf'
+
+
+def family(name, kind, help, labels, samples):
+    """Text lines for one metric family; samples maps label values to a value."""
+    lines = [f'# HELP {name} {help}', f'# TYPE {name} {kind}']
+    for values, value in samples.items():
+        lines.append(f'{name}{_labels(labels, values)} {_value(value)}')
+    return lines
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _families.append(self)
+
+    def inc(self, amount=1, *values):
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+    def render(self):
+        with self._lock:
+            samples = dict(self._values)
+        return family(self.name, 'counter', self.help, self.labels, samples)
+
+
+class Histogram:
+    def __init__(self, name, help, buckets, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+        _families.append(self)
+
+    def observe(self, value, *values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(values)
+            if series is None:
+                # Per-bucket counts (the last is +Inf), then sum and count
+                series = self._series[values] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        with self._lock:
+            series = {values: list(counts) for values, counts in self._series.items()}
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        names = self.labels + ('le',)
+        for values, counts in series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_labels(names, values + (_value(bound),))} '
+                             f'{cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labels, values)} {_value(counts[-2])}')
+            lines.append(f'{self.name}_count{_labels(self.labels, values)} {counts[-1]}')
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    'fossil_stage_seconds', 'Time spent in each stage of classifying an image.',
+    LATENCY_BUCKETS, ['stage'])
+CHAT_QUEUE_WAIT = Histogram(
+    'fossil_chat_queue_wait_seconds', 'Time a generation waited for a scheduler slot.',
+    LATENCY_BUCKETS + (30,))
+CHAT_TTFT = Histogram(
+    'fossil_chat_time_to_first_token_seconds',
+    'Time from sending a streaming generation to Ollama to its first token.',
+    GENERATION_BUCKETS)
+CHAT_GENERATION = Histogram(
+    'fossil_chat_generation_seconds', 'Time from sending a generation to Ollama to its end.',
+    GENERATION_BUCKETS, ['outcome'])
+CHAT_TOKEN_RATE = Histogram(
+    'fossil_chat_tokens_per_second',
+    'Tokens per second per generation, as timed by Ollama, by phase (prompt or eval).',
+    TOKEN_RATE_BUCKETS, ['phase'])
+CHAT_TOKENS = Counter(
+    'fossil_chat_tokens_total', 'Tokens processed by Ollama, by phase (prompt or eval).',
+    ['phase'])
+CHAT_OLLAMA_SECONDS = Counter(
+    'fossil_chat_ollama_seconds_total',
+    'Time Ollama reported spending, by phase (load, prompt or eval).', ['phase'])
+
+
+def observe_stage(stage, seconds):
+    STAGE_SECONDS.observe(seconds, stage)
+
+
+def observe_queue_wait(seconds):
+    CHAT_QUEUE_WAIT.observe(seconds)
+
+
+def observe_generation(generation, outcome):
+    """GenerationRegistry listener: timings plus the eval stats of the final event."""
+    now = time.perf_counter()
+    CHAT_GENERATION.observe(now - generation.started, outcome)
+    if generation.first_token is not None:
+        CHAT_TTFT.observe(generation.first_token - generation.started)
+    final = generation.final
+    if not final:
+        return
+    for phase, count, duration in (('prompt', 'prompt_eval_count', 'prompt_eval_duration'),
+                                   ('eval', 'eval_count', 'eval_duration')):
+        tokens, nanoseconds = final.get(count) or 0, final.get(duration) or 0
+        CHAT_TOKENS.inc(tokens, phase)
+        CHAT_OLLAMA_SECONDS.inc(nanoseconds / 1e9, phase)
+        if tokens and nanoseconds:
+            CHAT_TOKEN_RATE.observe(tokens / (nanoseconds / 1e9), phase)
+    CHAT_OLLAMA_SECONDS.inc((final.get('load_duration') or 0) / 1e9, 'load')
+
+
+def watch_stages():
+    """Time classification stages; until this is called timed() stays a no-op."""
+    timing.add_listener(observe_stage)
+
+
+def watch_chat(scheduler, generations):
+    """Observe a chat scheduler's queue waits and a client's GenerationRegistry."""
+    scheduler.add_listener(observe_queue_wait)
+    generations.add_listener(observe_generation)
+
+
+def add_collector(collector):
+    """Register ``collector()`` to return extra text lines at every scrape."""
+    _collectors.append(collector)
+
+
+def watch_cache(name, stats):
+    """Report a cache's hits and misses; ``stats()`` returns them as the caches' stats() do."""
+    _caches[name] = stats
+
+
+def _cache_lines():
+    caches = {(name,): stats() for name, stats in _caches.items()}
+    hits = {name: stats['hits'] + stats.get('disk_hits', 0) for name, stats in caches.items()}
+    misses = {name: stats['misses'] for name, stats in caches.items()}
+    ratio = {name: stats['hit_rate'] for name, stats in caches.items()}
+    return (family('fossil_cache_hits_total', 'counter', 'Cache lookups answered.',
+                   ['cache'], hits)
+            + family('fossil_cache_misses_total', 'counter', 'Cache lookups missed.',
+                     ['cache'], misses)
+            + family('fossil_cache_hit_ratio', 'gauge',
+                     'Share of lookups answered since start.', ['cache'], ratio))
+
+
+def scheduler_collector(scheduler):
+    """A collector of a generation scheduler's load and rejections."""
+    def collect():
+        stats = scheduler.stats()
+        return (family('fossil_chat_in_flight', 'gauge', 'Generations running.',
+                       [], {(): stats['in_flight']})
+                + family('fossil_chat_queued', 'gauge', 'Generations waiting for a slot.',
+                         [], {(): stats['queued']})
+                + family('fossil_chat_rejected_total', 'counter',
+                         'Generations turned away, by reason.', ['reason'],
+                         {('busy',): stats['rejected'], ('timeout',): stats['timed_out']}))
+    return collect
+
+
+def render():
+    lines = []
+    for metric in _families:
+        lines.extend(metric.render())
+    if _caches:
+        lines.extend(_cache_lines())
+    for collector in _collectors:
+        lines.extend(collector())
+    return '\n'.join(lines) + '\n'
+
@@ -0,0 +1,129 @@
+"""Inference backends for FossilClassifier.
+
+Every backend takes a (N, height, width, 3) uint8 batch and returns an
+(N, num_classes) float32 array of class probabilities. TensorFlow is only
+imported by the backend that needs it, so a TFLite server can run on the
+lightweight tflite_runtime interpreter alone.
+"""
+
+import threading
+
+import numpy as np
+
+
+def build_inference_fn(model, image_size):
+    """Wrap a Keras model in a uint8 tf.function with a fixed signature.
+
+    Normalization lives in the graph so callers hand over raw pixels; the
+    fixed signature means the function is traced only once. The same
+    function is what export_model.py converts to TFLite.
+    """
+    import tensorflow as tf
+
+    width, height = image_size
+
+    @tf.function(input_signature=[tf.TensorSpec([None, height, width, 3], tf.uint8)])
+    def infer(images):
+        images = tf.cast(images, tf.float32) / 255.0
+        return model(images, training=False)
+
+    return infer
+
+
+class KerasBackend:
+    name = 'keras'
+
+    def __init__(self, model_path, image_size, num_threads=None):
+        import tensorflow as tf
+
+        if num_threads:
+            try:
+                tf.config.threading.set_intra_op_parallelism_threads(num_threads)
+            except RuntimeError:
+                pass  # TensorFlow already initialized in this process
+        self.model = tf.keras.models.load_model(model_path)
+        self.infer = build_inference_fn(self.model, image_size)
+
+    def predict(self, images):
+        return self.infer(images).numpy()
+
+
+def load_interpreter():
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        try:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+        except ImportError:
+            raise ImportError(
+                "The tflite backend needs tflite-runtime (pip install tflite-runtime) "
+                "or TensorFlow."
+            )
+    return Interpreter
+
+
+def padded_batch_sizes(max_batch_size):
+    """Powers of two below max_batch_size, then max_batch_size itself."""
+    sizes = [1]
+    while sizes[-1] * 2 < max_batch_size:
+        sizes.append(sizes[-1] * 2)
+    if max_batch_size > 1:
+        sizes.append(max_batch_size)
+    return sizes
+
+
+class TFLiteBackend:
+    """TFLite inference with one interpreter per padded batch size.
+
+    Resizing an interpreter's input reallocates all of its tensors, and
+    micro-batches change size almost every call. So each size in
+    padded_batch_sizes(max_batch_size) gets its own interpreter,
+    allocated once, and a batch is zero-padded up to the next size.
+    Larger batches are split.
+    """
+
+    name = 'tflite'
+
+    def __init__(self, model_path, num_threads=None, max_batch_size=1):
+        Interpreter = load_interpreter()
+        self.batch_sizes = padded_batch_sizes(max_batch_size)
+        self._interpreters = {}
+        for size in self.batch_sizes:
+            interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+            details = interpreter.get_input_details()[0]
+            interpreter.resize_tensor_input(details['index'], [size, *details['shape'][1:]])
+            interpreter.allocate_tensors()
+            # An interpreter must not be invoked from two threads at once.
+            self._interpreters[size] = (interpreter, threading.Lock())
+        interpreter = self._interpreters[1][0]
+        self._input = interpreter.get_input_details()[0]
+        self._output = interpreter.get_output_details()[0]
+
+    def predict(self, images):
+        largest = self.batch_sizes[-1]
+        if len(images) > largest:
+            return np.concatenate([self.predict(images[start:start + largest])
+                                   for start in range(0, len(images), largest)])
+        size = next(size for size in self.batch_sizes if size >= len(images))
+        batch = images
+        if size != len(images):
+            batch = np.zeros((size, *images.shape[1:]), images.dtype)
+            batch[:len(images)] = images
+        interpreter, lock = self._interpreters[size]
+        with lock:
+            interpreter.set_tensor(self._input['index'], batch)
+            interpreter.invoke()
+            output = interpreter.get_tensor(self._output['index'])[:len(images)]
+        scale, zero_point = self._output['quantization']
+        if scale:
+            output = (output.astype(np.float32) - zero_point) * scale
+        return output
+
+
+def load_backend(name, model_path, image_size, num_threads=None, max_batch_size=1):
+    if name == 'keras':
+        return KerasBackend(model_path, image_size, num_threads)
+    if name == 'tflite':
+        return TFLiteBackend(model_path, num_threads, max_batch_size)
+    raise ValueError(f"Unknown inference backend '{name}' (expected 'keras' or 'tflite')")
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def file_fingerprint(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DiskTier:
+    """SQLite-backed second tier, shared by restarts and worker processes."""
+
+    def __init__(self, path, max_entries):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS predictions ('
+            'key TEXT PRIMARY KEY, model TEXT NOT NULL, '
+            'result TEXT NOT NULL, created REAL NOT NULL)'
+        )
+        self._db.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute(
+                'SELECT result FROM predictions WHERE key = ?', (key,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key, model, result):
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?)',
+                (key, model, json.dumps(result), time.time()),
+            )
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._trim()
+            self._db.commit()
+
+    def drop_other_models(self, model):
+        with self._lock:
+            self._db.execute('DELETE FROM predictions WHERE model != ?', (model,))
+            self._db.commit()
+
+    def _trim(self):
+        self._db.execute(
+            'DELETE FROM predictions WHERE key IN ('
+            'SELECT key FROM predictions ORDER BY created DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,),
+        )
+
+
+class PredictionCache:
+    """Content-addressed cache of /predict results.
+
+    Keys are the SHA-256 of the model identity plus the raw upload bytes, so
+    a new model never sees results produced by an old one.
+    """
+
+    def __init__(self, model_identity, max_entries=1024, ttl=3600,
+                 disk_path=None, disk_max_entries=100000):
+        self.model_identity = model_identity
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk = DiskTier(disk_path, disk_max_entries) if disk_path else None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def key(self, image_data):
+        digest = hashlib.sha256(self.model_identity.encode())
+        digest.update(image_data)
+        return digest.hexdigest()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, result = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return dict(result)
+                del self._entries[key]
+                self.expirations += 1
+
+        result = self.disk.get(key) if self.disk else None
+        with self._lock:
+            if result is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, result, now)
+        return dict(result)
+
+    def put(self, key, result):
+        with self._lock:
+            self._remember(key, dict(result), time.monotonic())
+        if self.disk:
+            self.disk.put(key, self.model_identity, result)
+
+    def _remember(self, key, result, now):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (now + self.ttl, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def set_model_identity(self, model_identity):
+        with self._lock:
+            if model_identity == self.model_identity:
+                return
+            self.model_identity = model_identity
+            self._entries.clear()
+            self.invalidations += 1
+        if self.disk:
+            self.disk.drop_other_models(model_identity)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'model': self.model_identity[:12],
+            }
@@ -1,31 +1,272 @@
-import tensorflow as tf
+import collections
+import logging
 import numpy as np
-from PIL import Image
-import io
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+
+from app.models import preprocessing
+from app.models.backends import load_backend
+from app.models.cache import PredictionCache, file_fingerprint
+from app.models.phash import NearDuplicateIndex, dhash
+from app.models.workers import InferencePool
+from app.timing import record, timed
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+class BatchQueueFull(Exception):
+    def __init__(self, retry_after):
+        super().__init__('Inference queue is full')
+        self.retry_after = retry_after
+
+
+class InferenceBatcher:
+    """Collects concurrent single-image requests into batched forward passes.
+
+    A batch is dispatched as soon as it holds ``max_batch_size`` images or the
+    oldest image has waited ``max_wait_ms``, whichever comes first. With
+    ``concurrency`` > 1 several batches can be in flight at once, which is
+    what keeps a multi-process InferencePool busy.
+    """
+
+    def __init__(self, run_batch, max_batch_size, max_wait_ms, queue_depth,
+                 retry_after=1, concurrency=1):
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.retry_after = retry_after
+        self._queue = queue.Queue(maxsize=queue_depth)
+        self._threads = [
+            threading.Thread(target=self._worker, name=f'fossil-inference-{i}',
+                             daemon=True)
+            for i in range(concurrency)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, image, block=False):
+        """Queue one image; with ``block`` wait for room instead of raising BatchQueueFull."""
+        future = Future()
+        try:
+            self._queue.put((image, future, time.perf_counter()), block=block)
+        except queue.Full:
+            raise BatchQueueFull(self.retry_after)
+        return future
+
+    def _collect(self):
+        items = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(items) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    items.append(self._queue.get(timeout=remaining))
+                else:
+                    items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _worker(self):
+        while True:
+            items = self._collect()
+            dispatched = time.perf_counter()
+            for _, _, submitted in items:
+                record('queue', dispatched - submitted)
+            try:
+                batch = np.concatenate([image for image, _, _ in items])
+                predictions = self.run_batch(batch)
+            except Exception as e:
+                for _, future, _ in items:
+                    future.set_exception(e)
+                continue
+            for (_, future, _), prediction in zip(items, predictions):
+                future.set_result(prediction)
+
 
 class FossilClassifier:
-    def __init__(self):
-        self.model = tf.keras.models.load_model('models/fossil_classifier.h5')
+    def __init__(self, model_path=None, backend=None):
+        self.backend_name = backend or Config.INFERENCE_BACKEND
+        self.model_path = model_path or (
+            Config.TFLITE_MODEL_PATH if self.backend_name == 'tflite'
+            else Config.MODEL_PATH)
         self.img_height = 224
         self.img_width = 224
-        self.class_names = ['ammonite', 'belemnite', 'coral', 
+        self.class_names = ['ammonite', 'belemnite', 'coral',
                           'crinoid', 'leaf fossil', 'trilobite']
+        self._reload_lock = threading.Lock()
+        # Batches running on each backend, so a replaced one is closed only
+        # once its last batch is done.
+        self._backend_lock = threading.Lock()
+        self._backend_users = {}
+        self._load_model()
+        self.cache = PredictionCache(
+            self.model_identity,
+            max_entries=Config.PREDICTION_CACHE_SIZE,
+            ttl=Config.PREDICTION_CACHE_TTL,
+            disk_path=Config.PREDICTION_CACHE_PATH,
+            disk_max_entries=Config.PREDICTION_CACHE_DISK_SIZE,
+        )
+        self.near_duplicates = NearDuplicateIndex(
+            max_distance=Config.PHASH_MAX_DISTANCE,
+            max_entries=Config.PHASH_INDEX_SIZE,
+        )
+        self.batcher = InferenceBatcher(
+            self.predict_batch,
+            max_batch_size=Config.BATCH_MAX_SIZE,
+            max_wait_ms=Config.BATCH_MAX_WAIT_MS,
+            queue_depth=Config.BATCH_QUEUE_DEPTH,
+            retry_after=Config.BATCH_RETRY_AFTER,
+            concurrency=max(1, Config.INFERENCE_WORKERS * Config.INFERENCE_WORKER_SLOTS),
+        )
 
-    def process_image(self, image_data):
-        img = Image.open(io.BytesIO(image_data))
-        img = img.resize((self.img_height, self.img_width))
-        img_array = tf.keras.preprocessing.image.img_to_array(img)
-        img_array = tf.expand_dims(img_array, 0)
-        return img_array / 255.0
+    def _load_model(self):
+        stat = os.stat(self.model_path)
+        self._model_stat = (stat.st_size, stat.st_mtime_ns)
+        image_size = (self.img_width, self.img_height)
+        if Config.INFERENCE_WORKERS:
+            backend = InferencePool(
+                Config.INFERENCE_WORKERS, self.backend_name, self.model_path,
+                image_size, Config.BATCH_MAX_SIZE,
+                slots_per_worker=Config.INFERENCE_WORKER_SLOTS,
+                cpu_affinity=Config.INFERENCE_CPU_AFFINITY,
+                num_threads=Config.INFERENCE_THREADS,
+            )
+        else:
+            backend = load_backend(self.backend_name, self.model_path, image_size,
+                                   num_threads=Config.INFERENCE_THREADS,
+                                   max_batch_size=Config.BATCH_MAX_SIZE)
+        self._warm_up(backend)
+        # Swap only once the new backend is ready so in-flight batches keep
+        # running on the old one.
+        with self._backend_lock:
+            previous, self.backend = getattr(self, 'backend', None), backend
+            idle = previous is not None and not self._backend_users.get(previous)
+        if idle:
+            self._retire(previous)
+        self.model_identity = file_fingerprint(self.model_path)
 
-    def predict(self, file):
-        image_data = file.read()
+    def reload_if_changed(self):
+        stat = os.stat(self.model_path)
+        if (stat.st_size, stat.st_mtime_ns) == self._model_stat:
+            return
+        with self._reload_lock:
+            if (stat.st_size, stat.st_mtime_ns) == self._model_stat:
+                return
+            try:
+                self._load_model()
+            except Exception:
+                # Probably caught mid-copy; keep serving the old model and
+                # try again once the file changes again.
+                logger.warning('Could not reload %s', self.model_path, exc_info=True)
+                return
+            self.cache.set_model_identity(self.model_identity)
+            self.near_duplicates.clear()
+            logger.info('Reloaded %s', self.model_path)
+
+    def _warm_up(self, backend):
+        # Trace the graph and allocate kernels before the first real request.
+        for batch_size in sorted({1, Config.BATCH_MAX_SIZE}):
+            backend.predict(np.zeros(
+                (batch_size, self.img_height, self.img_width, 3), np.uint8))
+
+    def load_image(self, image_data):
+        return preprocessing.load_image(image_data, (self.img_width, self.img_height))
+
+    def process_image(self, image_data, out=None):
+        return preprocessing.process_image(
+            image_data, (self.img_width, self.img_height), out)
+
+    def _retire(self, backend):
+        # Closing a worker pool joins its processes; keep that off the request thread.
+        if hasattr(backend, 'close'):
+            threading.Thread(target=backend.close, name='fossil-backend-close',
+                             daemon=True).start()
+
+    def predict_batch(self, images):
+        with self._backend_lock:
+            backend = self.backend
+            self._backend_users[backend] = self._backend_users.get(backend, 0) + 1
+        try:
+            with timed('inference'):
+                return backend.predict(images)
+        finally:
+            with self._backend_lock:
+                self._backend_users[backend] -= 1
+                retired = backend is not self.backend and not self._backend_users[backend]
+                if not self._backend_users[backend]:
+                    del self._backend_users[backend]
+            if retired:
+                self._retire(backend)
+
+    def to_result(self, prediction, with_probabilities=False):
+        result = {
+            'class': self.class_names[np.argmax(prediction)],
+            'confidence': float(np.max(prediction)) * 100
+        }
+        if with_probabilities:
+            result['probabilities'] = {
+                name: float(p) for name, p in zip(self.class_names, prediction)
+            }
+        return result
+
+    def classify_decoded(self, futures, with_probabilities=False):
+        """Yield (name, result) pairs as images finish decoding and inference.
+
+        ``futures`` maps futures returning process_image() output to a name.
+        Decoded images go through the batcher like /predict requests, so
+        they share its batches and its queue. At most one batch's worth is
+        queued at a time, and a full queue makes this wait rather than fail,
+        so a large upload slows down instead of crowding out /predict. A
+        failed image only yields its own error.
+        """
+        self.reload_if_changed()
+        decoding = set(futures)
+        ready = collections.deque()
+        predicting = {}
+        while decoding or ready or predicting:
+            while ready and len(predicting) < self.batcher.max_batch_size:
+                name, image = ready.popleft()
+                predicting[self.batcher.submit(image, block=True)] = name
+            done, _ = wait(decoding | set(predicting), return_when=FIRST_COMPLETED)
+            for future in done:
+                decoded = future in decoding
+                name = futures[future] if decoded else predicting.pop(future)
+                decoding.discard(future)
+                try:
+                    value = future.result()
+                except Exception as e:
+                    yield name, {'error': str(e)}
+                    continue
+                if decoded:
+                    ready.append((name, value))
+                else:
+                    yield name, self.to_result(value, with_probabilities)
+
+    def classify(self, image_data):
         processed_image = self.process_image(image_data)
-        predictions = self.model.predict(processed_image)
-        predicted_class = self.class_names[np.argmax(predictions[0])]
-        confidence = float(np.max(predictions[0]))
-        
-        return {
-            'class': predicted_class,
-            'confidence': float(confidence * 100)
-        }
\ No newline at end of file
+        # A resized or recompressed copy of a recent upload reuses its result.
+        # Images too flat to hash reliably (None) are always classified.
+        image_hash = dhash(processed_image[0], min_stddev=Config.PHASH_MIN_STDDEV)
+        result = self.near_duplicates.get(image_hash)
+        if result is not None:
+            return result
+
+        prediction = self.batcher.submit(processed_image).result()
+        result = self.to_result(prediction)
+        self.near_duplicates.put(image_hash, result)
+        return result
+
+    def predict(self, file):
+        with timed('read'):
+            image_data = file.read()
+        self.reload_if_changed()
+        key = self.cache.key(image_data)
+        result = self.cache.get(key)
+        if result is None:
+            result = self.classify(image_data)
+            self.cache.put(key, result)
+        return result
@@ -0,0 +1,125 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+HASH_BITS = 64
+_GRAY_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def dhash(pixels, hash_size=8, min_stddev=0.0):
+    """64-bit difference hash of an HxWx3 uint8 image.
+
+    The image is reduced to a (hash_size + 1) x hash_size grayscale
+    thumbnail and each bit records whether a pixel is brighter than its
+    right-hand neighbour, which survives resizing and recompression.
+
+    Returns None when the thumbnail's standard deviation is below
+    ``min_stddev``: flat or low-contrast images all hash to (nearly) the
+    same bits, so their hashes say nothing about the content.
+    """
+    gray = np.asarray(pixels, dtype=np.float32) @ _GRAY_WEIGHTS
+    thumb = Image.fromarray(gray.astype(np.uint8)).resize(
+        (hash_size + 1, hash_size), Image.BOX)
+    thumb = np.asarray(thumb, dtype=np.int16)
+    if thumb.std() < min_stddev:
+        return None
+    bits = thumb[:, 1:] > thumb[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+class NearDuplicateIndex:
+    """Bounded LRU of hash -> prediction with multi-index-hashing lookups.
+
+    The 64-bit hash is split into ``max_distance + 1`` chunks. Two hashes
+    within ``max_distance`` bits must agree exactly on at least one chunk,
+    so a radius query only has to compare against the few hashes sharing a
+    chunk value instead of the whole index.
+    """
+
+    def __init__(self, max_distance=4, max_entries=50000):
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        chunks = max(max_distance + 1, 1)
+        bounds = [round(i * HASH_BITS / chunks) for i in range(chunks + 1)]
+        self._chunks = [(lo, (1 << (hi - lo)) - 1) for lo, hi in zip(bounds, bounds[1:])]
+        self._tables = [{} for _ in self._chunks]
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_distance >= 0 and self.max_entries > 0
+
+    def _keys(self, image_hash):
+        return [(image_hash >> shift) & mask for shift, mask in self._chunks]
+
+    def get(self, image_hash):
+        if not self.enabled:
+            return None
+        with self._lock:
+            if image_hash is None:
+                self.skipped += 1
+                return None
+            best, best_distance = None, self.max_distance + 1
+            for table, key in zip(self._tables, self._keys(image_hash)):
+                for candidate in table.get(key, ()):
+                    distance = hamming(candidate, image_hash)
+                    if distance < best_distance:
+                        best, best_distance = candidate, distance
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(best)
+            return dict(self._entries[best])
+
+    def put(self, image_hash, result):
+        if not self.enabled or image_hash is None:
+            return
+        with self._lock:
+            if image_hash not in self._entries:
+                for table, key in zip(self._tables, self._keys(image_hash)):
+                    table.setdefault(key, set()).add(image_hash)
+            self._entries[image_hash] = dict(result)
+            self._entries.move_to_end(image_hash)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._unlink(evicted)
+                self.evictions += 1
+
+    def _unlink(self, image_hash):
+        for table, key in zip(self._tables, self._keys(image_hash)):
+            bucket = table[key]
+            bucket.discard(image_hash)
+            if not bucket:
+                del table[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for table in self._tables:
+                table.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'max_distance': self.max_distance,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'skipped': self.skipped,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,47 @@
+"""Image decoding for the classifier.
+
+Kept free of TensorFlow so decode worker processes stay small.
+"""
+
+import io
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from app.timing import timed
+
+IMAGE_SIZE = (224, 224)  # (width, height)
+
+
+def load_image(image_data, size=IMAGE_SIZE):
+    img = Image.open(io.BytesIO(image_data))
+    if img.format == 'JPEG':
+        # Let libjpeg decode at 1/2, 1/4 or 1/8 scale, never below the target.
+        img.draft('RGB', size)
+    img.load()
+    ImageOps.exif_transpose(img, in_place=True)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    return img
+
+
+def resize_image(img, size=IMAGE_SIZE, out=None):
+    # reducing_gap box-shrinks large images by an integer factor before
+    # the bicubic resample, which then only has to work on ~2x the target.
+    img = img.resize(size, reducing_gap=2.0)
+    if out is None:
+        out = np.empty((1, size[1], size[0], 3), np.uint8)
+    out[0] = np.asarray(img)
+    return out
+
+
+def process_image(image_data, size=IMAGE_SIZE, out=None):
+    with timed('decode'):
+        img = load_image(image_data, size)
+    with timed('resize'):
+        return resize_image(img, size, out)
+
+
+def process_file(path, size=IMAGE_SIZE):
+    with open(path, 'rb') as f:
+        return process_image(f.read(), size)
@@ -0,0 +1,238 @@
+"""Multi-process inference pool.
+
+Each worker process owns its own backend (Keras model or TFLite interpreter)
+and a block of shared memory split into batch-sized slots. The web process
+writes preprocessed uint8 batches straight into a free slot and sends only
+``(request_id, slot, count)`` down a pipe; probabilities come back over a
+second pipe. Batches go to the worker with the fewest outstanding requests.
+A worker process that dies fails its pending batches and is restarted.
+"""
+
+import atexit
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def cpu_sets(size, affinity):
+    """Resolve the INFERENCE_CPU_AFFINITY setting into one CPU set per worker."""
+    if affinity is None:
+        return [None] * size
+    if affinity == 'auto':
+        if hasattr(os, 'sched_getaffinity'):
+            cpus = sorted(os.sched_getaffinity(0))
+        else:
+            cpus = list(range(os.cpu_count() or 1))
+        share = max(1, len(cpus) // size)
+        return [set(cpus[(i * share) % len(cpus):][:share]) for i in range(size)]
+    return [set(cpus) for cpus in affinity]
+
+
+def _worker_main(backend_name, model_path, image_size, num_threads, cpus,
+                 shm_name, buffer_shape, warm_up_sizes, requests, results):
+    if cpus and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpus)
+    from app.models.backends import load_backend
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    buffer = np.ndarray(buffer_shape, np.uint8, shm.buf)
+    try:
+        backend = load_backend(backend_name, model_path, image_size, num_threads,
+                               max_batch_size=buffer_shape[1])
+        for batch_size in warm_up_sizes:
+            backend.predict(np.zeros((batch_size, *buffer_shape[2:]), np.uint8))
+    except Exception as e:
+        results.send((None, None, str(e)))
+        return
+    results.send((None, None, None))
+
+    while True:
+        message = requests.recv()
+        if message is None:
+            break
+        request_id, slot, count = message
+        try:
+            results.send((request_id, backend.predict(buffer[slot, :count]), None))
+        except Exception as e:
+            results.send((request_id, None, str(e)))
+    del buffer
+    shm.close()
+
+
+def _start_without_main(process):
+    # A spawned child normally re-runs the parent's __main__ script so that
+    # pickled references resolve. For `python run.py` that would build the
+    # whole Flask app, and another pool, inside every worker; the worker
+    # target lives in this module, so hide the script while starting it.
+    main = sys.modules['__main__']
+    main_file = getattr(main, '__file__', None)
+    if main_file is None or getattr(main.__spec__, 'name', None):
+        process.start()
+        return
+    del main.__file__
+    try:
+        process.start()
+    finally:
+        main.__file__ = main_file
+
+
+class _Worker:
+    def __init__(self, context, index, backend_name, model_path, image_size,
+                 num_threads, cpus, slots, max_batch_size):
+        width, height = image_size
+        self.buffer_shape = (slots, max_batch_size, height, width, 3)
+        self.shm = shared_memory.SharedMemory(
+            create=True, size=int(np.prod(self.buffer_shape)))
+        self.buffer = np.ndarray(self.buffer_shape, np.uint8, self.shm.buf)
+        self.free_slots = queue.Queue()
+        for slot in range(slots):
+            self.free_slots.put(slot)
+        self.outstanding = 0
+        self.pending = {}
+        self.alive = False
+        self._closing = False
+        self._send_lock = threading.Lock()
+        self._context = context
+        self._args = (backend_name, model_path, image_size, num_threads, cpus,
+                      self.shm.name, self.buffer_shape, sorted({1, max_batch_size}))
+        self._name = f'fossil-inference-{index}'
+        self._spawn()
+
+    def _spawn(self):
+        child_requests, self._requests = self._context.Pipe(duplex=False)
+        self._results, child_results = self._context.Pipe(duplex=False)
+        self.process = self._context.Process(
+            target=_worker_main, name=self._name, daemon=True,
+            args=self._args + (child_requests, child_results),
+        )
+        _start_without_main(self.process)
+        child_requests.close()
+        child_results.close()
+
+    def wait_ready(self):
+        try:
+            _, _, error = self._results.recv()
+        except (EOFError, OSError):
+            error = f'exit code {self.process.exitcode}'
+        if error:
+            raise RuntimeError(f'Inference worker failed to start: {error}')
+        self.alive = True
+        threading.Thread(target=self._read_results, daemon=True,
+                         name=f'{self.process.name}-results').start()
+
+    def submit(self, request_id, images):
+        # Blocks only if every slot of this worker is busy.
+        slot = self.free_slots.get()
+        self.buffer[slot, :len(images)] = images
+        future = Future()
+        self.pending[request_id] = (future, slot)
+        try:
+            with self._send_lock:
+                self._requests.send((request_id, slot, len(images)))
+        except (BrokenPipeError, OSError) as e:
+            # Unless the results reader already failed it, give the slot back.
+            if self.pending.pop(request_id, None) is not None:
+                self.free_slots.put(slot)
+            raise RuntimeError('Inference worker exited') from e
+        return future
+
+    def _read_results(self):
+        while True:
+            try:
+                request_id, probabilities, error = self._results.recv()
+            except (EOFError, OSError):
+                break
+            future, slot = self.pending.pop(request_id)
+            self.free_slots.put(slot)
+            if error:
+                future.set_exception(RuntimeError(error))
+            else:
+                future.set_result(probabilities)
+        # The process died: fail whatever was still waiting on it and start
+        # a new one in its place.
+        self.alive = False
+        for request_id in list(self.pending):
+            entry = self.pending.pop(request_id, None)
+            if entry is not None:
+                future, slot = entry
+                self.free_slots.put(slot)
+                future.set_exception(RuntimeError('Inference worker exited'))
+        if self._closing:
+            return
+        self.process.join(timeout=5)
+        logger.warning('%s exited with code %s; restarting it',
+                       self._name, self.process.exitcode)
+        try:
+            self._spawn()
+            self.wait_ready()
+        except Exception:
+            logger.exception('Could not restart %s', self._name)
+
+    def close(self):
+        self._closing = True
+        with self._send_lock:
+            try:
+                self._requests.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        self.process.join(timeout=30)
+        del self.buffer
+        self.shm.close()
+        self.shm.unlink()
+
+
+class InferencePool:
+    """Backend-compatible front for a pool of inference worker processes."""
+
+    def __init__(self, size, backend_name, model_path, image_size, max_batch_size,
+                 slots_per_worker=2, cpu_affinity=None, num_threads=None):
+        # spawn rather than fork: forking a process with TensorFlow loaded is unsafe.
+        context = multiprocessing.get_context('spawn')
+        self.max_batch_size = max_batch_size
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self.workers = []
+        for index, cpus in enumerate(cpu_sets(size, cpu_affinity)):
+            threads = num_threads or (len(cpus) if cpus else None)
+            self.workers.append(_Worker(
+                context, index, backend_name, model_path, image_size, threads,
+                cpus, slots_per_worker, max_batch_size))
+        for worker in self.workers:
+            worker.wait_ready()
+        atexit.register(self.close)
+
+    def predict(self, images):
+        if len(images) > self.max_batch_size:
+            return np.concatenate([
+                self.predict(images[start:start + self.max_batch_size])
+                for start in range(0, len(images), self.max_batch_size)
+            ])
+        with self._lock:
+            workers = [w for w in self.workers if w.alive and w.process.is_alive()]
+            if not workers:
+                raise RuntimeError('No inference worker is running')
+            worker = min(workers, key=lambda w: w.outstanding)
+            worker.outstanding += 1
+        try:
+            return worker.submit(next(self._ids), images).result()
+        finally:
+            with self._lock:
+                worker.outstanding -= 1
+
+    def stats(self):
+        return [{'pid': worker.process.pid, 'outstanding': worker.outstanding,
+                 'alive': worker.process.is_alive()} for worker in self.workers]
+
+    def close(self):
+        atexit.unregister(self.close)
+        for worker in self.workers:
+            worker.close()
@@ -0,0 +1,167 @@
+"""On-demand request profiling with a sampling profiler.
+
+A profiled request has the stacks of its thread sampled every
+PROFILE_INTERVAL_MS for as long as it runs, streamed body included. The
+stacks of busy ``fossil-*`` helper threads (image decoding, TF inference)
+are sampled as well, so the profile covers preprocessing, inference and
+Ollama streaming. Helper threads serve every request, so under load
+their samples can include other requests' work.
+
+A request is profiled when it carries PROFILE_TOKEN in an ``X-Profile``
+header or a ``profile`` query parameter, or at random for a
+PROFILE_SAMPLE_RATE share of requests. Each profile is saved as collapsed
+stacks (``frame;frame;frame count``, the input of flamegraph.pl and
+speedscope) in PROFILE_DIR. Only the newest PROFILE_MAX_FILES are kept.
+With PROFILE_TOKEN set, they can be listed at /profiles and fetched at
+/profiles/<name>.
+"""
+
+import hmac
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from config.config import Config
+
+HELPER_THREADS = 'fossil-'
+# Modules whose frames at the top of a helper's stack mean it is idle
+IDLE_MODULES = ('threading.py', 'queue.py', 'selectors.py')
+PROFILE_NAME = re.compile(r'\d+-[\w-]+\.collapsed')
+
+
+def frame_name(code):
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f'{name} ({os.path.basename(code.co_filename)})'.replace(';', ':')
+
+
+def collapse(thread_name, frame):
+    """One sample as a collapsed stack: the thread, then frames from the outermost in."""
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame.f_code))
+        frame = frame.f_back
+    names.append(thread_name.replace(';', ':'))
+    return ';'.join(reversed(names))
+
+
+class StackSampler:
+    """Samples the stacks of one thread, and of busy helper threads, until stopped."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                name = names.get(ident, '')
+                if ident == self.thread_id:
+                    self.stacks[collapse('request', frame)] += 1
+                elif name.startswith(HELPER_THREADS) and not frame.f_code.co_filename.endswith(
+                        IDLE_MODULES):
+                    self.stacks[collapse(name, frame)] += 1
+            self.samples += 1
+
+
+class ProfileStore:
+    """A directory of collapsed-stack files used as a ring buffer."""
+
+    def __init__(self, path, max_files):
+        self.path = path
+        self.max_files = max_files
+        self._lock = threading.Lock()
+
+    def names(self):
+        try:
+            return sorted(name for name in os.listdir(self.path) if PROFILE_NAME.fullmatch(name))
+        except FileNotFoundError:
+            return []
+
+    def save(self, name, stacks):
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, name), 'w') as f:
+            f.writelines(f'{stack} {count}\n' for stack, count in stacks.most_common())
+        with self._lock:
+            for old in self.names()[:-self.max_files]:
+                try:
+                    os.remove(os.path.join(self.path, old))
+                except FileNotFoundError:
+                    pass  # removed by another thread or process
+
+
+def authorized(request):
+    """Whether the request carries PROFILE_TOKEN."""
+    token = Config.PROFILE_TOKEN
+    given = request.headers.get('X-Profile') or request.args.get('profile')
+    return bool(token and given and hmac.compare_digest(given, token))
+
+
+def wants_profile(request):
+    return authorized(request) or random.random() < Config.PROFILE_SAMPLE_RATE
+
+
+def init_app(app):
+    """Profile requests that ask for it (or are sampled) and serve the saved profiles."""
+    from flask import abort, g, jsonify, request, send_from_directory
+
+    store = ProfileStore(Config.PROFILE_DIR, Config.PROFILE_MAX_FILES)
+    if not Config.PROFILE_TOKEN and not Config.PROFILE_SAMPLE_RATE:
+        return store
+
+    @app.before_request
+    def start_profile():
+        if request.path.startswith('/profiles') or not wants_profile(request):
+            return
+        g.profiler = StackSampler(threading.get_ident(),
+                                  Config.PROFILE_INTERVAL_MS / 1000).start()
+
+    @app.after_request
+    def finish_profile(response):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return response
+        label = f"{request.path.strip('/') or 'root'}-{g.get('request_id', '')[:12]}"
+        name = f"{time.time_ns()}-{re.sub(r'[^A-Za-z0-9-]+', '_', label).strip('_')}.collapsed"
+        response.headers['X-Profile-Id'] = name
+        # Streamed bodies run after this hook; stop when the response is closed.
+        response.call_on_close(lambda: store.save(name, profiler.stop()))
+        return response
+
+    @app.teardown_request
+    def drop_profile(error):
+        # The request failed before after_request ran
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.stop()
+
+    @app.route('/profiles')
+    def list_profiles():
+        if not authorized(request):
+            abort(404)
+        return jsonify({'profiles': store.names()[::-1]})
+
+    @app.route('/profiles/<name>')
+    def get_profile(name):
+        if not authorized(request) or not PROFILE_NAME.fullmatch(name):
+            abort(404)
+        return send_from_directory(os.path.abspath(store.path), name, mimetype='text/plain')
+
+    return store
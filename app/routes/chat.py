@@ -1,16 +1,145 @@
 import sys
 import os
 import base64
-from flask import Blueprint, request, jsonify
+import json
+import logging
+import math
+import re
+import select
+import socket
+import threading
+import uuid
+from flask import Blueprint, Response, request, jsonify
 from tempfile import NamedTemporaryFile
 
 # Add the project root to the path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 
-from FossilChatBot.simple_chat import get_chat_response
+from FossilChatBot.ollama_client import EVAL_STATS
+from FossilChatBot.response_cache import CONFIDENCE_BANDS
+from FossilChatBot.scheduler import SchedulerBusy, SchedulerTimeout
+from FossilChatBot.simple_chat import (
+    ChatTurn, client, get_chat_response, prepare_prompts, stream_chat_response, session_store,
+    prefix_cache, response_cache, scheduler, start_prefix_warmup, warm_responses)
+from app import metrics
 from app.models.classifier import FossilClassifier  # Import your image analysis function
+from config.config import Config
 
 chat_bp = Blueprint('chat', __name__)
+logger = logging.getLogger(__name__)
+
+def build_system_prompt(analysis):
+    if not analysis:
+        return None
+    return (
+        f"You are analyzing a fossil identified as {analysis['class']} "
+        f"with {analysis['confidence']}% confidence. "
+        "Provide detailed information about this fossil type."
+    )
+
+# The first message of a conversation about a classification
+OPENER_MESSAGE = 'Class: {fossil}, Accuracy: {confidence}%'
+
+def opener_message(analysis):
+    # Rounded half up, like Math.round in main.js
+    return OPENER_MESSAGE.format(fossil=analysis['class'],
+                                 confidence=int(analysis['confidence'] + 0.5))
+
+def opener_prompts(class_names):
+    for fossil in class_names:
+        for _, _, confidence in CONFIDENCE_BANDS:
+            analysis = {'class': fossil, 'confidence': confidence}
+            yield opener_message(analysis), build_system_prompt(analysis)
+
+def start_opener_warmup(class_names):
+    """Pre-generate the opening answer for every class and confidence band."""
+    threading.Thread(target=warm_responses, args=(list(opener_prompts(class_names)),),
+                     name='chat-warmup', daemon=True).start()
+
+def start_chat_warmup(class_names):
+    """Pre-evaluate the prompt prefixes and, if enabled, the opening answers."""
+    start_prefix_warmup()
+    if Config.CHAT_PREWARM_OPENERS:
+        start_opener_warmup(class_names)
+
+def done_event(event):
+    stats = {key: event[key] for key in EVAL_STATS if key in event}
+    if event.get('cached'):
+        stats['cached'] = True
+    return sse('done', stats)
+
+def busy_reply(error):
+    """Status, body and headers for a request the scheduler turned away:
+    429 when the queue is full, 503 when it waited past the deadline."""
+    status = 503 if isinstance(error, SchedulerTimeout) else 429
+    return status, {'error': str(error)}, {'Retry-After': str(math.ceil(error.retry_after))}
+
+def chat_stats_data(session_id, ollama=client):
+    stats = {'sessions': session_store.stats(), 'prefixes': prefix_cache.stats(),
+             'responses': response_cache.stats(), 'scheduler': scheduler.stats(),
+             'generations': ollama.generations.stats(), 'backends': ollama.backends.stats()}
+    if session_id:
+        stats['session_bytes'] = session_store.session_bytes(session_id)
+    return stats
+
+def watch_chat_metrics(ollama=client):
+    """Feed /metrics from the scheduler, ollama's generations and the chat caches."""
+    metrics.watch_chat(scheduler, ollama.generations)
+    metrics.add_collector(metrics.scheduler_collector(scheduler))
+    metrics.watch_cache('chat_session', session_store.stats)
+    metrics.watch_cache('chat_prefix', prefix_cache.stats)
+    metrics.watch_cache('chat_response', response_cache.stats)
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def sse_chat(events):
+    """SSE messages for chat events: `token`s, then `done` or `error`."""
+    try:
+        for event in events:
+            if event.get('response'):
+                yield sse('token', {'text': event['response']})
+            if event.get('done'):
+                yield done_event(event)
+    except Exception as e:
+        logger.warning('Chat stream failed: %s', e)
+        yield sse('error', {'error': str(e)})
+    finally:
+        events.close()
+
+SESSION_ID = re.compile(r'[0-9a-f]{32}')
+
+def chat_session_id(cookie):
+    """The caller's chat session id, or a fresh one if the cookie is missing or malformed."""
+    if cookie and SESSION_ID.fullmatch(cookie):
+        return cookie
+    return uuid.uuid4().hex
+
+def set_session_cookie(response, session_id):
+    response.set_cookie(Config.CHAT_SESSION_COOKIE, session_id,
+                        httponly=True, samesite='Lax')
+    return response
+
+def client_gone(environ):
+    """Whether the client closed its connection, on servers that expose the socket."""
+    sock = environ.get('gunicorn.socket') or environ.get('werkzeug.socket')
+    if sock is None:
+        return False
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+        # Readable with nothing to read means the peer sent FIN
+        return bool(readable) and sock.recv(1, socket.MSG_PEEK) == b''
+    except ValueError:
+        # TLS sockets can't peek; assume the client is still there
+        return False
+    except OSError:
+        return True
+
+def start_session(data, cookie):
+    session_id = chat_session_id(cookie)
+    if data.get('reset'):
+        session_store.delete(session_id)
+    return session_id
 
 @chat_bp.route('/chat', methods=['POST'])
 def chat():
@@ -23,28 +152,62 @@ def chat():
         return jsonify({'error': 'No message or image provided'}), 400
 
     try:
-        system_prompt = None
-        if analysis:
-            system_prompt = (
-                f"You are analyzing a fossil identified as {analysis['class']} "
-                f"with {analysis['confidence']}% confidence. "
-                "Provide detailed information about this fossil type."
-            )
+        system_prompt = build_system_prompt(analysis)
+        session_id = start_session(data, request.cookies.get(Config.CHAT_SESSION_COOKIE))
 
         # Get the chat response
         response = get_chat_response(
             user_message if user_message else "Tell me about this fossil",
-            system_prompt=system_prompt
+            system_prompt=system_prompt,
+            session_id=session_id,
+            disconnected=lambda: client_gone(request.environ)
         )
-        
-        # Debugging output
-        print(f"Final response being returned: {response[:200]}...")
-        
-        return jsonify({
+        logger.debug('Final response being returned: %.200s', response)
+
+        return set_session_cookie(jsonify({
             'response': response,
             'analysis': analysis
-        })
-            
+        }), session_id)
+
+    except SchedulerBusy as e:
+        status, body, headers = busy_reply(e)
+        return jsonify(body), status, headers
     except Exception as e:
-        print(f"Route error: {str(e)}")
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        logger.exception('Route error')
+        return jsonify({'error': str(e)}), 500
+
+@chat_bp.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Like /chat, but forwards tokens as Server-Sent Events as they arrive.
+
+    Emits `token` events ({"text": ...}), then one `done` event with the
+    Ollama eval stats, or an `error` event if generation fails. The request
+    is admitted before the stream starts, so a full scheduler answers 429
+    or 503 instead.
+    """
+    data = request.get_json()
+    user_message = data.get('message', '').strip()
+    analysis = data.get('analysis')
+
+    if not user_message and not data.get('image'):
+        return jsonify({'error': 'No message or image provided'}), 400
+    session_id = start_session(data, request.cookies.get(Config.CHAT_SESSION_COOKIE))
+    turn = ChatTurn(session_id, *prepare_prompts(
+        user_message if user_message else "Tell me about this fossil",
+        build_system_prompt(analysis)))
+    try:
+        turn.admit()
+    except SchedulerBusy as e:
+        status, body, headers = busy_reply(e)
+        return jsonify(body), status, headers
+
+    response = Response(sse_chat(stream_chat_response(None, turn=turn)),
+                        mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Frees the slot even if the client leaves before the stream starts
+    response.call_on_close(turn.release)
+    return set_session_cookie(response, session_id)
+
+@chat_bp.route('/chat/stats')
+def chat_stats():
+    return jsonify(chat_stats_data(request.cookies.get(Config.CHAT_SESSION_COOKIE)))
@@ -1,11 +1,34 @@
-from flask import Blueprint, render_template, request, jsonify
-from app.models.classifier import FossilClassifier
-from app.routes.chat import chat_bp
+import json
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from flask import Blueprint, Response, render_template, request, jsonify
+from FossilChatBot.simple_chat import stream_chat_response
+from app import log, metrics
+from app.models.classifier import FossilClassifier, BatchQueueFull
+from app.routes.chat import (
+    build_system_prompt, chat_bp, opener_message, set_session_cookie, sse, sse_chat,
+    start_chat_warmup, start_session, watch_chat_metrics)
+from app.timing import timed
+from config.config import Config
 
 main_bp = Blueprint('main', __name__)
 classifier = FossilClassifier()
+decode_pool = ThreadPoolExecutor(Config.BATCH_DECODE_WORKERS,
+                                 thread_name_prefix='fossil-decode')
 
 main_bp.register_blueprint(chat_bp)
+if Config.METRICS_ENABLED:
+    metrics.watch_stages()
+    metrics.watch_cache('prediction', classifier.cache.stats)
+    metrics.watch_cache('near_duplicate', classifier.near_duplicates.stats)
+    watch_chat_metrics()
+    metrics.add_collector(lambda: metrics.family(
+        'fossil_log_records_dropped_total', 'counter',
+        'Log records dropped because the log queue was full.', [], {(): log.dropped()}))
+
+def start_warmup():
+    """Warm the chat caches in the background; create_app() calls this, importing doesn't."""
+    start_chat_warmup(classifier.class_names)
 
 @main_bp.route('/')
 def home():
@@ -22,6 +45,131 @@ def predict():
     
     try:
         result = classifier.predict(file)
-        return jsonify(result)
+        with timed('serialize'):
+            return jsonify(result)
+    except BatchQueueFull as e:
+        return (jsonify({'error': 'Server is busy, please try again shortly'}),
+                429, {'Retry-After': str(e.retry_after)})
     except Exception as e:
         return jsonify({'error': str(e)})
+
+@main_bp.route('/analyze', methods=['POST'])
+def analyze():
+    """Classify an upload and explain it in one request.
+
+    Streams Server-Sent Events: a `result` event with the classification as
+    soon as it is known, then the opening chat answer as /chat/stream does
+    (`token` events, then `done` or `error`) in a fresh chat session.
+    """
+    if 'file' not in request.files:
+        return jsonify({'error': 'No file uploaded'}), 400
+
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({'error': 'No file selected'}), 400
+
+    try:
+        result = classifier.predict(file)
+    except BatchQueueFull as e:
+        return (jsonify({'error': 'Server is busy, please try again shortly'}),
+                429, {'Retry-After': str(e.retry_after)})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+    session_id = start_session({'reset': True}, request.cookies.get(Config.CHAT_SESSION_COOKIE))
+
+    def generate():
+        with timed('serialize'):
+            classification = sse('result', result)
+        yield classification
+        yield from sse_chat(stream_chat_response(
+            opener_message(result),
+            system_prompt=build_system_prompt(result),
+            session_id=session_id
+        ))
+
+    response = Response(generate(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    return set_session_cookie(response, session_id)
+
+@main_bp.route('/predict/stats')
+def predict_stats():
+    stats = {
+        'cache': classifier.cache.stats(),
+        'near_duplicates': classifier.near_duplicates.stats(),
+    }
+    if hasattr(classifier.backend, 'stats'):
+        stats['workers'] = classifier.backend.stats()
+    return jsonify(stats)
+
+@main_bp.route('/metrics')
+def metrics_text():
+    if not Config.METRICS_ENABLED:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+def read_uploads(files):
+    """Return (name, bytes) for every uploaded image, unpacking zip archives.
+
+    The file count and total size are checked before each image is read,
+    so a small archive can't expand into gigabytes of memory. Archive
+    members over MAX_CONTENT_LENGTH are not read; their bytes are None.
+    """
+    uploads = []
+    total = 0
+
+    def admit(size):
+        nonlocal total
+        total += size
+        if len(uploads) >= Config.BATCH_MAX_FILES:
+            raise ValueError(f'At most {Config.BATCH_MAX_FILES} images per batch')
+        if total > Config.BATCH_MAX_BYTES:
+            raise ValueError(
+                f'At most {Config.BATCH_MAX_BYTES // (1024 * 1024)} MB of images per batch')
+
+    for file in files:
+        if not file.filename:
+            continue
+        if zipfile.is_zipfile(file.stream):
+            file.stream.seek(0)
+            with zipfile.ZipFile(file.stream) as archive:
+                for member in archive.infolist():
+                    if member.is_dir():
+                        continue
+                    if member.file_size > Config.MAX_CONTENT_LENGTH:
+                        admit(0)
+                        uploads.append((member.filename, None))
+                        continue
+                    # zipfile never returns more than the declared file_size
+                    admit(member.file_size)
+                    uploads.append((member.filename, archive.read(member)))
+        else:
+            file.stream.seek(0, 2)
+            admit(file.stream.tell())
+            file.stream.seek(0)
+            uploads.append((file.filename, file.read()))
+    return uploads
+
+@main_bp.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    try:
+        uploads = read_uploads(request.files.getlist('files'))
+    except (ValueError, zipfile.BadZipFile) as e:
+        return jsonify({'error': str(e)}), 400
+    if not uploads:
+        return jsonify({'error': 'No files uploaded'}), 400
+
+    def generate():
+        for name, data in uploads:
+            if data is None:
+                yield json.dumps({'file': name, 'error': 'file too large'}) + '\n'
+        futures = {decode_pool.submit(classifier.process_image, data): name
+                   for name, data in uploads if data is not None}
+        try:
+            for name, result in classifier.classify_decoded(futures):
+                yield json.dumps({'file': name, **result}) + '\n'
+        finally:
+            # Client went away: don't keep decoding for nobody.
+            for future in futures:
+                future.cancel()
+
+    return Response(generate(), mimetype='application/x-ndjson')
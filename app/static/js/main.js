@@ -14,6 +14,80 @@ function typeText(element, text, speed = 15) {
     });
 }
 
+// Read a Server-Sent Events response, calling onEvent(event, payload) per message
+async function readEvents(response, onEvent) {
+    if (!response.ok) {
+        const data = await response.json();
+        throw new Error(data.error || response.statusText);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const message = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            let event = 'message';
+            let data = '';
+            for (const line of message.split('\n')) {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            }
+            onEvent(event, JSON.parse(data));
+        }
+    }
+}
+
+// Render chat `token` events into a bubble; `error` events are thrown
+function chatRenderer(bubble) {
+    const text = document.createElement('span');
+    let started = false;
+    return {
+        handle(event, payload) {
+            if (event === 'token') {
+                if (!started) {
+                    bubble.innerHTML = `<span class="chat-sender">FossilFinder</span>`;
+                    bubble.appendChild(text);
+                    started = true;
+                }
+                text.textContent += payload.text;
+                bubble.parentElement.scrollTop = bubble.parentElement.scrollHeight;
+            } else if (event === 'error') {
+                throw new Error(payload.error);
+            }
+        },
+        finish() {
+            if (!started) {
+                bubble.innerHTML = `<span class="chat-sender">FossilFinder</span>I couldn't generate a response. Please try again.`;
+            }
+        }
+    };
+}
+
+function showChatError(bubble, err) {
+    bubble.innerHTML = `<span class="chat-sender">FossilFinder</span>⚠️ Error: ${err.message}`;
+    bubble.classList.add('error');
+}
+
+// Stream a /chat/stream reply into a chat bubble as Server-Sent Events arrive
+async function streamChat(body, bubble) {
+    const response = await fetch('/chat/stream', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(body)
+    });
+    const chat = chatRenderer(bubble);
+    await readEvents(response, (event, payload) => chat.handle(event, payload));
+    chat.finish();
+}
+
 document.addEventListener('DOMContentLoaded', function() {
     const fileInput = document.getElementById('file-input');
     const preview = document.getElementById('preview');
@@ -80,43 +154,57 @@ document.addEventListener('DOMContentLoaded', function() {
         fossilInfo.style.display = 'none';
         chatInterface.style.display = 'none';
 
+        // One request: the classification arrives first, then the
+        // explanation streams into the chat as it is generated.
+        let botMessage = null;
         try {
             const formData = new FormData();
             formData.append('file', file);
 
-            const response = await fetch('/predict', {
+            const response = await fetch('/analyze', {
                 method: 'POST',
                 body: formData
             });
-            const data = await response.json();
+            let chat = null;
+            let chatError = null;
+            await readEvents(response, (event, payload) => {
+                if (event === 'result') {
+                    currentAnalysis = payload; // Store for chat context
+                    const roundedConfidence = Math.round(payload.confidence);
+                    typeText(result, `Identified as: ${payload.class} (${roundedConfidence}% confidence)`);
+                    result.className = 'success';
 
-            if (data.error) {
-                await typeText(result, 'Error: ' + data.error);
-                result.className = 'error';
-            } else {
-                currentAnalysis = data; // Store for chat context
-                const roundedConfidence = Math.round(data.confidence);
-                await typeText(result, `Identified as: ${data.class} (${roundedConfidence}% confidence)`);
-                result.className = 'success';
-
-                // Show chat interface
-                chatInterface.style.display = 'block';
-                
-                // Automatically send initial analysis to chat
-                setTimeout(() => {
-                    simulateInitialChat(data.class, roundedConfidence);
-                }, 500);
+                    // Show chat interface
+                    chatInterface.style.display = 'block';
+                    botMessage = startInitialChat();
+                    chat = chatRenderer(botMessage);
+                } else if (chat && !chatError) {
+                    try {
+                        chat.handle(event, payload);
+                    } catch (err) {
+                        chatError = err;
+                    }
+                }
+            });
+            if (chatError) {
+                showChatError(botMessage, chatError);
+            } else if (chat) {
+                chat.finish();
             }
         } catch (error) {
-            await typeText(result, 'Error: ' + error.message);
-            result.className = 'error';
+            if (botMessage) {
+                showChatError(botMessage, error);
+            } else {
+                await typeText(result, 'Error: ' + error.message);
+                result.className = 'error';
+            }
         } finally {
             analyzeBtn.disabled = false;
         }
     });
 
-    // Simulate initial chat message with analysis
-    async function simulateInitialChat(fossilType, confidence) {    
+    // Bubble the opening answer about a new analysis streams into
+    function startInitialChat() {
         chatResult.innerHTML = ''; // Clear any previous content
 
         const botLoading = document.createElement('div');
@@ -124,28 +212,7 @@ document.addEventListener('DOMContentLoaded', function() {
         botLoading.innerHTML = `<span class="chat-sender">FossilFinder</span>Thinking...`;
         chatResult.appendChild(botLoading);
         chatResult.scrollTop = chatResult.scrollHeight;
-
-        try {
-            const response = await fetch('/chat', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ 
-                    message: `Class: ${fossilType}, Accuracy: ${confidence}%`,
-                    analysis: currentAnalysis 
-                })
-            });
-
-            const data = await response.json();
-            if (data.error) {
-                botLoading.innerHTML = `<span class="chat-sender">FossilFinder</span>❌ ${data.error}`;
-                botLoading.classList.add('error');
-            } else {
-                botLoading.innerHTML = `<span class="chat-sender">FossilFinder</span>${data.response}`;
-            }
-        } catch (err) {
-            botLoading.innerHTML = `<span class="chat-sender">FossilFinder</span>⚠️ Error: ${err.message}`;
-            botLoading.classList.add('error');
-        }
+        return botLoading;
     }
 
     // Chat functionality
@@ -169,25 +236,12 @@ document.addEventListener('DOMContentLoaded', function() {
         chatResult.scrollTop = chatResult.scrollHeight;
 
         try {
-            const response = await fetch('/chat', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ 
-                    message: message,
-                    analysis: currentAnalysis 
-                })
-            });
-
-            const data = await response.json();
-            if (data.error) {
-                botMessage.innerHTML = `<span class="chat-sender">FossilFinder</span>❌ ${data.error}`;
-                botMessage.classList.add('error');
-            } else {
-                botMessage.innerHTML = `<span class="chat-sender">FossilFinder</span>${data.response}`;
-            }
+            await streamChat({
+                message: message,
+                analysis: currentAnalysis
+            }, botMessage);
         } catch (err) {
-            botMessage.innerHTML = `<span class="chat-sender">FossilFinder</span>⚠️ Error: ${err.message}`;
-            botMessage.classList.add('error');
+            showChatError(botMessage, err);
         }
 
         chatResult.scrollTop = chatResult.scrollHeight;
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Benchmark the /predict hot path with a per-stage latency breakdown.
+
+Runs the reference images in app/static/images plus synthetic JPEG and PNG
+uploads of several sizes through the Flask test client at increasing
+concurrency, and reports p50/p95/p99 for upload read, decode, resize,
+inference and response serialization, plus end-to-end latency and
+throughput. Results are written as JSON so runs can be diffed between
+commits.
+
+If the configured model cannot be loaded (the repo only ships a Git LFS
+pointer) a same-shaped stand-in model is built instead.
+
+Usage: python benchmark.py [--concurrency 1 2 4 8] [-o benchmark.json]
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from app import timing
+from config.config import Config
+
+IMAGE_DIR = os.path.join('app', 'static', 'images')
+SYNTHETIC_MEGAPIXELS = [0.5, 2, 8, 20]
+STAGES = ['read', 'decode', 'resize', 'queue', 'inference', 'serialize']
+
+
+def build_stand_in_model(path):
+    """
+    Save an untrained MobileNetV2 with the classifier's input and output shape.
+    """
+    import tensorflow as tf
+
+    model = tf.keras.applications.MobileNetV2(
+        input_shape=(224, 224, 3), weights=None, classes=6)
+    model.save(path)
+    return path
+
+
+def resolve_model(model_path, force_stand_in, scratch_dir):
+    """
+    Return (path, is_stand_in): the configured model if it loads, else a
+    stand-in saved in scratch_dir.
+    """
+    if not force_stand_in:
+        try:
+            import tensorflow as tf
+            tf.keras.models.load_model(model_path)
+            return model_path, False
+        except Exception as e:
+            print(f"Cannot load {model_path} ({e.__class__.__name__}); using a stand-in model.")
+    path = os.path.join(scratch_dir, 'stand_in.h5')
+    return build_stand_in_model(path), True
+
+
+def synthetic_image(megapixels, fmt, seed):
+    """
+    A photo-like test image: smooth gradients plus sensor-style noise.
+    """
+    rng = np.random.default_rng(seed)
+    width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    base = rng.integers(0, 256, (height // 64 + 2, width // 64 + 2, 3), dtype=np.uint8)
+    img = Image.fromarray(base).resize((width, height), Image.BICUBIC)
+    noise = rng.normal(0, 6, (height, width, 3))
+    pixels = np.clip(np.asarray(img, dtype=np.float32) + noise, 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, fmt, **({'quality': 90} if fmt == 'JPEG' else {}))
+    return buffer.getvalue()
+
+
+def load_uploads():
+    """
+    Return (name, bytes) for the reference images and the synthetic sizes.
+    """
+    uploads = []
+    for name in sorted(os.listdir(IMAGE_DIR)):
+        with open(os.path.join(IMAGE_DIR, name), 'rb') as f:
+            uploads.append((name, f.read()))
+    for i, megapixels in enumerate(SYNTHETIC_MEGAPIXELS):
+        for fmt in ('JPEG', 'PNG'):
+            name = f"synthetic_{megapixels}mp.{fmt.lower()}"
+            uploads.append((name, synthetic_image(megapixels, fmt, seed=i)))
+    return uploads
+
+
+def percentiles(samples_ms):
+    if not samples_ms:
+        return None
+    p50, p95, p99 = np.percentile(samples_ms, [50, 95, 99])
+    return {'count': len(samples_ms), 'p50': round(float(p50), 3),
+            'p95': round(float(p95), 3), 'p99': round(float(p99), 3)}
+
+
+def run_level(app, uploads, concurrency, requests_per_level):
+    """
+    Fire requests at one concurrency level and collect per-stage timings.
+    """
+    stages = defaultdict(list)
+    lock = threading.Lock()
+
+    def listener(stage, seconds):
+        with lock:
+            stages[stage].append(seconds * 1000)
+
+    def one(i):
+        name, data = uploads[i % len(uploads)]
+        client = app.test_client()
+        start = time.perf_counter()
+        response = client.post('/predict', data={'file': (io.BytesIO(data), name)})
+        elapsed = (time.perf_counter() - start) * 1000
+        body = response.get_json(silent=True)
+        if response.status_code != 200 or not body or 'error' in body:
+            raise RuntimeError(f"{name}: HTTP {response.status_code} "
+                               f"{response.get_data(as_text=True)[:200]!r}")
+        return elapsed
+
+    timing.add_listener(listener)
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(one, range(requests_per_level)))
+        wall = time.perf_counter() - start
+    finally:
+        timing.remove_listener(listener)
+
+    return {
+        'requests': requests_per_level,
+        'throughput_rps': round(requests_per_level / wall, 2),
+        'end_to_end_ms': percentiles(results),
+        'stages_ms': {stage: percentiles(stages[stage]) for stage in STAGES},
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--model', default=Config.MODEL_PATH)
+    parser.add_argument('--stand-in', action='store_true',
+                        help='always benchmark a stand-in model')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--requests', type=int, default=100,
+                        help='requests per concurrency level')
+    parser.add_argument('--with-caches', action='store_true',
+                        help='keep the prediction and near-duplicate caches enabled')
+    parser.add_argument('-o', '--output', default='benchmark.json')
+    args = parser.parse_args()
+
+    # The stand-in model must outlive the run: the classifier re-stats it
+    # on every request.
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        run(args, scratch_dir)
+
+
+def run(args, scratch_dir):
+    model_path, stand_in = resolve_model(args.model, args.stand_in, scratch_dir)
+    # The classifier is built from Config when the routes are imported.
+    Config.MODEL_PATH = model_path
+    Config.INFERENCE_BACKEND = 'keras'
+    if not args.with_caches:
+        Config.PREDICTION_CACHE_SIZE = 0
+        Config.PREDICTION_CACHE_PATH = None
+        Config.PHASH_MAX_DISTANCE = -1
+    uploads = load_uploads()
+    # The largest synthetic PNGs exceed the production upload limit; a 413
+    # would only measure the rejection.
+    Config.MAX_CONTENT_LENGTH = max(Config.MAX_CONTENT_LENGTH,
+                                    max(len(data) for _, data in uploads) + 1024 * 1024)
+    from app import create_app
+    # Background Ollama generations would compete with the measured requests.
+    app = create_app(warm_up=False)
+
+    print(f"{len(uploads)} uploads, {args.requests} requests per level")
+    levels = {}
+    for concurrency in args.concurrency:
+        levels[str(concurrency)] = result = run_level(app, uploads, concurrency, args.requests)
+        stages = '  '.join(f"{stage} {result['stages_ms'][stage]['p50']:.1f}"
+                           for stage in STAGES if result['stages_ms'][stage])
+        print(f"c={concurrency:<3} {result['throughput_rps']:>7.1f} req/s  "
+              f"p50 {result['end_to_end_ms']['p50']:.1f} ms  "
+              f"p99 {result['end_to_end_ms']['p99']:.1f} ms  | p50 {stages}")
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'model': 'stand-in' if stand_in else model_path,
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'caches': args.with_caches,
+            'uploads': [{'name': name, 'bytes': len(data)} for name, data in uploads],
+        },
+        'concurrency': levels,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Load-test the chat path end to end.
+
+Drives the Flask /chat/stream or /chat route through the test client, or
+OllamaClient directly, at increasing concurrency, and reports time to
+first token, per-request token rate, p50/p95/p99 end-to-end latency and
+failures per level. Results are written as JSON so runs can be diffed
+between commits.
+
+Unless --ollama points at a running server, an in-process
+FossilChatBot.fake_ollama stand-in is started with the --fake-* settings.
+
+Usage: python chat_load_test.py [--target stream|chat|client]
+       [--concurrency 1 4 16] [-o chat_load_test.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import FossilChatBot.config as chat_config
+from benchmark import git_commit, percentiles
+from config.config import Config
+
+TARGETS = ['stream', 'chat', 'client']
+FAKE_PORT = 11499
+FAKE_SETTINGS = ['ttft', 'tokens_per_second', 'tokens', 'error_rate', 'error_mode', 'parallel']
+
+
+def chat_app():
+    """A Flask app with just the chat routes, so no classifier model is loaded."""
+    from flask import Flask
+    from app.routes.chat import chat_bp
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.register_blueprint(chat_bp)
+    return app
+
+
+def run_stream(app_client, message):
+    """POST /chat/stream and time the SSE token events."""
+    start = time.perf_counter()
+    response = app_client.post('/chat/stream', json={'message': message}, buffered=False)
+    if response.status_code != 200:
+        response.close()
+        return {'error': f'http_{response.status_code}'}
+    stamps, error = [], None
+    try:
+        for chunk in response.response:
+            chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+            if chunk.startswith('event: token'):
+                stamps.append(time.perf_counter())
+            elif chunk.startswith('event: error'):
+                error = 'error_event'
+    finally:
+        response.close()
+    return {'start': start, 'stamps': stamps, 'end': time.perf_counter(), 'error': error}
+
+
+def run_chat(app_client, message):
+    """POST /chat; the reply arrives whole, so only end-to-end time is known."""
+    start = time.perf_counter()
+    response = app_client.post('/chat', json={'message': message})
+    end = time.perf_counter()
+    if response.status_code != 200:
+        return {'error': f'http_{response.status_code}'}
+    reply = response.get_json()['response']
+    failed = reply.startswith(('Error processing', "I couldn't generate"))
+    return {'start': start, 'stamps': [], 'end': end, 'error': 'error_reply' if failed else None}
+
+
+def run_client(ollama, message, session):
+    """Stream straight from OllamaClient, bypassing Flask and the scheduler."""
+    start = time.perf_counter()
+    stamps = []
+    for event in ollama.generate(message, stream=True, context=[], request_id=session):
+        if event.get('response'):
+            stamps.append(time.perf_counter())
+    return {'start': start, 'stamps': stamps, 'end': time.perf_counter(), 'error': None}
+
+
+def summarize(results, wall):
+    ok = [r for r in results if not r['error']]
+    ttft = [(r['stamps'][0] - r['start']) * 1000 for r in ok if r['stamps']]
+    rates = [(len(r['stamps']) - 1) / (r['stamps'][-1] - r['stamps'][0])
+             for r in ok if len(r['stamps']) > 1 and r['stamps'][-1] > r['stamps'][0]]
+    tokens = sum(len(r['stamps']) for r in ok)
+    return {
+        'requests': len(results),
+        'failures': len(results) - len(ok),
+        'failure_kinds': dict(Counter(r['error'] for r in results if r['error'])),
+        'throughput_rps': round(len(results) / wall, 2),
+        'tokens_per_second': round(tokens / wall, 1),
+        'ttft_ms': percentiles(ttft),
+        'request_tokens_per_second': percentiles(rates),
+        'end_to_end_ms': percentiles([(r['end'] - r['start']) * 1000 for r in ok]),
+    }
+
+
+def run_level(target, make_client, concurrency, requests_per_level, turns):
+    """
+    Run conversations of `turns` messages, `concurrency` at a time.
+    """
+    conversations = -(-requests_per_level // turns)
+    results = []
+    lock = threading.Lock()
+
+    def conversation(i):
+        client = make_client()
+        for turn in range(turns):
+            message = f'Tell me more about fossil {i}, part {turn + 1}.'
+            try:
+                if target == 'stream':
+                    result = run_stream(client, message)
+                elif target == 'chat':
+                    result = run_chat(client, message)
+                else:
+                    result = run_client(client, message, f'load-{i}')
+            except Exception as e:
+                result = {'error': str(e).split(':')[0] or type(e).__name__}
+            with lock:
+                results.append(result)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(conversation, range(conversations)))
+    return summarize(results, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--target', choices=TARGETS, default='stream')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--requests', type=int, default=50, help='messages per concurrency level')
+    parser.add_argument('--turns', type=int, default=1, help='messages per conversation')
+    parser.add_argument('--ollama', nargs='+', help='Ollama API URL(s); default: start a fake')
+    parser.add_argument('--max-in-flight', type=int,
+                        help='override the chat scheduler limit (Flask targets)')
+    parser.add_argument('--with-caches', action='store_true',
+                        help='keep the prefix and response caches enabled')
+    parser.add_argument('--fake-ttft', type=float, default=0.5)
+    parser.add_argument('--fake-tokens-per-second', type=float, default=20)
+    parser.add_argument('--fake-tokens', type=int, default=120)
+    parser.add_argument('--fake-error-rate', type=float, default=0.0)
+    parser.add_argument('--fake-error-mode', choices=['status', 'stream'], default='status')
+    parser.add_argument('--fake-parallel', type=int, default=0)
+    parser.add_argument('-o', '--output', default='chat_load_test.json')
+    args = parser.parse_args()
+
+    fake = None
+    urls = args.ollama
+    if not urls:
+        from FossilChatBot.fake_ollama import FakeOllama
+        fake = FakeOllama(
+            ttft=args.fake_ttft,
+            tokens_per_second=args.fake_tokens_per_second,
+            tokens=args.fake_tokens,
+            error_rate=args.fake_error_rate,
+            error_mode=args.fake_error_mode,
+            parallel=args.fake_parallel,
+            seed=0,
+        )
+        urls = [fake.start(port=FAKE_PORT)]
+
+    # The chat modules read these when they are imported.
+    chat_config.OLLAMA_API_URLS = urls
+    if args.max_in_flight:
+        chat_config.MAX_IN_FLIGHT = args.max_in_flight
+    if not args.with_caches:
+        chat_config.PREFIX_CACHE_SIZE = 0
+        chat_config.RESPONSE_CACHE_SIZE = 0
+
+    if args.target == 'client':
+        from FossilChatBot.ollama_client import OllamaClient
+        ollama = OllamaClient(urls)
+        make_client = lambda: ollama
+    else:
+        app = chat_app()
+        make_client = app.test_client
+
+    print(f"{args.target}: {args.requests} messages per level, {args.turns} per conversation")
+    levels = {}
+    for concurrency in args.concurrency:
+        levels[str(concurrency)] = result = run_level(
+            args.target, make_client, concurrency, args.requests, args.turns)
+        ttft = result['ttft_ms']['p50'] if result['ttft_ms'] else float('nan')
+        e2e = result['end_to_end_ms'] or {'p95': float('nan'), 'p99': float('nan')}
+        print(f"c={concurrency:<3} {result['throughput_rps']:>6.1f} req/s  "
+              f"{result['tokens_per_second']:>7.1f} tok/s  ttft p50 {ttft:.0f} ms  "
+              f"e2e p95 {e2e['p95']:.0f} p99 {e2e['p99']:.0f} ms  "
+              f"failures {result['failures']}")
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'target': args.target,
+            'ollama': urls,
+            'fake': {key: getattr(fake, key) for key in FAKE_SETTINGS} if fake else None,
+            'turns': args.turns,
+            'caches': args.with_caches,
+            'max_in_flight': chat_config.MAX_IN_FLIGHT,
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+        },
+        'concurrency': levels,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
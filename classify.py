@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Bulk-classify a directory tree of fossil photos.
+
+Images are decoded in a process pool, classified in large batches and
+written incrementally to JSONL or CSV (chosen by the output extension).
+Classified files are recorded in a checkpoint so an interrupted run can be
+restarted with the same arguments and picks up where it left off. Files
+that failed get an error row but no checkpoint entry; a rerun drops those
+rows from the output and retries the files, so every path ends up with
+one row.
+
+Usage: python classify.py PHOTO_DIR [-o results.jsonl] [--batch-size 64]
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from app.models.preprocessing import process_file
+from config.config import Config
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tif', '.tiff', '.webp'}
+
+
+def find_images(root):
+    """
+    Walk a directory tree and return image paths relative to it, sorted.
+    """
+    paths = []
+    for directory, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if os.path.splitext(filename)[1].lower() in IMAGE_EXTENSIONS:
+                path = os.path.join(directory, filename)
+                paths.append(os.path.relpath(path, root))
+    return paths
+
+
+def load_checkpoint(path):
+    """
+    Return the set of files a previous run already classified.
+    """
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding='utf-8') as f:
+        return {line.rstrip('\n') for line in f if line.strip()}
+
+
+def drop_unfinished_rows(output_path, done):
+    """
+    Remove result rows for files not in the checkpoint: error rows of files
+    about to be retried, and rows written just before a crash.
+    """
+    if not os.path.exists(output_path):
+        return
+    is_csv = output_path.lower().endswith('.csv')
+    with open(output_path, encoding='utf-8', newline='') as f:
+        if is_csv:
+            rows = list(csv.reader(f))
+            header, rows = rows[:1], rows[1:]
+            kept = [row for row in rows if row and row[0] in done]
+        else:
+            rows = f.readlines()
+            kept = []
+            for line in rows:
+                try:
+                    if json.loads(line)['path'] in done:
+                        kept.append(line)
+                except (ValueError, KeyError):
+                    pass  # a line cut short by a crash
+    if len(kept) == len(rows):
+        return
+    partial = output_path + '.tmp'
+    with open(partial, 'w', encoding='utf-8', newline='') as f:
+        if is_csv:
+            csv.writer(f).writerows(header + kept)
+        else:
+            f.writelines(kept)
+    os.replace(partial, output_path)
+
+
+class ResultWriter:
+    """
+    Appends results to JSONL or CSV and records classified files in the checkpoint.
+    """
+
+    def __init__(self, output_path, checkpoint_path, class_names):
+        self.class_names = class_names
+        self.csv = output_path.lower().endswith('.csv')
+        is_new = not os.path.exists(output_path) or os.path.getsize(output_path) == 0
+        self.output = open(output_path, 'a', encoding='utf-8', newline='')
+        self.checkpoint = open(checkpoint_path, 'a', encoding='utf-8')
+        if self.csv:
+            self.writer = csv.writer(self.output)
+            if is_new:
+                self.writer.writerow(['path', 'class', 'confidence', *class_names, 'error'])
+
+    def write(self, path, result):
+        if self.csv:
+            probabilities = result.get('probabilities', {})
+            self.writer.writerow([
+                path, result.get('class', ''), result.get('confidence', ''),
+                *[probabilities.get(name, '') for name in self.class_names],
+                result.get('error', ''),
+            ])
+        else:
+            self.output.write(json.dumps({'path': path, **result}) + '\n')
+
+    def commit(self, paths):
+        # Results hit the disk before their checkpoint entries, so a crash
+        # can at worst repeat a row, never lose one.
+        self.output.flush()
+        os.fsync(self.output.fileno())
+        self.checkpoint.write(''.join(path + '\n' for path in paths))
+        self.checkpoint.flush()
+
+    def close(self):
+        self.output.close()
+        self.checkpoint.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('root', help='directory to classify recursively')
+    parser.add_argument('-o', '--output', default='results.jsonl',
+                        help='results file; .csv writes CSV, anything else JSONL')
+    parser.add_argument('--checkpoint', help='defaults to OUTPUT.checkpoint')
+    parser.add_argument('--model', help='defaults to the configured backend model')
+    parser.add_argument('--backend', choices=['keras', 'tflite'],
+                        default=Config.INFERENCE_BACKEND)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    checkpoint_path = args.checkpoint or args.output + '.checkpoint'
+    done = load_checkpoint(checkpoint_path)
+    drop_unfinished_rows(args.output, done)
+    paths = [path for path in find_images(args.root) if path not in done]
+    print(f"{len(done)} images already done, {len(paths)} to classify.")
+    if not paths:
+        return
+
+    # Imported here so spawned decode workers never load TensorFlow.
+    from app.models.classifier import FossilClassifier
+    # The classifier's batcher is sized from Config when it is built.
+    Config.BATCH_MAX_SIZE = args.batch_size
+    classifier = FossilClassifier(args.model, args.backend)
+    writer = ResultWriter(args.output, checkpoint_path, classifier.class_names)
+
+    # spawn rather than fork: forking a process with TensorFlow loaded is unsafe.
+    context = multiprocessing.get_context('spawn')
+    chunks = [paths[i:i + args.batch_size] for i in range(0, len(paths), args.batch_size)]
+    processed = failed = 0
+    start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(args.workers, mp_context=context) as pool:
+            def submit(chunk):
+                return {pool.submit(process_file, os.path.join(args.root, path)): path
+                        for path in chunk}
+
+            # Keep the next chunk decoding while the current one is classified.
+            window = submit(chunks[0])
+            for next_chunk in chunks[1:] + [None]:
+                next_window = submit(next_chunk) if next_chunk else None
+                finished = []
+                for path, result in classifier.classify_decoded(
+                        window, with_probabilities=True):
+                    writer.write(path, result)
+                    if 'error' in result:
+                        failed += 1
+                    else:
+                        finished.append(path)
+                    processed += 1
+                writer.commit(finished)
+                rate = processed / (time.perf_counter() - start)
+                print(f"\r{processed}/{len(paths)} images, {rate:.1f} images/s",
+                      end='', file=sys.stderr, flush=True)
+                window = next_window
+    except KeyboardInterrupt:
+        print("\nInterrupted; rerun the same command to resume.", file=sys.stderr)
+        sys.exit(130)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"\nClassified {processed} images in {elapsed:.1f}s "
+          f"({processed / elapsed:.1f} images/s).", file=sys.stderr)
+    if failed:
+        print(f"{failed} images failed; rerun the same command to retry them.",
+              file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
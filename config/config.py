@@ -1,4 +1,61 @@
 class Config:
     SECRET_KEY = 'your-secret-key-here'
     UPLOAD_FOLDER = 'uploads'
-    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
\ No newline at end of file
+    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+    MODEL_PATH = 'models/fossil_classifier.h5'
+
+    # Inference backend: 'keras' runs MODEL_PATH on TensorFlow, 'tflite' runs
+    # TFLITE_MODEL_PATH (see export_model.py) on the TFLite interpreter
+    INFERENCE_BACKEND = 'keras'
+    TFLITE_MODEL_PATH = 'models/fossil_classifier_float16.tflite'
+    INFERENCE_THREADS = None                # threads per backend; None lets the runtime decide
+
+    # Multi-process inference; 0 runs the backend inside the web process
+    INFERENCE_WORKERS = 0
+    INFERENCE_WORKER_SLOTS = 2              # shared-memory batch slots per worker
+    INFERENCE_CPU_AFFINITY = None           # None, 'auto' or one list of CPU ids per worker
+
+    # Micro-batching of /predict inference
+    BATCH_MAX_SIZE = 16        # images per forward pass
+    BATCH_MAX_WAIT_MS = 10     # how long the first image waits for company
+    BATCH_QUEUE_DEPTH = 64     # queued images before /predict answers 429
+    BATCH_RETRY_AFTER = 1      # Retry-After (seconds) sent with a 429
+
+    # Prediction cache in front of FossilClassifier.predict
+    PREDICTION_CACHE_SIZE = 1024            # entries kept in memory (0 disables)
+    PREDICTION_CACHE_TTL = 60 * 60          # seconds a memory entry stays valid
+    PREDICTION_CACHE_PATH = None            # SQLite file for a persistent tier
+    PREDICTION_CACHE_DISK_SIZE = 100000     # entries kept on disk
+
+    # Near-duplicate lookup on a perceptual hash of the resized image
+    PHASH_MAX_DISTANCE = 4                  # differing bits (of 64) for the same photo; -1 disables
+    PHASH_INDEX_SIZE = 50000                # hashes remembered before the oldest are evicted
+    PHASH_MIN_STDDEV = 5.0                  # gray-level spread below which an image is too flat to hash
+
+    # Multi-image /predict/batch endpoint
+    BATCH_DECODE_WORKERS = 4                # threads decoding uploads in parallel
+    BATCH_MAX_FILES = 500                   # images accepted per request (zip members included)
+    BATCH_MAX_BYTES = 256 * 1024 * 1024     # uncompressed bytes accepted per request
+
+    # Web chat (session store and caches are configured in FossilChatBot/config.py)
+    CHAT_SESSION_COOKIE = 'fossil_chat'     # cookie holding the chat session id
+    CHAT_PREWARM_OPENERS = True             # pre-generate the first answer per class and confidence band
+
+    # Logging (app/log.py): JSON lines on stderr, written by a background thread
+    LOG_LEVEL = 'INFO'
+    LOG_DEBUG_SAMPLE_RATE = 0.01            # share of requests whose DEBUG records are kept
+    LOG_QUEUE_SIZE = 10000                  # records buffered before new ones are dropped
+
+    # On-demand profiling (app/profiling.py): collapsed stacks for flamegraph.pl or speedscope
+    PROFILE_TOKEN = None                    # secret for X-Profile / ?profile= and /profiles; None disables them
+    PROFILE_SAMPLE_RATE = 0.0               # share of all requests profiled anyway
+    PROFILE_INTERVAL_MS = 5                 # stack sampling period
+    PROFILE_DIR = 'profiles'
+    PROFILE_MAX_FILES = 100                 # oldest profiles are deleted past this
+
+    # Prometheus text-format /metrics on the Flask app and the asyncio chat server
+    METRICS_ENABLED = True
+
+    # Asyncio chat server (python -m app.async_chat) for /chat and /chat/stream
+    ASYNC_CHAT_HOST = '127.0.0.1'
+    ASYNC_CHAT_PORT = 5001
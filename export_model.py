@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Export the Keras fossil classifier to quantized TFLite models and compare them.
+
+The exported graph is the same uint8 inference function the Keras backend
+serves, so the TFLite models take raw pixels. int8 post-training quantization
+is calibrated on the reference images in app/static/images.
+
+Usage: python export_model.py [--quantize float16 int8] [--report report.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from app.models.backends import KerasBackend, TFLiteBackend, build_inference_fn
+from app.models.preprocessing import IMAGE_SIZE, process_file
+from config.config import Config
+
+CALIBRATION_DIR = os.path.join('app', 'static', 'images')
+
+
+def load_images(directory):
+    """
+    Decode every image in a directory into a (N, 224, 224, 3) uint8 array.
+    """
+    names = sorted(os.listdir(directory))
+    return names, np.concatenate([process_file(os.path.join(directory, name))
+                                  for name in names])
+
+
+def convert(model, quantization, calibration):
+    """
+    Convert a Keras model to TFLite bytes with the given quantization.
+    """
+    # Going through a Keras export archive keeps the model variables
+    # resolvable for the converter, which from_concrete_functions cannot do.
+    archive = tf.keras.export.ExportArchive()
+    archive.track(model)
+    archive.add_endpoint('serve', build_inference_fn(model, IMAGE_SIZE))
+    # The converter reads the SavedModel during convert(), so the directory
+    # has to outlive it.
+    with tempfile.TemporaryDirectory() as saved_model_dir:
+        archive.write_out(saved_model_dir)
+        converter = tf.lite.TFLiteConverter.from_saved_model(saved_model_dir)
+        if quantization == 'float16':
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+            converter.target_spec.supported_types = [tf.float16]
+        elif quantization == 'int8':
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+            converter.representative_dataset = lambda: (
+                [image[np.newaxis]] for image in calibration)
+        elif quantization != 'none':
+            raise ValueError(f"Unknown quantization '{quantization}'")
+        return converter.convert()
+
+
+def latency_ms(backend, images, batch_size, repeats=20):
+    """
+    Median latency of one predict() call on a batch of the given size.
+    """
+    batch = np.resize(images, (batch_size, *images.shape[1:]))
+    backend.predict(batch)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        backend.predict(batch)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def compare(backends, images):
+    """
+    Accuracy parity against the Keras backend plus latency for each backend.
+    """
+    reference = backends['keras'][0].predict(images)
+    report = {}
+    for name, (backend, path) in backends.items():
+        probabilities = backend.predict(images) if name != 'keras' else reference
+        report[name] = {
+            'model_bytes': os.path.getsize(path),
+            'top1_agreement': float(np.mean(
+                np.argmax(probabilities, 1) == np.argmax(reference, 1))),
+            'max_abs_diff': float(np.max(np.abs(probabilities - reference))),
+            'latency_ms_batch_1': latency_ms(backend, images, 1),
+            'latency_ms_batch_16': latency_ms(backend, images, 16),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--model', default=Config.MODEL_PATH)
+    parser.add_argument('--quantize', nargs='+', default=['float16', 'int8'],
+                        choices=['none', 'float16', 'int8'])
+    parser.add_argument('--calibration', default=CALIBRATION_DIR)
+    parser.add_argument('--output-dir', default='models')
+    parser.add_argument('--report', help='write the comparison as JSON to this file')
+    args = parser.parse_args()
+
+    keras_backend = KerasBackend(args.model, IMAGE_SIZE)
+    names, images = load_images(args.calibration)
+    print(f"Calibrating on {len(names)} images from {args.calibration}")
+
+    backends = {'keras': (keras_backend, args.model)}
+    stem = os.path.splitext(os.path.basename(args.model))[0]
+    for quantization in args.quantize:
+        path = os.path.join(args.output_dir, f"{stem}_{quantization}.tflite")
+        with open(path, 'wb') as f:
+            f.write(convert(keras_backend.model, quantization, images))
+        print(f"Wrote {path}")
+        backends[quantization] = (TFLiteBackend(path, Config.INFERENCE_THREADS, Config.BATCH_MAX_SIZE), path)
+
+    report = compare(backends, images)
+    print(f"\n{'backend':<10}{'size KB':>10}{'top-1 agree':>13}{'max diff':>11}"
+          f"{'ms @1':>9}{'ms @16':>9}")
+    for name, row in report.items():
+        print(f"{name:<10}{row['model_bytes'] / 1024:>10.0f}{row['top1_agreement']:>13.1%}"
+              f"{row['max_abs_diff']:>11.4f}{row['latency_ms_batch_1']:>9.2f}"
+              f"{row['latency_ms_batch_16']:>9.2f}")
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.report}")
+
+
+if __name__ == '__main__':
+    main()
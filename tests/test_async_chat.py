@@ -0,0 +1,113 @@
+import asyncio
+import json
+import socket
+import time
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from app import async_chat
+from FossilChatBot.async_ollama_client import AsyncOllamaClient
+from FossilChatBot.fake_ollama import FILLER, FakeOllama
+from FossilChatBot.simple_chat import prefix_cache, scheduler, session_store
+from config.config import Config
+
+TOKENS = 20
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope='module')
+def fake():
+    fake = FakeOllama(ttft=0.01, tokens_per_second=500, tokens=TOKENS, seed=0)
+    fake.api_url = fake.start(port=free_port())
+    return fake
+
+
+@pytest.fixture
+def serve(fake, monkeypatch):
+    """Runs a test coroutine against the async chat app, talking to the fake."""
+    monkeypatch.setattr(async_chat, 'AsyncOllamaClient', lambda: AsyncOllamaClient(fake.api_url))
+    # Prefix builds go to the sync client and would take scheduler slots
+    monkeypatch.setattr(prefix_cache, 'max_entries', 0)
+
+    def run(test):
+        async def main():
+            async with TestClient(TestServer(async_chat.create_async_app())) as client:
+                await test(client)
+        asyncio.run(main())
+    return run
+
+
+def parse_sse(body):
+    events = []
+    for message in body.strip().split('\n\n'):
+        name, data = message.split('\n')
+        events.append((name[len('event: '):], json.loads(data[len('data: '):])))
+    return events
+
+
+async def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        await asyncio.sleep(0.02)
+
+
+def test_stream_sends_tokens_then_done_and_saves_the_session(fake, serve):
+    generations = fake.generations
+
+    async def test(client):
+        response = await client.post('/chat/stream', json={'message': 'What is a crinoid?'})
+        assert response.status == 200
+        assert response.headers['Content-Type'] == 'text/event-stream'
+        events = parse_sse(await response.text())
+        tokens = [data['text'] for name, data in events if name == 'token']
+        assert ''.join(tokens) == ''.join(FILLER[i % len(FILLER)] + ' ' for i in range(TOKENS))
+        assert events[-1][0] == 'done'
+        assert events[-1][1]['eval_count'] == TOKENS
+
+        session_id = response.cookies[Config.CHAT_SESSION_COOKIE].value
+        assert len(session_store.get(session_id)['turns']) == 1
+        assert scheduler.stats()['in_flight'] == 0
+
+    serve(test)
+    assert fake.generations == generations + 1
+
+
+def test_client_disconnect_cancels_the_generation(fake, serve, monkeypatch):
+    monkeypatch.setattr(fake, 'tokens_per_second', 10)
+    disconnects = fake.disconnects
+
+    async def test(client):
+        response = await client.post('/chat/stream', json={'message': 'Tell me about ammonites'})
+        assert (await response.content.readline()).startswith(b'event: token')
+        response.close()
+        await wait_until(lambda: fake.disconnects == disconnects + 1)
+        await wait_until(lambda: scheduler.stats()['in_flight'] == 0)
+
+    serve(test)
+
+
+def test_full_queue_gets_429_with_retry_after(fake, serve, monkeypatch):
+    monkeypatch.setattr(fake, 'tokens_per_second', 10)
+    monkeypatch.setattr(scheduler, 'max_in_flight', 1)
+    monkeypatch.setattr(scheduler, 'max_queue', 0)
+    rejected = scheduler.rejected
+
+    async def test(client):
+        first = await client.post('/chat/stream', json={'message': 'How old is this trilobite?'})
+        assert (await first.content.readline()).startswith(b'event: token')
+        second = await client.post('/chat', json={'message': 'Is a belemnite a squid?'})
+        assert second.status == 429
+        assert second.headers['Retry-After'] == str(scheduler.retry_after)
+        assert 'error' in await second.json()
+        assert scheduler.rejected == rejected + 1
+        first.close()
+        await wait_until(lambda: scheduler.stats()['in_flight'] == 0)
+
+    serve(test)
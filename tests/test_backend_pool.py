@@ -0,0 +1,121 @@
+import socket
+
+import pytest
+
+from FossilChatBot import ollama_client
+from FossilChatBot.fake_ollama import FakeOllama
+from FossilChatBot.ollama_client import OllamaClient
+
+TOKENS = 10
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_fake(port=None, **kwargs):
+    fake = FakeOllama(ttft=0.01, tokens_per_second=500, tokens=TOKENS, seed=0, **kwargs)
+    return fake, fake.start(port=port or free_port())
+
+
+def in_flight(client):
+    return [node['in_flight'] for node in client.backends.stats()['nodes']]
+
+
+@pytest.fixture(autouse=True)
+def no_probe_thread(monkeypatch):
+    # Tests probe by hand, so health only changes when they say so
+    monkeypatch.setattr(ollama_client, 'HEALTH_CHECK_INTERVAL', 0)
+
+
+@pytest.fixture
+def fakes():
+    return [start_fake() for _ in range(2)]
+
+
+def test_streams_go_to_the_host_with_fewest_in_flight(fakes):
+    (first, first_url), (second, second_url) = fakes
+    client = OllamaClient([first_url, second_url])
+    streams = [client.generate('Hello', stream=True, context=[]) for _ in range(3)]
+    assert in_flight(client) == [2, 1]
+    streams.pop(0).close()
+    assert in_flight(client) == [1, 1]
+    # On a tie, the host that has served fewer requests
+    streams.append(client.generate('Hello', stream=True, context=[]))
+    assert in_flight(client) == [1, 2]
+    for stream in streams:
+        stream.close()
+    assert in_flight(client) == [0, 0]
+    assert (first.generations, second.generations) == (2, 2)
+
+
+def test_sessions_stick_to_their_host(fakes):
+    (first, first_url), (second, second_url) = fakes
+    client = OllamaClient([first_url, second_url])
+    busy = client.generate('Hello', stream=True, context=[], request_id='a')
+    for _ in range(3):
+        # The first host is busier, but session a stays on it
+        client.generate('Hello', context=[], request_id='a')
+        client.generate('Hello', context=[], request_id='b')
+    busy.close()
+    assert (first.generations, second.generations) == (4, 3)
+    sessions = [node['sessions'] for node in client.backends.stats()['nodes']]
+    assert sessions == [1, 1]
+    assert client.backends.stats()['failovers'] == 0
+
+
+def test_unreachable_host_is_marked_down_until_a_probe_passes(fakes):
+    (alive, alive_url), _ = fakes
+    port = free_port()
+    dead_url = f'http://127.0.0.1:{port}/api'
+    client = OllamaClient([dead_url, alive_url])
+
+    assert client.generate('Hello', context=[], request_id='a')
+    dead, _ = client.backends.nodes
+    assert not dead.healthy
+    assert 'Connection' in dead.last_error
+    assert alive.generations == 1
+
+    # Skipped while down, even though it has nothing in flight
+    client.generate('Hello', context=[], request_id='b')
+    assert alive.generations == 2
+    assert client.backends.probe_all() == [False, True]
+
+    revived, _ = start_fake(port=port)
+    assert client.backends.probe_all() == [True, True]
+    client.generate('Hello', context=[], request_id='c')
+    assert revived.generations == 1
+
+
+def test_mark_down_moves_sticky_sessions(fakes):
+    (first, first_url), (second, second_url) = fakes
+    client = OllamaClient([first_url, second_url])
+    client.generate('Hello', context=[], request_id='a')
+    node = client.backends.nodes[0]
+    client.backends.mark_down(node, 'maintenance')
+    client.generate('Hello', context=[], request_id='a')
+    assert (first.generations, second.generations) == (1, 1)
+    assert client.backends.stats()['failovers'] == 1
+    assert node.last_error == 'maintenance'
+    assert client.backends.probe(node)
+    client.generate('Hello', context=[], request_id='c')
+    assert first.generations == 2
+
+
+def test_stream_failing_midway_is_not_retried_on_another_host():
+    failing, failing_url = start_fake(error_rate=1.0, error_mode='stream')
+    healthy, healthy_url = start_fake()
+    client = OllamaClient([failing_url, healthy_url])
+    events = []
+    with pytest.raises(Exception, match='simulated failure'):
+        for event in client.generate('Hello', stream=True, context=[]):
+            events.append(event)
+    assert len(events) == TOKENS // 2
+    assert (failing.generations, healthy.generations) == (1, 0)
+    stats = client.backends.stats()['nodes']
+    assert [node['failures'] for node in stats] == [1, 0]
+    assert [node['in_flight'] for node in stats] == [0, 0]
+    # A failed generation is not a failed host
+    assert stats[0]['healthy']
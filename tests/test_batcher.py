@@ -0,0 +1,73 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from app.models.classifier import BatchQueueFull, InferenceBatcher
+
+
+def image(value):
+    return np.full((1, 2), value, dtype=np.float32)
+
+
+class Recorder:
+    """A run_batch that notes every batch size and can be held up."""
+
+    def __init__(self):
+        self.sizes = []
+        self.running = threading.Event()
+        self.proceed = threading.Event()
+        self.proceed.set()
+
+    def __call__(self, batch):
+        self.sizes.append(len(batch))
+        self.running.set()
+        self.proceed.wait(5)
+        return batch.sum(axis=1)
+
+
+def test_full_batch_is_flushed_without_waiting():
+    run_batch = Recorder()
+    batcher = InferenceBatcher(run_batch, max_batch_size=4, max_wait_ms=10000, queue_depth=16)
+    started = time.monotonic()
+    futures = [batcher.submit(image(i)) for i in range(4)]
+    assert [future.result(5) for future in futures] == [0, 2, 4, 6]
+    assert time.monotonic() - started < 5
+    assert run_batch.sizes == [4]
+
+
+def test_partial_batch_is_flushed_at_the_deadline():
+    run_batch = Recorder()
+    batcher = InferenceBatcher(run_batch, max_batch_size=8, max_wait_ms=50, queue_depth=16)
+    started = time.monotonic()
+    futures = [batcher.submit(image(i)) for i in range(3)]
+    assert [future.result(5) for future in futures] == [0, 2, 4]
+    assert time.monotonic() - started >= 0.05
+    assert run_batch.sizes == [3]
+
+
+def test_full_queue_raises_batch_queue_full():
+    run_batch = Recorder()
+    run_batch.proceed.clear()
+    batcher = InferenceBatcher(run_batch, max_batch_size=1, max_wait_ms=0, queue_depth=2,
+                               retry_after=3)
+    first = batcher.submit(image(1))
+    assert run_batch.running.wait(5)
+    queued = [batcher.submit(image(2)), batcher.submit(image(3))]
+    with pytest.raises(BatchQueueFull) as error:
+        batcher.submit(image(4))
+    assert error.value.retry_after == 3
+    run_batch.proceed.set()
+    assert [future.result(5) for future in [first] + queued] == [2, 4, 6]
+
+
+def test_failed_batch_fails_every_future():
+    def run_batch(batch):
+        raise RuntimeError('model crashed')
+
+    batcher = InferenceBatcher(run_batch, max_batch_size=2, max_wait_ms=10000, queue_depth=4)
+    futures = [batcher.submit(image(i)) for i in range(2)]
+    for future in futures:
+        with pytest.raises(RuntimeError, match='model crashed'):
+            future.result(5)
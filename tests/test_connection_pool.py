@@ -0,0 +1,63 @@
+import random
+import socket
+from types import SimpleNamespace
+
+import pytest
+import requests
+from urllib3.exceptions import ConnectTimeoutError, MaxRetryError, ProtocolError
+
+from FossilChatBot import connection_pool
+from FossilChatBot.connection_pool import ConnectionPool, is_safe_to_retry
+
+
+def dead_url():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return f'http://127.0.0.1:{sock.getsockname()[1]}/api/version'
+
+
+def test_refused_connection_is_safe_to_retry():
+    with pytest.raises(requests.exceptions.ConnectionError) as error:
+        requests.get(dead_url(), timeout=1)
+    assert is_safe_to_retry(error.value)
+
+
+def test_connect_timeout_is_safe_to_retry():
+    assert is_safe_to_retry(requests.exceptions.ConnectTimeout())
+    reason = MaxRetryError(None, '/api/generate', ConnectTimeoutError())
+    assert is_safe_to_retry(requests.exceptions.ConnectionError(reason))
+
+
+def test_errors_after_the_request_went_out_are_not_retried():
+    reset = ProtocolError('Connection aborted.', ConnectionResetError())
+    assert not is_safe_to_retry(requests.exceptions.ConnectionError(reset))
+    assert not is_safe_to_retry(requests.exceptions.ConnectionError())
+    assert not is_safe_to_retry(requests.exceptions.ReadTimeout())
+    assert not is_safe_to_retry(requests.exceptions.ChunkedEncodingError())
+
+
+def test_backoff_is_jittered_and_capped():
+    pool = ConnectionPool(backoff=0.25, backoff_max=1.0)
+    random.seed(0)
+    for attempt in range(8):
+        delays = [pool.backoff_delay(attempt) for _ in range(200)]
+        cap = min(1.0, 0.25 * 2 ** attempt)
+        assert all(0 <= delay <= cap for delay in delays)
+        assert max(delays) > cap * 0.9
+        assert len(set(delays)) > 1
+
+
+def test_unreachable_host_is_retried_with_backoff(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(connection_pool, 'time', SimpleNamespace(sleep=sleeps.append))
+    pool = ConnectionPool(max_retries=2, backoff=0.25)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        pool.get(dead_url())
+    assert pool.retries == 2
+    assert len(sleeps) == 2
+    assert sleeps[0] <= 0.25 and sleeps[1] <= 0.5
+
+    sleeps.clear()
+    with pytest.raises(requests.exceptions.ConnectionError):
+        pool.get(dead_url(), max_retries=0)
+    assert sleeps == []
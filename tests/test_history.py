@@ -0,0 +1,68 @@
+from FossilChatBot.history import HistoryManager
+
+SYSTEM = 's' * 40  # 10 tokens
+
+
+def turns(count, tokens=30):
+    return [{'user': f'question {i}', 'assistant': f'answer {i}', 'tokens': tokens}
+            for i in range(count)]
+
+
+class Prefixes:
+    def __init__(self, context):
+        self.context = context
+        self.first_turns = []
+
+    def get(self, system_prompt):
+        return self.context
+
+    def observe_first_turn(self, used_prefix, event):
+        self.first_turns.append(used_prefix)
+
+
+def test_context_is_continued_while_it_fits():
+    history = HistoryManager(token_budget=200)
+    state = {'context': [1] * 150, 'system': SYSTEM, 'turns': turns(2)}
+    assert history.prepare(state, 'p' * 80, SYSTEM) == ('p' * 80, None, [1] * 150)
+    assert 'rebuilds' not in state
+
+
+def test_overflowing_context_is_rebuilt_from_the_turns_that_fit():
+    history = HistoryManager(token_budget=200, max_turns=5)
+    state = {'context': [1] * 190, 'system': SYSTEM, 'turns': turns(5)}
+    prompt, system_prompt, context = history.prepare(state, 'p' * 80, SYSTEM)
+    # Half the budget, less the prompt and system prompt, leaves 70 tokens: two turns
+    assert prompt.splitlines() == [
+        'Conversation so far:',
+        'User: question 3', 'FossilFinder: answer 3',
+        'User: question 4', 'FossilFinder: answer 4',
+        '', 'User: ' + 'p' * 80,
+    ]
+    assert (system_prompt, context) == (SYSTEM, [])
+    assert (state['context'], state['rebuilds'], state['prefix']) == ([], 1, False)
+
+
+def test_changed_system_prompt_rebuilds_the_window():
+    history = HistoryManager(token_budget=200)
+    state = {'context': [1] * 10, 'system': SYSTEM, 'turns': []}
+    assert history.prepare(state, 'hi', 'other') == ('hi', 'other', [])
+    assert state['system'] == 'other'
+
+
+def test_rebuilt_window_starts_from_a_cached_prefix():
+    prefixes = Prefixes([7, 7, 7])
+    history = HistoryManager(token_budget=200, prefixes=prefixes)
+    state = {}
+    assert history.prepare(state, 'hi', SYSTEM) == ('hi', None, [7, 7, 7])
+    history.record(state, 'hi', 'hello', {'context': [7, 7, 7, 8], 'eval_count': 3})
+    assert prefixes.first_turns == [True]
+    assert state['context'] == [7, 7, 7, 8]
+
+
+def test_recorded_turns_are_trimmed_to_max_turns():
+    history = HistoryManager(token_budget=200, max_turns=2)
+    state = {}
+    for i in range(3):
+        history.record(state, 'q' * 8, f'answer {i}', {'eval_count': 5})
+    assert [turn['assistant'] for turn in state['turns']] == ['answer 1', 'answer 2']
+    assert state['turns'][0]['tokens'] == 2 + 5
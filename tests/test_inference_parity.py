@@ -0,0 +1,82 @@
+import io
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+tf = pytest.importorskip('tensorflow')
+
+from app.models.backends import (
+    KerasBackend, TFLiteBackend, build_inference_fn, padded_batch_sizes)
+from app.models.preprocessing import IMAGE_SIZE
+from export_model import convert
+
+IMAGE_DIR = os.path.join(os.path.dirname(__file__), '..', 'app', 'static', 'images')
+ATOL = 1e-5
+
+
+@pytest.fixture(scope='module')
+def model():
+    """A small untrained model with the classifier's input and output shape."""
+    tf.keras.utils.set_random_seed(0)
+    width, height = IMAGE_SIZE
+    return tf.keras.Sequential([
+        tf.keras.Input((height, width, 3)),
+        tf.keras.layers.Conv2D(8, 5, strides=4, activation='relu'),
+        tf.keras.layers.Conv2D(16, 3, strides=2, activation='relu'),
+        tf.keras.layers.GlobalAveragePooling2D(),
+        tf.keras.layers.Dense(6, activation='softmax'),
+    ])
+
+
+def legacy_pixels(image_data):
+    # Decode and resize the way the original process_image did.
+    img = Image.open(io.BytesIO(image_data)).convert('RGB').resize(IMAGE_SIZE)
+    return tf.keras.preprocessing.image.img_to_array(img)
+
+
+def reference_images():
+    images = []
+    for name in sorted(os.listdir(IMAGE_DIR)):
+        with open(os.path.join(IMAGE_DIR, name), 'rb') as f:
+            images.append(legacy_pixels(f.read()))
+    return np.stack(images)
+
+
+def test_uint8_graph_matches_float_pipeline(model):
+    pixels = reference_images()
+    expected = model.predict(pixels / 255.0, verbose=0)
+    actual = build_inference_fn(model, IMAGE_SIZE)(pixels.astype(np.uint8)).numpy()
+    np.testing.assert_allclose(actual, expected, atol=ATOL)
+    assert (np.argmax(actual, 1) == np.argmax(expected, 1)).all()
+
+
+def test_keras_backend_serves_the_uint8_graph(model, tmp_path):
+    path = str(tmp_path / 'stand_in.h5')
+    model.save(path)
+    backend = KerasBackend(path, IMAGE_SIZE)
+    pixels = reference_images()[:3]
+    expected = model.predict(pixels / 255.0, verbose=0)
+    actual = backend.predict(pixels.astype(np.uint8))
+    assert actual.dtype == np.float32
+    np.testing.assert_allclose(actual, expected, atol=ATOL)
+
+
+def test_padded_batch_sizes():
+    assert padded_batch_sizes(1) == [1]
+    assert padded_batch_sizes(16) == [1, 2, 4, 8, 16]
+    assert padded_batch_sizes(12) == [1, 2, 4, 8, 12]
+
+
+def test_tflite_backend_pads_and_splits_batches(model, tmp_path):
+    path = tmp_path / 'stand_in.tflite'
+    path.write_bytes(convert(model, 'none', None))
+    backend = TFLiteBackend(str(path), max_batch_size=4)
+    pixels = reference_images()[:7].astype(np.uint8)
+    singles = np.concatenate([backend.predict(pixels[i:i + 1]) for i in range(len(pixels))])
+    # 3 images are padded to 4; 7 are split into 4 + 3
+    for count in (3, 7):
+        np.testing.assert_allclose(backend.predict(pixels[:count]), singles[:count], atol=ATOL)
+    expected = model.predict(pixels / 255.0, verbose=0)
+    np.testing.assert_allclose(singles, expected, atol=1e-4)
@@ -0,0 +1,46 @@
+import numpy as np
+from PIL import Image
+
+from app.models.phash import NearDuplicateIndex, dhash
+
+MIN_STDDEV = 5.0
+
+
+def flat(color):
+    return np.full((224, 224, 3), color, dtype=np.uint8)
+
+
+def textured(seed, size=224):
+    rng = np.random.default_rng(seed)
+    blocks = rng.integers(0, 256, (8, 8, 3), dtype=np.uint8)
+    return np.asarray(Image.fromarray(blocks).resize((size, size), Image.BICUBIC))
+
+
+def test_different_flat_images_do_not_match():
+    red, blue = flat((200, 30, 30)), flat((20, 40, 220))
+    # Without a contrast floor both hash to all zero bits and collide
+    assert dhash(red) == dhash(blue)
+
+    index = NearDuplicateIndex(max_distance=4)
+    index.put(dhash(red, min_stddev=MIN_STDDEV), {'class': 'Ammonite'})
+    assert dhash(red, min_stddev=MIN_STDDEV) is None
+    assert index.get(dhash(blue, min_stddev=MIN_STDDEV)) is None
+    assert index.stats()['entries'] == 0
+    assert index.stats()['skipped'] == 1
+
+
+def test_low_contrast_images_are_not_hashed():
+    rng = np.random.default_rng(0)
+    for gray in (40, 180):
+        noise = rng.integers(-2, 3, (224, 224, 3))
+        pixels = np.clip(gray + noise, 0, 255).astype(np.uint8)
+        assert dhash(pixels, min_stddev=MIN_STDDEV) is None
+
+
+def test_resized_copy_of_textured_image_still_matches():
+    original = textured(1)
+    copy = np.asarray(Image.fromarray(textured(1, 512)).resize((224, 224), Image.BILINEAR))
+    index = NearDuplicateIndex(max_distance=4)
+    index.put(dhash(original, min_stddev=MIN_STDDEV), {'class': 'Trilobite'})
+    assert index.get(dhash(copy, min_stddev=MIN_STDDEV)) == {'class': 'Trilobite'}
+    assert index.get(dhash(textured(2), min_stddev=MIN_STDDEV)) is None
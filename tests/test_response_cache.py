@@ -0,0 +1,43 @@
+from FossilChatBot.response_cache import (
+    CONFIDENCE_MARKER, ResponseCache, confidence_band, normalize)
+
+SYSTEM = 'You are FossilFinder. The image shows an ammonite.'
+
+
+def cache(**params):
+    return ResponseCache(lambda: 'model@digest', params or {'seed': 42})
+
+
+def test_confidence_bands():
+    assert confidence_band(12) == '0-60'
+    assert confidence_band(59.9) == '0-60'
+    assert confidence_band(60) == '60-70'
+    assert confidence_band(87.5) == '80-95'
+    assert confidence_band(100) == '95-100'
+
+
+def test_prompts_in_the_same_band_normalize_alike():
+    assert normalize('Tell me  about it. Accuracy: 87%') == normalize('tell me about it. accuracy: 91.5 %')
+    assert normalize('Accuracy: 87%') == 'accuracy: <80-95>'
+    assert normalize('Accuracy: 87%') != normalize('Accuracy: 97%')
+
+
+def test_answer_quotes_the_callers_confidence():
+    responses = cache()
+    responses.put(SYSTEM, 'Tell me about this fossil (87% confidence)',
+                  'I am 87% sure, or 87.3% to be exact. Only 12% of finds are this good.')
+    key = responses.key(SYSTEM, 'Tell me about this fossil (87% confidence)')
+    assert responses._entries[key] == (
+        f'I am {CONFIDENCE_MARKER}% sure, or {CONFIDENCE_MARKER}% to be exact. '
+        'Only 12% of finds are this good.')
+    assert responses.get(SYSTEM, 'Tell me about this fossil (91% confidence)') == (
+        'I am 91% sure, or 91% to be exact. Only 12% of finds are this good.')
+    assert responses.get(SYSTEM, 'Tell me about this fossil (97% confidence)') is None
+    assert (responses.hits, responses.misses) == (1, 1)
+
+
+def test_cache_needs_a_seed():
+    responses = cache(temperature=0.7)
+    responses.put(SYSTEM, 'hello', 'hi')
+    assert not responses.enabled
+    assert responses.get(SYSTEM, 'hello') is None
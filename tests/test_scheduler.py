@@ -0,0 +1,83 @@
+import threading
+import time
+
+import pytest
+
+from FossilChatBot.scheduler import (
+    BACKGROUND, GenerationScheduler, SchedulerBusy, SchedulerTimeout)
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.005)
+
+
+def queue_waiter(scheduler, session_id, admitted):
+    """Start a thread that waits for a slot, notes its session and gives the slot back."""
+    def run():
+        with scheduler.slot(session_id):
+            admitted.append(session_id)
+
+    queued = scheduler.stats()['queued']
+    thread = threading.Thread(target=run)
+    thread.start()
+    wait_until(lambda: scheduler.stats()['queued'] == queued + 1)
+    return thread
+
+
+def test_waiting_sessions_are_served_round_robin():
+    scheduler = GenerationScheduler(max_in_flight=1)
+    ticket = scheduler.acquire('holder')
+    admitted = []
+    threads = [queue_waiter(scheduler, session_id, admitted)
+               for session_id in ('a', 'a', 'a', 'b', 'c')]
+    assert scheduler.stats()['sessions_waiting'] == 3
+    ticket.release()
+    for thread in threads:
+        thread.join(5)
+    # a queued three requests first, but b and c don't wait behind all of them
+    assert admitted == ['a', 'b', 'c', 'a', 'a']
+    assert scheduler.stats()['in_flight'] == 0
+
+
+def test_background_work_is_capped():
+    scheduler = GenerationScheduler(max_in_flight=3, max_background=1)
+    background = scheduler.acquire(BACKGROUND)
+    with pytest.raises(SchedulerTimeout):
+        scheduler.acquire(BACKGROUND, timeout=0.05)
+    # Slots are free, so user requests are not held up by the capped background work
+    admitted = []
+    thread = queue_waiter(scheduler, BACKGROUND, admitted)
+    with scheduler.slot('user'):
+        assert scheduler.stats()['in_flight'] == 2
+    assert admitted == []
+    background.release()
+    thread.join(5)
+    assert admitted == [BACKGROUND]
+    assert scheduler.stats()['background_in_flight'] == 0
+
+
+def test_request_waiting_past_the_deadline_times_out():
+    scheduler = GenerationScheduler(max_in_flight=1, queue_timeout=0.05, retry_after=3)
+    ticket = scheduler.acquire('a')
+    started = time.monotonic()
+    with pytest.raises(SchedulerTimeout) as error:
+        scheduler.acquire('b')
+    assert time.monotonic() - started >= 0.05
+    assert error.value.retry_after == 3
+    stats = scheduler.stats()
+    assert (stats['timed_out'], stats['queued'], stats['sessions_waiting']) == (1, 0, 0)
+    ticket.release()
+    assert scheduler.stats()['in_flight'] == 0
+
+
+def test_full_queue_fails_fast():
+    scheduler = GenerationScheduler(max_in_flight=1, max_queue=0, retry_after=2)
+    with scheduler.slot('a'):
+        with pytest.raises(SchedulerBusy) as error:
+            scheduler.acquire('b')
+    assert not isinstance(error.value, SchedulerTimeout)
+    assert error.value.retry_after == 2
+    assert scheduler.stats()['rejected'] == 1
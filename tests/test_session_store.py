@@ -0,0 +1,66 @@
+import pytest
+
+from FossilChatBot.session_store import SessionStore, encode_state
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr('FossilChatBot.session_store.time', clock)
+    return clock
+
+
+def state(n):
+    return {'context': list(range(n)), 'turns': []}
+
+
+def test_least_recently_used_sessions_are_evicted_past_the_byte_budget(clock):
+    size = len(encode_state(state(100)))
+    store = SessionStore(max_bytes=2 * size, ttl=60)
+    store.put('a', state(100))
+    store.put('b', state(100))
+    assert store.get('a') == state(100)  # a is now the most recently used
+    store.put('c', state(100))
+    assert store.get('b') == {}
+    assert store.get('a') == state(100)
+    assert store.get('c') == state(100)
+    stats = store.stats()
+    assert (stats['sessions'], stats['bytes'], stats['evictions']) == (2, 2 * size, 1)
+
+
+def test_session_larger_than_the_budget_is_not_kept(clock):
+    store = SessionStore(max_bytes=100)
+    store.put('a', state(10))
+    store.put('big', state(1000))
+    assert store.get('big') == {}
+    assert store.session_bytes('a') == len(encode_state(state(10)))
+
+
+def test_idle_sessions_expire_after_the_ttl(clock):
+    store = SessionStore(ttl=60)
+    store.put('a', state(1))
+    store.put('b', state(1))
+    clock.now += 30
+    assert store.get('a') == state(1)  # reading refreshes a
+    clock.now += 40
+    assert store.get('b') == {}
+    assert store.get('a') == state(1)
+    assert store.stats()['expirations'] == 1
+
+
+def test_writes_sweep_out_idle_sessions(clock):
+    store = SessionStore(ttl=60)
+    store.put('a', state(10))
+    clock.now += 61
+    store.put('b', state(1))
+    stats = store.stats()
+    assert (stats['sessions'], stats['expirations']) == (1, 1)
+    assert stats['bytes'] == len(encode_state(state(1)))